@@ -3,6 +3,7 @@ from cookingassistant.engine import AppConfig, AppFactory
 from observation.telemetry.tracing import init_tracer
 
 from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 from opentelemetry.instrumentation.requests import RequestsInstrumentor
 
@@ -34,8 +35,14 @@ def test_endpoint():
     return {"message": "Hello, I am your cooking AI. How can I help you today?"}
 
 @app.get("/")
-def suggest(images, user_query):
-    result = assistant.process_request(
+async def suggest(images, user_query, stream: bool = False):
+    if stream:
+        # Plain text instructions, sent as the LLM generates them
+        return StreamingResponse(
+            assistant.aprocess_request_stream(images=images, user_query=user_query),
+            media_type="text/plain"
+        )
+    result = await assistant.aprocess_request(
         images=images,
         user_query=user_query
     )
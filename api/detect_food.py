@@ -1,37 +1,114 @@
-from fastapi import FastAPI, File, UploadFile
+from fastapi import BackgroundTasks, FastAPI, File, UploadFile
+from fastapi.concurrency import run_in_threadpool
+import hashlib
 import os
+from typing import Any, Dict, List, Optional, Tuple
 from ultralytics import YOLO
-from PIL import Image
+
+from cookingassistant.model.detection_cache import DetectionCache, ImageKey
+from cookingassistant.model.preprocess import ImageLoader
 
 model_yolo = YOLO('best.pt')
+# Detections of recently uploaded photos, re-uploads skip YOLO
+detection_cache = DetectionCache()
+# Decodes uploads straight to YOLO's input size
+image_loader = ImageLoader()
 app = FastAPI()
 UPLOAD_FOLDER = "uploaded_images"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+
+def detect_objects(uploads: List[bytes]) -> List[List[Dict[str, Any]]]:
+    """
+    Detect the objects in every uploaded image, decoded from memory.
+    Images missing from the cache run through YOLO in one batch.
+    """
+    keys = [
+        ImageKey(hashlib.blake2b(data, digest_size=16).hexdigest(),
+                 lambda data=data: image_loader.load(data))
+        for data in uploads
+    ]
+    detections = [detection_cache.get(key) for key in keys]
+    misses = [i for i, detected in enumerate(detections) if detected is None]
+    if not misses:
+        return detections
+
+    # Mở ảnh và chạy YOLO để phát hiện vật thể
+    results = model_yolo([keys[i].image for i in misses], verbose=False)
+
+    # Lấy danh sách các vật thể phát hiện được
+    for i, r in zip(misses, results):
+        classes = r.boxes.cls.int().tolist()
+        confidences = r.boxes.conf.tolist()
+        detections[i] = [
+            {
+                "class": model_yolo.names[c],  # Tên lớp
+                "confidence": conf,  # Độ tin cậy
+            }
+            for c, conf in zip(classes, confidences)
+        ]
+        detection_cache.put(keys[i], detections[i])
+    return detections
+
+
+def save_upload(file_path: str, data: bytes) -> None:
+    """Write an uploaded file to disk"""
+    with open(file_path, "wb") as buffer:
+        buffer.write(data)
+
+
+def upload_path(file: UploadFile) -> str:
+    """Where an upload is persisted, without directories from the client"""
+    return os.path.join(UPLOAD_FOLDER, os.path.basename(file.filename or "upload"))
+
+
+async def read_uploads(files: List[UploadFile], persist: bool, background_tasks: BackgroundTasks
+                       ) -> Tuple[List[bytes], List[Optional[str]]]:
+    """Read the uploads and queue their persistence; returns their bytes and file paths"""
+    uploads = []
+    paths = []
+    for file in files:
+        # Starlette keeps small uploads in memory and spools only large ones
+        # to a temporary file; either way the bytes are read once
+        data = await file.read()
+        uploads.append(data)
+        if persist:
+            path = upload_path(file)
+            # Runs after the response is sent
+            background_tasks.add_task(save_upload, path, data)
+            paths.append(path)
+        else:
+            paths.append(None)
+    return uploads, paths
+
+
 @app.post("/upload/")
-async def upload_image(file: UploadFile = File(...)):
+async def upload_image(background_tasks: BackgroundTasks,
+                       file: UploadFile = File(...), persist: bool = False):
     try:
-        file_path = os.path.join(UPLOAD_FOLDER, file.filename)
-        with open(file_path, "wb") as buffer:
-            buffer.write(await file.read())
-        
-        # Mở ảnh và chạy YOLO để phát hiện vật thể
-        image = Image.open(file_path)
-        results = model_yolo(image)
-
-        # Lấy danh sách các vật thể phát hiện được
-        detected_objects = []
-        for r in results:
-            for box in r.boxes:
-                detected_objects.append({
-                    "class": model_yolo.names[int(box.cls)],  # Tên lớp
-                    "confidence": float(box.conf)  # Độ tin cậy
-                })
-        
+        uploads, [file_path] = await read_uploads([file], persist, background_tasks)
+        # Decoding and inference off the event loop
+        [detected_objects] = await run_in_threadpool(detect_objects, uploads)
         return {"file_path": file_path, "detections": detected_objects}
     except Exception as e:
         return {"error": str(e)}
 
+
+@app.post("/upload_many/")
+async def upload_images(background_tasks: BackgroundTasks,
+                        files: List[UploadFile] = File(...), persist: bool = False):
+    try:
+        uploads, file_paths = await read_uploads(files, persist, background_tasks)
+        detections = await run_in_threadpool(detect_objects, uploads)
+        return {
+            "results": [
+                {"file_name": file.filename, "file_path": file_path, "detections": detected_objects}
+                for file, file_path, detected_objects in zip(files, file_paths, detections)
+            ]
+        }
+    except Exception as e:
+        return {"error": str(e)}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
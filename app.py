@@ -7,25 +7,45 @@ from PIL import Image
 from ultralytics import YOLO
 
 from cookingassistant.assistant import CookingAssistant
+from cookingassistant.cache import EmbeddingCache, TTLCache
+from cookingassistant.data.ingredient_index import IngredientIndex
 from cookingassistant.data.item import Ingredient, Recipe
 from cookingassistant.data.suggestor import RecipeSuggestor
 from cookingassistant.database import (CommonIngredientsRegistry,
                                        VectorRecipeDatabase)
+from cookingassistant.model.batching import BatchingImageRecognitionModel
+from cookingassistant.model.detection_cache import CachedImageRecognitionModel
 from cookingassistant.model.detector import PyTorchImageRecognitionModel
 from cookingassistant.model.llm import (InstructionGeneratorByTemplate,
                                         OpenAIClient)
 
 # Load model
 OPENAI_API_KEY = '' # load from env
-vectordb = VectorRecipeDatabase()
+embedding_cache = EmbeddingCache("all-MiniLM-L6-v2", VectorRecipeDatabase.VECTOR_DIM, cache_dir="./data/embedding_cache")
+# Seconds before recipes updated by create_db.py show up in cached results
+# and instruction blocks
+CACHE_TTL = 600
+vectordb = VectorRecipeDatabase(embedding_cache=embedding_cache, result_cache=TTLCache(maxsize=4096, ttl=CACHE_TTL))
 vectordb.connect("localhost:19530")
-model = PyTorchImageRecognitionModel("./models/best.pt")
+# Concurrent Gradio requests share detector forward passes, and photos
+# submitted again are answered from the detection cache
+model = CachedImageRecognitionModel(
+    BatchingImageRecognitionModel(PyTorchImageRecognitionModel("./models/best.pt"), max_wait_ms=10)
+)
 
 common_ingredients = CommonIngredientsRegistry()
-recipe_processor = RecipeSuggestor(vectordb, common_ingredients)
+# Fuse the embedding search with exact ingredient matches when create_db.py
+# has written the inverted index
+INGREDIENT_INDEX_PATH = "./data/ingredient_index.npz"
+if os.path.exists(INGREDIENT_INDEX_PATH):
+    ingredient_index = IngredientIndex.load(INGREDIENT_INDEX_PATH)
+    recipe_processor = RecipeSuggestor(vectordb, common_ingredients, two_stage=True,
+                                       strategy="hybrid", ingredient_index=ingredient_index)
+else:
+    recipe_processor = RecipeSuggestor(vectordb, common_ingredients, two_stage=True)
 
 # llm_client = OpenAIClient(OPENAI_API_KEY)
-instruction_generator = InstructionGeneratorByTemplate()
+instruction_generator = InstructionGeneratorByTemplate(ttl=CACHE_TTL)
 cooking_assistant = CookingAssistant(model, recipe_processor, instruction_generator)
 
 css = """
@@ -34,8 +54,13 @@ css = """
 
 
 def process(images, text_input):
-    response = cooking_assistant.process_request(images, text_input)
-    return str(response.get('detailed_instructions', "No recipe found"))
+    # A generator, so Gradio shows the instructions while they are generated
+    instructions = ""
+    for delta in cooking_assistant.process_request_stream(images, text_input):
+        instructions += delta
+        yield instructions
+    if not instructions:
+        yield "No recipe found"
 
 
 def swap_to_gallery(images):
@@ -0,0 +1,19 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import Executor
+from typing import Any, Callable, Optional
+
+
+async def run_in_executor(executor: Optional[Executor], func: Callable[..., Any],
+                          *args: Any, **kwargs: Any) -> Any:
+    """
+    Run a blocking call in `executor` and await its result.
+
+    Unlike loop.run_in_executor, the caller's context variables go along, so
+    spans opened in the worker thread nest under the current trace.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    return await loop.run_in_executor(executor, call)
@@ -1,15 +1,19 @@
+import asyncio
 import os
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, FrozenSet, Iterator, List, Optional, Tuple
 
 from opentelemetry import trace
 from PIL import Image
 
+from cookingassistant.aio import run_in_executor
 from cookingassistant.data.item import Ingredient, Recipe
 from cookingassistant.data.suggestor import RecipeSuggestor
 from cookingassistant.model.detector import ImageRecognitionModel
 from cookingassistant.model.llm import BaseInstructionGenerator
+from cookingassistant.model.preprocess import ImageLoader
 from observation.telemetry.tracespan_decorator import TraceSpan
 
 
@@ -19,18 +23,32 @@ class CookingAssistant:
     def __init__(self, 
                  image_model: ImageRecognitionModel,
                  recipe_processor: RecipeSuggestor,
-                 instruction_generator: BaseInstructionGenerator):
+                 instruction_generator: BaseInstructionGenerator,
+                 image_loader: Optional[ImageLoader] = None,
+                 detection_workers: int = 2,
+                 pipelined: bool = False):
         self.image_model = image_model
         self.recipe_processor = recipe_processor
         self.instruction_generator = instruction_generator
+        self.image_loader = image_loader or ImageLoader()
+        # Bounds the detector calls of aprocess_request running at once
+        self.detection_executor = ThreadPoolExecutor(detection_workers, thread_name_prefix="detection")
+        # Pipelined mode: aprocess_request detects image by image and starts
+        # recipe search and instruction generation before the last image is done
+        self.pipelined = pipelined
+
+    @TraceSpan("CookingAssistant.decode_images")
+    def load_images(self, images: List[str] | List[Image.Image]) -> List[Image.Image]:
+        """Decode the request's images to detector input size"""
+        trace.get_current_span().set_attribute("images.count", len(images))
+        return self.image_loader.load_many(images)
     
     @TraceSpan("CookingAssistant.process_request")
     def process_request(self, images: List[str] | List[Image.Image], user_query: str) -> Dict[str, Any]:
         """Process a user request with images and text query"""
-        # read image to Pillow Image if path is provided
-        if isinstance(images[0], str):
-            # load image
-            images = [Image.open(img_path) for img_path in images]
+        # read image to Pillow Image if path is provided, shrunk to the
+        # detector's input size
+        images = self.load_images(images)
         
         # 1. Recognize ingredients from images
         ingredient_names = self.image_model.predict(images)
@@ -53,4 +71,136 @@ class CookingAssistant:
             "recipe": top_recipe,
             "detailed_instructions": instructions,
             "alternative_recipes": ranked_recipes[1:5] if len(ranked_recipes) > 1 else []
-        }
\ No newline at end of file
+        }
+
+    def process_request_stream(self, images: List[str] | List[Image.Image], user_query: str) -> Iterator[str]:
+        """process_request yielding the detailed instructions as they are generated"""
+        images = self.load_images(images)
+        ingredients = [Ingredient(name) for name in self.image_model.predict(images)]
+        matching_recipes = self.recipe_processor.find_matching_recipes(ingredients, user_query)
+        ranked_recipes = self.recipe_processor.rank_recipes(matching_recipes, user_query)
+        yield from self.instruction_generator.generate_instructions_stream(
+            ranked_recipes, ingredients, user_query
+        )
+
+    @TraceSpan("CookingAssistant.decode_images")
+    async def aload_images(self, images: List[str] | List[Image.Image]) -> List[Image.Image]:
+        """Async load_images"""
+        trace.get_current_span().set_attribute("images.count", len(images))
+        return await self.image_loader.aload_many(images)
+
+    @TraceSpan("CookingAssistant.aprocess_request")
+    async def aprocess_request(self, images: List[str] | List[Image.Image], user_query: str) -> Dict[str, Any]:
+        """
+        Async process_request. Decoding and detection run in bounded thread
+        pools; the database and LLM calls are awaited, so many requests can
+        be in flight in one process.
+        """
+        if self.pipelined:
+            return await self.aprocess_request_pipelined(images, user_query)
+
+        images = await self.aload_images(images)
+
+        # 1. Recognize ingredients from images
+        ingredient_names = await run_in_executor(self.detection_executor, self.image_model.predict, images)
+        ingredients = [Ingredient(name) for name in ingredient_names]
+
+        # 2. Find matching recipes
+        matching_recipes = await self.recipe_processor.afind_matching_recipes(ingredients, user_query)
+
+        # 3. Rank recipes by relevance
+        ranked_recipes = self.recipe_processor.rank_recipes(matching_recipes, user_query)
+
+        # 4. Generate cooking instructions for the top recipe
+        top_recipe = ranked_recipes
+        instructions = await self.instruction_generator.agenerate_instructions(
+            top_recipe, ingredients, user_query
+        )
+
+        return {
+            "status": "success",
+            "recipe": top_recipe,
+            "detailed_instructions": instructions,
+            "alternative_recipes": ranked_recipes[1:5] if len(ranked_recipes) > 1 else []
+        }
+
+    async def aprocess_request_stream(self, images: List[str] | List[Image.Image], user_query: str) -> AsyncIterator[str]:
+        """Async process_request_stream"""
+        images = await self.aload_images(images)
+        ingredient_names = await run_in_executor(self.detection_executor, self.image_model.predict, images)
+        ingredients = [Ingredient(name) for name in ingredient_names]
+        matching_recipes = await self.recipe_processor.afind_matching_recipes(ingredients, user_query)
+        ranked_recipes = self.recipe_processor.rank_recipes(matching_recipes, user_query)
+        async for delta in self.instruction_generator.agenerate_instructions_stream(
+            ranked_recipes, ingredients, user_query
+        ):
+            yield delta
+
+    async def _adetect_image(self, image: str | Image.Image) -> List[str]:
+        """Decode and detect a single image of a request"""
+        [image] = await self.aload_images([image])
+        return await run_in_executor(self.detection_executor, self.image_model.predict, [image])
+
+    async def _arecommend(self, ingredients: List[Ingredient], user_query: str) -> Tuple[List[Recipe], str]:
+        """Search, rank and generate instructions for a set of ingredients"""
+        matching_recipes = await self.recipe_processor.afind_matching_recipes(ingredients, user_query)
+        ranked_recipes = self.recipe_processor.rank_recipes(matching_recipes, user_query)
+        instructions = await self.instruction_generator.agenerate_instructions(
+            ranked_recipes, ingredients, user_query
+        )
+        return ranked_recipes, instructions
+
+    @TraceSpan("CookingAssistant.aprocess_request_pipelined")
+    async def aprocess_request_pipelined(self, images: List[str] | List[Image.Image], user_query: str) -> Dict[str, Any]:
+        """
+        aprocess_request with overlapping stages. Each image is decoded and
+        detected on its own and its ingredients join the request's set as
+        soon as it is done. While images are still pending, search and
+        instruction generation run speculatively on the set seen so far; a
+        changed set supersedes the speculation, and the result is kept only
+        if the final set is the one it was started with.
+        """
+        span = trace.get_current_span()
+        span.set_attribute("images.count", len(images))
+        detections = [asyncio.ensure_future(self._adetect_image(image)) for image in images]
+        # Ingredient names in order of first detection
+        detected: Dict[str, None] = {}
+        speculation: Optional[Tuple[FrozenSet[str], asyncio.Future]] = None
+        try:
+            pending = len(detections)
+            for detection in asyncio.as_completed(detections):
+                detected.update(dict.fromkeys(await detection))
+                pending -= 1
+                if not pending or not detected:
+                    continue
+                if speculation is not None and speculation[0] == frozenset(detected):
+                    continue
+                if speculation is not None:
+                    speculation[1].cancel()
+                recommendation = asyncio.ensure_future(
+                    self._arecommend([Ingredient(name) for name in detected], user_query)
+                )
+                # Superseded speculations are never awaited
+                recommendation.add_done_callback(lambda f: f.cancelled() or f.exception())
+                speculation = (frozenset(detected), recommendation)
+
+            ingredients = [Ingredient(name) for name in detected]
+            if speculation is not None and speculation[0] == frozenset(detected):
+                span.set_attribute("pipeline.speculation_hit", True)
+                ranked_recipes, instructions = await speculation[1]
+            else:
+                span.set_attribute("pipeline.speculation_hit", False)
+                ranked_recipes, instructions = await self._arecommend(ingredients, user_query)
+        finally:
+            for future in detections:
+                future.cancel()
+            if speculation is not None:
+                speculation[1].cancel()
+
+        top_recipe = ranked_recipes
+        return {
+            "status": "success",
+            "recipe": top_recipe,
+            "detailed_instructions": instructions,
+            "alternative_recipes": ranked_recipes[1:5] if len(ranked_recipes) > 1 else []
+        }
@@ -0,0 +1,490 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from opentelemetry import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: the disk tier must not be shared by processes
+    fcntl = None
+
+meter = metrics.get_meter(__name__)
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a live entry or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store an entry, evicting the least recently used ones"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit and miss counters"""
+        return {"hits": self.hits, "misses": self.misses, "items": len(self._entries)}
+
+
+class EmbeddingCache:
+    """
+    Content-addressed cache for text embeddings.
+
+    Entries are keyed by the embedding model name and the normalized text.
+    A bounded in-memory LRU tier sits in front of an optional on-disk tier
+    made of an append-only float32 matrix (read through a memory map) and a
+    key file holding one key per matrix row.
+
+    Several processes may share the on-disk tier: writers hold an exclusive
+    lock on `lock` in the cache directory, take the row numbers from the
+    files as they are on disk, and first drop what a crashed writer left
+    behind (vector rows without a key, a half-written key line).
+    """
+
+    def __init__(self, model_name: str, dim: int,
+                 cache_dir: Optional[str] = None,
+                 max_memory_items: int = 10000):
+        self.model_name = model_name
+        self.dim = dim
+        self.cache_dir = cache_dir
+        self.max_memory_items = max_memory_items
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._rows: Dict[str, int] = {}
+        # Key lines (= vector rows) read so far and the key file offset after them
+        self._stored_rows = 0
+        self._keys_offset = 0
+        self._mmap: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._keys_path = os.path.join(cache_dir, "keys.txt")
+            self._vectors_path = os.path.join(cache_dir, "vectors.f32")
+            self._lock_path = os.path.join(cache_dir, "lock")
+            with self._file_lock():
+                self._sync_disk_index()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalize text so trivially different strings share an entry"""
+        return " ".join(text.lower().split())
+
+    def key(self, text: str) -> str:
+        """Cache key for a text under this cache's model"""
+        content = f"{self.model_name}\0{self.normalize(text)}"
+        return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock on the on-disk tier, across processes"""
+        with open(self._lock_path, "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _sync_disk_index(self) -> None:
+        """
+        Map the keys appended since the last sync, by this or another
+        process, to their rows and make both files agree on the number of
+        rows. Called with the file lock held.
+        """
+        row_bytes = self.dim * np.dtype(np.float32).itemsize
+        if os.path.exists(self._keys_path):
+            with open(self._keys_path, "rb") as f:
+                f.seek(self._keys_offset)
+                data = f.read()
+            complete = data[:data.rfind(b"\n") + 1]
+            for line in complete.decode("utf-8").splitlines():
+                self._rows[line.strip()] = self._stored_rows
+                self._stored_rows += 1
+            self._keys_offset += len(complete)
+            if len(complete) < len(data):
+                # A key line cut short by a crash
+                os.truncate(self._keys_path, self._keys_offset)
+
+        vector_rows = os.path.getsize(self._vectors_path) // row_bytes if os.path.exists(self._vectors_path) else 0
+        if vector_rows < self._stored_rows:
+            # Keys without a vector: the files were damaged, start over
+            os.truncate(self._keys_path, 0)
+            open(self._vectors_path, "wb").close()
+            self._rows.clear()
+            self._memory.clear()
+            self._stored_rows = self._keys_offset = 0
+            self._mmap = None
+        elif os.path.exists(self._vectors_path) and os.path.getsize(self._vectors_path) != self._stored_rows * row_bytes:
+            # Vectors are written before keys: rows past the last key were
+            # left by a writer that crashed in between
+            os.truncate(self._vectors_path, self._stored_rows * row_bytes)
+
+    def _disk_vector(self, key: str) -> Optional[np.ndarray]:
+        """Read a vector from the on-disk tier"""
+        row = self._rows.get(key)
+        if row is None:
+            return None
+
+        if self._mmap is None or row >= self._mmap.shape[0]:
+            # The file has grown since it was mapped
+            self._mmap = np.memmap(
+                self._vectors_path, dtype=np.float32, mode="r",
+                shape=(self._stored_rows, self.dim),
+            )
+        return np.array(self._mmap[row])
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        """Put a vector in the memory tier, evicting the least recently used"""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Get a cached embedding or None"""
+        return self.get_many([text])[0]
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Get cached embeddings for many texts, None for misses"""
+        results: List[Optional[np.ndarray]] = []
+        with self._lock:
+            for text in texts:
+                key = self.key(text)
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                elif self.cache_dir and (vector := self._disk_vector(key)) is not None:
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                elif self.cache_dir and self._disk_grew():
+                    # Another process has appended since the last sync
+                    with self._file_lock():
+                        self._sync_disk_index()
+                    vector = self._disk_vector(key)
+                    if vector is not None:
+                        self._remember(key, vector)
+                        self.disk_hits += 1
+                    else:
+                        self.misses += 1
+                else:
+                    self.misses += 1
+                results.append(vector)
+        return results
+
+    def _disk_grew(self) -> bool:
+        """Whether the key file holds keys this cache has not read"""
+        return os.path.exists(self._keys_path) and os.path.getsize(self._keys_path) > self._keys_offset
+
+    def put(self, text: str, vector: Sequence[float]) -> None:
+        """Store the embedding of a text"""
+        self.put_many([text], [vector])
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        """Store embeddings for many texts"""
+        with self._lock:
+            entries: Dict[str, np.ndarray] = {}
+            for text, vector in zip(texts, vectors):
+                key = self.key(text)
+                vector = np.asarray(vector, dtype=np.float32)
+                self._remember(key, vector)
+                entries[key] = vector
+            if not self.cache_dir:
+                return
+
+            with self._file_lock():
+                # Rows are numbered after what is on disk now, including
+                # other processes' writes
+                self._sync_disk_index()
+                new_keys = [key for key in entries if key not in self._rows]
+                if not new_keys:
+                    return
+                with open(self._vectors_path, "ab") as f:
+                    f.write(np.stack([entries[key] for key in new_keys]).tobytes())
+                key_lines = "".join(f"{key}\n" for key in new_keys).encode("utf-8")
+                with open(self._keys_path, "ab") as f:
+                    f.write(key_lines)
+                for key in new_keys:
+                    self._rows[key] = self._stored_rows
+                    self._stored_rows += 1
+                self._keys_offset += len(key_lines)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit and miss counters"""
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_items": len(self._memory),
+            "disk_items": len(self._rows),
+        }
+
+
+@dataclass
+class _CachedResponse:
+    """A generated response and what it took to generate"""
+    scope: str
+    query: str
+    vector: Optional[np.ndarray]
+    response: str
+    latency: float
+    expires_at: float
+
+
+class ResponseCache:
+    """
+    Cache of generated responses, such as LLM completions.
+
+    A response belongs to a scope, e.g. a recipe and a set of available
+    ingredients, and to the user query it answered. Lookups first try the
+    exact normalized query; failing that, when an `embed` function is given,
+    a cached query of the same scope whose embedding has a cosine similarity
+    of at least `similarity_threshold` is a hit too. Entries expire after
+    `ttl` seconds and the least recently used are evicted past `maxsize`.
+    With a `path`, entries are appended to a JSON lines file and reloaded
+    on start, so the cache survives restarts.
+    """
+
+    def __init__(self, embed: Optional[Callable[[str], Sequence[float]]] = None,
+                 similarity_threshold: float = 0.92,
+                 maxsize: int = 4096,
+                 ttl: float = 7 * 24 * 3600.0,
+                 path: Optional[str] = None):
+        self.embed = embed
+        self.similarity_threshold = similarity_threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+        self._entries: "OrderedDict[str, _CachedResponse]" = OrderedDict()
+        # Recent query embeddings, so a miss and the put after it embed once
+        self._vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # Keys of the entries of each scope, for the similarity tier
+        self._scopes: Dict[str, Dict[str, None]] = {}
+        self._lock = threading.Lock()
+        self._lookups_metric = meter.create_counter(
+            "response_cache.lookups", description="Response cache lookups by result (exact, similar, miss)"
+        )
+        self._saved_metric = meter.create_histogram(
+            "response_cache.saved_latency", unit="ms", description="Generation time saved by a cache hit"
+        )
+
+        if path and os.path.exists(path):
+            self._load()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalize a query so trivially different strings share an entry"""
+        return " ".join(text.lower().split())
+
+    @staticmethod
+    def key(scope: str, query: str) -> str:
+        """Exact tier key of a normalized query in a scope"""
+        content = f"{scope}\0{query}"
+        return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _embed(self, query: str) -> Optional[np.ndarray]:
+        """Unit-length embedding of a query, or None without an embedder"""
+        if self.embed is None:
+            return None
+        with self._lock:
+            vector = self._vectors.get(query)
+        if vector is None:
+            vector = np.asarray(self.embed(query), dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            vector = vector / norm if norm else vector
+            with self._lock:
+                self._vectors[query] = vector
+                while len(self._vectors) > 1024:
+                    self._vectors.popitem(last=False)
+        return vector
+
+    def _insert(self, key: str, entry: _CachedResponse) -> None:
+        """Add an entry, evicting the least recently used ones"""
+        self._discard(key)
+        self._entries[key] = entry
+        self._scopes.setdefault(entry.scope, {})[key] = None
+        while len(self._entries) > self.maxsize:
+            self._discard(next(iter(self._entries)))
+
+    def _discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._scopes[entry.scope]
+        del keys[key]
+        if not keys:
+            del self._scopes[entry.scope]
+
+    def _live(self, key: str, now: float) -> Optional[_CachedResponse]:
+        """An unexpired entry, marked as recently used"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= now:
+            self._discard(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _hit(self, entry: _CachedResponse, result: str) -> str:
+        self.saved_seconds += entry.latency
+        self._lookups_metric.add(1, {"result": result})
+        self._saved_metric.record(entry.latency * 1000)
+        return entry.response
+
+    def get(self, scope: str, query: str) -> Optional[str]:
+        """Get the response cached for a query, or for a similar query of the same scope"""
+        query = self.normalize(query)
+        now = time.time()
+        with self._lock:
+            entry = self._live(self.key(scope, query), now)
+            if entry is not None:
+                self.exact_hits += 1
+                return self._hit(entry, "exact")
+            has_candidates = self.embed is not None and scope in self._scopes
+
+        if has_candidates:
+            vector = self._embed(query)
+            with self._lock:
+                best, best_similarity = None, self.similarity_threshold
+                for key in list(self._scopes.get(scope, ())):
+                    candidate = self._live(key, now)
+                    if candidate is None or candidate.vector is None:
+                        continue
+                    similarity = float(candidate.vector @ vector)
+                    if similarity >= best_similarity:
+                        best, best_similarity = candidate, similarity
+                if best is not None:
+                    self.similar_hits += 1
+                    return self._hit(best, "similar")
+
+        with self._lock:
+            self.misses += 1
+        self._lookups_metric.add(1, {"result": "miss"})
+        return None
+
+    def put(self, scope: str, query: str, response: str, latency: float = 0.0) -> None:
+        """Cache the response to a query and how many seconds generating it took"""
+        query = self.normalize(query)
+        entry = _CachedResponse(scope, query, self._embed(query), response, latency, time.time() + self.ttl)
+        with self._lock:
+            self._insert(self.key(scope, query), entry)
+            if self.path:
+                self._append(entry)
+
+    @staticmethod
+    def _line(entry: _CachedResponse) -> str:
+        """JSON line of an entry in the cache file"""
+        record = {
+            "scope": entry.scope,
+            "query": entry.query,
+            "vector": entry.vector.tolist() if entry.vector is not None else None,
+            "response": entry.response,
+            "latency": entry.latency,
+            "expires_at": entry.expires_at,
+        }
+        return json.dumps(record) + "\n"
+
+    def _append(self, entry: _CachedResponse) -> None:
+        """Write an entry to the end of the cache file"""
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(self._line(entry))
+
+    def _load(self) -> None:
+        """Replay the cache file, then rewrite it with only the live entries"""
+        now = time.time()
+        lines = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                lines += 1
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash mid-write
+                    continue
+                if record["expires_at"] <= now:
+                    continue
+                vector = record["vector"]
+                record["vector"] = np.asarray(vector, dtype=np.float32) if vector is not None else None
+                self._insert(self.key(record["scope"], record["query"]), _CachedResponse(**record))
+
+        if lines > len(self._entries):
+            # Drop expired, evicted and overwritten entries from the file
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.writelines(self._line(entry) for entry in self._entries.values())
+            os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        """Drop every entry, in memory and on disk"""
+        with self._lock:
+            self._entries.clear()
+            self._scopes.clear()
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit counters per tier, hit rate and generation time saved"""
+        lookups = self.exact_hits + self.similar_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.similar_hits) / lookups if lookups else 0.0,
+            "saved_seconds": self.saved_seconds,
+            "items": len(self._entries),
+        }
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, Optional, Tuple
+
+from cookingassistant.data.item import Recipe
+
+
+def recipe_content_hash(recipe: Recipe) -> str:
+    """Hash of everything that is embedded or stored for a recipe"""
+    content = [
+        recipe.name,
+        [[ing.name, ing.is_common] for ing in recipe.ingredients],
+        recipe.instructions,
+    ]
+    # Only part of the hash when set, so hashes of uncategorized recipes
+    # stay the same as before categories existed
+    if recipe.category:
+        content.append(recipe.category)
+    content = json.dumps(content, ensure_ascii=False)
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class IngestionCheckpoint:
+    """
+    Checkpoint manifest for resumable recipe ingestion.
+
+    The manifest itself is a small JSON file holding the offset of the last
+    committed batch, rewritten atomically after every batch. Content hashes
+    per recipe id are appended to a sidecar `<path>.hashes` log (last entry
+    wins) so a commit never rewrites the whole hash table.
+    """
+
+    def __init__(self, path: str, embedding_model: Optional[str] = None):
+        self.path = path
+        self.hashes_path = f"{path}.hashes"
+        self.embedding_model = embedding_model
+        self.offset = 0
+        self.completed = False
+        self.hashes: Dict[str, str] = {}
+        # Set by a reset until the next run completes: the collection may
+        # already hold any recipe id, so every row has to be upserted
+        self.upsert_all = False
+        self._load()
+
+    def _load(self) -> None:
+        """Load the manifest and the hash log if they exist"""
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        if self.embedding_model and manifest.get("embedding_model") != self.embedding_model:
+            # Every stored vector is stale, start over
+            print(
+                f"Checkpoint {self.path} was built with "
+                f"{manifest.get('embedding_model')}, ignoring it"
+            )
+            self.reset()
+            return
+
+        self.offset = manifest.get("offset", 0)
+        self.completed = manifest.get("completed", False)
+        self.upsert_all = manifest.get("upsert_all", False)
+
+        if os.path.exists(self.hashes_path):
+            with open(self.hashes_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    recipe_id, _, content_hash = line.rstrip("\n").rpartition("\t")
+                    if recipe_id:
+                        self.hashes[recipe_id] = content_hash
+
+    def reset(self) -> None:
+        """Forget all progress and hashes; the next run upserts everything"""
+        self.offset = 0
+        self.completed = False
+        self.hashes = {}
+        self.upsert_all = True
+        if os.path.exists(self.hashes_path):
+            os.remove(self.hashes_path)
+        self.save()
+
+    def start(self) -> int:
+        """Begin a run and return the number of records to skip"""
+        if self.completed:
+            # Previous run finished: walk the whole dataset again and let the
+            # content hashes decide what needs to be re-embedded
+            self.offset = 0
+            self.completed = False
+        return self.offset
+
+    def is_known(self, recipe_id: str) -> bool:
+        """Check whether a recipe id has been committed before"""
+        return recipe_id in self.hashes
+
+    def is_changed(self, recipe_id: str, content_hash: str) -> bool:
+        """Check whether a recipe is new or its content changed"""
+        return self.hashes.get(recipe_id) != content_hash
+
+    def commit(self, offset: int, hashes: Iterable[Tuple[str, str]]) -> None:
+        """Record a batch as written up to `offset` records"""
+        lines = []
+        for recipe_id, content_hash in hashes:
+            self.hashes[recipe_id] = content_hash
+            lines.append(f"{recipe_id}\t{content_hash}\n")
+
+        if lines:
+            self._make_directory()
+            with open(self.hashes_path, "a", encoding="utf-8") as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+
+        self.offset = offset
+        self.save()
+
+    def finish(self) -> None:
+        """Mark the run as completed and compact the hash log"""
+        tmp_path = f"{self.hashes_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(
+                f"{recipe_id}\t{content_hash}\n"
+                for recipe_id, content_hash in self.hashes.items()
+            )
+        os.replace(tmp_path, self.hashes_path)
+
+        self.completed = True
+        self.upsert_all = False
+        self.save()
+
+    def _make_directory(self) -> None:
+        """Create the directory of the manifest and the hash log"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def save(self) -> None:
+        """Atomically write the manifest"""
+        self._make_directory()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "embedding_model": self.embedding_model,
+                    "offset": self.offset,
+                    "completed": self.completed,
+                    "upsert_all": self.upsert_all,
+                    "recipes": len(self.hashes),
+                },
+                f,
+            )
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,196 @@
+import json
+import threading
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+import numpy as np
+
+from cookingassistant.data.normalize import ingredient_tokens
+
+
+class IngredientIndex:
+    """
+    Inverted index from normalized ingredient tokens to recipes.
+
+    Every recipe gets a dense integer ordinal; each token maps to the sorted
+    int32 array of ordinals of the recipes whose ingredients contain it, so
+    "recipes with all/most of these ingredients" is answered with array
+    intersections and counts instead of a vector search. A detected
+    ingredient of several words ("bell pepper") matches a recipe that has
+    all of its words.
+
+    Postings are appended while building and frozen into arrays on the
+    first query after a change. Re-adding a recipe id tombstones its old
+    ordinal.
+    """
+
+    def __init__(self):
+        self._ids: List[str] = []
+        self._ordinals: Dict[str, int] = {}
+        # Ingredient count per ordinal, appended to _building_sizes and
+        # frozen like the postings
+        self._sizes = np.zeros(0, dtype=np.int32)
+        self._building_sizes: List[int] = []
+        self._building: Dict[str, List[int]] = {}
+        self._postings: Dict[str, np.ndarray] = {}
+        self._deleted: List[int] = []
+        self._deleted_mask = np.zeros(0, dtype=bool)
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ordinals)
+
+    def add(self, recipe_id: str, ingredient_names: Iterable[str]) -> None:
+        """Index (or re-index) the ingredients of a recipe"""
+        tokens = set()
+        size = 0
+        for name in ingredient_names:
+            tokens |= ingredient_tokens(name)
+            size += 1
+
+        with self._lock:
+            previous = self._ordinals.get(recipe_id)
+            if previous is not None:
+                self._deleted.append(previous)
+
+            ordinal = len(self._ids)
+            self._ids.append(recipe_id)
+            self._ordinals[recipe_id] = ordinal
+            self._building_sizes.append(size)
+            for token in tokens:
+                self._building.setdefault(token, []).append(ordinal)
+            self._dirty = True
+
+    def _freeze(self) -> Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray]:
+        """
+        Merge appended postings into the sorted arrays and return the
+        postings, deleted mask and sizes, taken together under the lock.
+        Frozen state is replaced, never modified, so queries can read a
+        snapshot while recipes are being added.
+        """
+        with self._lock:
+            if self._dirty:
+                postings = dict(self._postings)
+                for token, ordinals in self._building.items():
+                    added = np.asarray(ordinals, dtype=np.int32)
+                    existing = postings.get(token)
+                    # Ordinals only grow, so appending keeps the arrays sorted
+                    postings[token] = (
+                        added if existing is None else np.concatenate([existing, added])
+                    )
+                self._postings = postings
+                self._building = {}
+                self._sizes = np.concatenate([self._sizes, np.asarray(self._building_sizes, dtype=np.int32)])
+                self._building_sizes = []
+                deleted_mask = np.zeros(len(self._ids), dtype=bool)
+                deleted_mask[self._deleted] = True
+                self._deleted_mask = deleted_mask
+                self._dirty = False
+            return self._postings, self._deleted_mask, self._sizes
+
+    @staticmethod
+    def _query_tokens(ingredient_names: Iterable[str]) -> List[FrozenSet[str]]:
+        """Token sets of the query's ingredients, once each ("egg" and "eggs" are one)"""
+        return list(dict.fromkeys(
+            tokens for tokens in map(ingredient_tokens, ingredient_names) if tokens
+        ))
+
+    @staticmethod
+    def _ingredient_postings(
+        tokens: FrozenSet[str], postings: Dict[str, np.ndarray], deleted_mask: np.ndarray
+    ) -> np.ndarray:
+        """Ordinals of recipes containing every word of an ingredient"""
+        arrays = sorted(
+            (postings.get(token, np.zeros(0, dtype=np.int32)) for token in tokens),
+            key=len,
+        )
+        result = arrays[0]
+        for array in arrays[1:]:
+            result = np.intersect1d(result, array, assume_unique=True)
+        return result[~deleted_mask[result]]
+
+    def match_all(self, ingredient_names: Iterable[str]) -> List[str]:
+        """Ids of recipes that contain every given ingredient"""
+        postings, deleted_mask, _ = self._freeze()
+        matches = [
+            self._ingredient_postings(tokens, postings, deleted_mask)
+            for tokens in self._query_tokens(ingredient_names)
+        ]
+        if not matches:
+            return []
+
+        matches.sort(key=len)
+        result = matches[0]
+        for array in matches[1:]:
+            if len(result) == 0:
+                break
+            result = np.intersect1d(result, array, assume_unique=True)
+        return [self._ids[ordinal] for ordinal in result]
+
+    def match_most(
+        self, ingredient_names: Iterable[str], limit: int = 10, min_matches: int = 1
+    ) -> List[str]:
+        """
+        Ids of the recipes containing the most given ingredients, best first.
+        Ties go to recipes with fewer ingredients overall, as more of each of
+        those is covered.
+        """
+        postings, deleted_mask, sizes = self._freeze()
+        matches = [
+            self._ingredient_postings(tokens, postings, deleted_mask)
+            for tokens in self._query_tokens(ingredient_names)
+        ]
+        if not matches:
+            return []
+
+        ordinals, counts = np.unique(np.concatenate(matches), return_counts=True)
+        keep = counts >= min_matches
+        ordinals, counts = ordinals[keep], counts[keep]
+
+        # lexsort sorts by the last key first
+        order = np.lexsort((sizes[ordinals], -counts))[:limit]
+        return [self._ids[ordinal] for ordinal in ordinals[order]]
+
+    def save(self, path: str) -> None:
+        """Write the index to an .npz file"""
+        postings, deleted_mask, sizes = self._freeze()
+        tokens = sorted(postings)
+        lengths = [len(postings[token]) for token in tokens]
+        np.savez(
+            path,
+            tokens=np.asarray(json.dumps(tokens)),
+            # Recipes added after the snapshot are left out
+            ids=np.asarray(json.dumps(self._ids[:len(sizes)])),
+            offsets=np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)]),
+            postings=(
+                np.concatenate([postings[token] for token in tokens])
+                if tokens else np.zeros(0, dtype=np.int32)
+            ),
+            sizes=sizes,
+            deleted=np.flatnonzero(deleted_mask).astype(np.int32),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "IngredientIndex":
+        """Read an index written by save()"""
+        index = cls()
+        with np.load(path) as data:
+            tokens = json.loads(str(data["tokens"]))
+            offsets = data["offsets"]
+            postings = data["postings"]
+            index._ids = json.loads(str(data["ids"]))
+            index._sizes = data["sizes"].astype(np.int32)
+            index._deleted = data["deleted"].tolist()
+
+        index._postings = {
+            token: postings[offsets[i]:offsets[i + 1]] for i, token in enumerate(tokens)
+        }
+        deleted = set(index._deleted)
+        index._ordinals = {
+            recipe_id: ordinal
+            for ordinal, recipe_id in enumerate(index._ids)
+            if ordinal not in deleted
+        }
+        index._deleted_mask = np.zeros(len(index._ids), dtype=bool)
+        index._deleted_mask[index._deleted] = True
+        return index
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional
 
 
 @dataclass
@@ -15,6 +15,6 @@ class Recipe:
     name: str
     ingredients: List[Ingredient]
     instructions: str
-    # category: str
+    category: Optional[str] = None
     # preparation_time: int  # in minutes
     # difficulty_level: str  # "easy", "medium", "hard"
\ No newline at end of file
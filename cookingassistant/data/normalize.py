@@ -0,0 +1,95 @@
+import re
+from functools import lru_cache
+from typing import FrozenSet, Iterable, Tuple
+
+# Plural forms that the suffix rules below get wrong
+_IRREGULAR_PLURALS = {
+    "leaves": "leaf",
+    "loaves": "loaf",
+    "halves": "half",
+    "knives": "knife",
+    "calves": "calf",
+    "geese": "goose",
+    "mice": "mouse",
+    "teeth": "tooth",
+    "feet": "foot",
+    "cookies": "cookie",
+    "pies": "pie",
+    "brownies": "brownie",
+    "smoothies": "smoothie",
+    "anchovies": "anchovy",
+}
+
+# Words ending in "s" that are already singular
+_UNINFLECTED = {
+    "asparagus",
+    "citrus",
+    "couscous",
+    "hummus",
+    "molasses",
+    "octopus",
+    "swiss",
+    "series",
+    "species",
+    "grits",
+    "chips",
+    "bus",
+    "gas",
+    "lettuce",
+}
+
+# Words in ingredient descriptions that don't identify the ingredient
+_STOPWORDS = {
+    "a", "an", "and", "as", "for", "in", "of", "or", "the", "to", "with",
+    "cup", "g", "kg", "lb", "oz", "tbsp", "tsp", "tablespoon", "teaspoon",
+    "large", "medium", "small", "fresh", "raw", "chopped", "diced", "minced",
+    "sliced", "whole", "optional", "taste",
+}
+
+_SEPARATORS = re.compile(r"[\s_\-]+")
+_WORDS = re.compile(r"[a-z]+")
+
+
+def singularize(word: str) -> str:
+    """Turn a lowercase English noun into its singular form"""
+    if word in _IRREGULAR_PLURALS:
+        return _IRREGULAR_PLURALS[word]
+    if len(word) <= 3 or word in _UNINFLECTED or not word.endswith("s"):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith("oes"):
+        return word[:-2]
+    if word.endswith(("ches", "shes", "sses", "xes", "zes")):
+        return word[:-2]
+    if word.endswith(("ss", "us", "is")):
+        return word
+    return word[:-1]
+
+
+@lru_cache(maxsize=65536)
+def normalize_ingredient_name(name: str) -> str:
+    """Lowercase, collapse separators and singularize every word of a name"""
+    words = _SEPARATORS.split(name.strip().lower())
+    return " ".join(singularize(word) for word in words if word)
+
+
+def canonical_ingredients(names: Iterable[str]) -> Tuple[str, ...]:
+    """Order-insensitive canonical form of a set of ingredient names"""
+    return tuple(sorted({n for n in map(normalize_ingredient_name, names) if n}))
+
+
+@lru_cache(maxsize=65536)
+def ingredient_tokens(text: str) -> FrozenSet[str]:
+    """Singular, lowercase content words of an ingredient description"""
+    words = (singularize(word) for word in _WORDS.findall(text.lower()))
+    return frozenset(word for word in words if word not in _STOPWORDS)
+
+
+@lru_cache(maxsize=65536)
+def ingredient_head(text: str) -> str:
+    """
+    Normalized main food of an ingredient description: the part before the
+    first comma, as in "onions, raw" or "pepper, black"
+    """
+    return normalize_ingredient_name(text.split(",", 1)[0])
@@ -0,0 +1,107 @@
+import json
+import re
+from typing import Any, Dict, Iterator, Optional
+
+from cookingassistant.data.item import Ingredient, Recipe
+
+# Characters a JSON number can continue with
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*")
+
+
+class IngredientPool:
+    """Interns Ingredient objects so recipes sharing an ingredient share one instance"""
+
+    def __init__(self):
+        self._ingredients: Dict[str, Ingredient] = {}
+
+    def get(self, name: str, is_common: bool = False) -> Ingredient:
+        """Get the shared Ingredient for a name, creating it on first use"""
+        ingredient = self._ingredients.get(name)
+        if ingredient is None:
+            ingredient = Ingredient(name, is_common=is_common)
+            self._ingredients[name] = ingredient
+        return ingredient
+
+    def __len__(self) -> int:
+        return len(self._ingredients)
+
+
+def iter_json_array(path: str, chunk_size: int = 1 << 20) -> Iterator[Any]:
+    """
+    Incrementally parse a file holding one top-level JSON array and yield
+    its elements one at a time. Only the element being parsed and one read
+    chunk are kept in memory.
+    """
+    decoder = json.JSONDecoder()
+
+    with open(path, "r", encoding="utf-8") as f:
+        # Leading whitespace may span whole chunks
+        buffer = ""
+        eof = False
+        while not buffer and not eof:
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = chunk.lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{path} does not contain a JSON array")
+        pos = 1
+
+        while True:
+            # Skip whitespace and separators between elements
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+
+            if pos < len(buffer):
+                try:
+                    element, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    # A number running to the end of the buffer may continue
+                    # in the next chunk ("123" of "12345")
+                    truncated = (
+                        not eof
+                        and isinstance(element, (int, float))
+                        and not isinstance(element, bool)
+                        and _NUMBER_TAIL.fullmatch(buffer, end) is not None
+                    )
+                    if not truncated:
+                        pos = end
+                        yield element
+                        continue
+
+            if eof:
+                raise ValueError(f"Unexpected end of file in {path}")
+
+            # The current element is incomplete, read more of the file
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+
+def recipe_from_record(record: Dict[str, Any], ingredient_pool: IngredientPool) -> Recipe:
+    """Build a Recipe from one record of recipes_with_nutritional_info.json"""
+    return Recipe(
+        id=record["id"],
+        name=record["title"],
+        ingredients=[ingredient_pool.get(i["text"]) for i in record["ingredients"]],
+        instructions="\n".join(i["text"] for i in record["instructions"]),
+    )
+
+
+def iter_recipes(
+    path: str,
+    ingredient_pool: Optional[IngredientPool] = None,
+    chunk_size: int = 1 << 20,
+) -> Iterator[Recipe]:
+    """Stream Recipe objects from the recipe dataset in constant memory"""
+    if ingredient_pool is None:
+        ingredient_pool = IngredientPool()
+
+    for record in iter_json_array(path, chunk_size=chunk_size):
+        yield recipe_from_record(record, ingredient_pool)
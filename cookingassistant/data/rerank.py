@@ -0,0 +1,136 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from cookingassistant.data.item import Ingredient
+from cookingassistant.data.normalize import ingredient_head, ingredient_tokens
+
+
+class IngredientOverlapReranker:
+    """
+    Reranks ANN candidates by exact ingredient overlap with the detected
+    ingredients.
+
+    Each candidate gets three scores in [0, 1]:
+    - query coverage: share of detected ingredients the recipe uses
+    - recipe coverage: share of the recipe's non-common ingredients that
+      were detected; common ingredients (per the registry) are assumed to
+      be in the pantry and don't count against a recipe
+    - the ANN similarity, when candidates carry a "score"
+    and is ordered by their weighted sum. Matching is done on token sets:
+    a detected ingredient matches a recipe ingredient when all its words
+    appear in the recipe ingredient's description.
+    """
+
+    def __init__(self, common_ingredients=None,
+                 query_weight: float = 0.5,
+                 recipe_weight: float = 0.3,
+                 similarity_weight: float = 0.2):
+        self.common_ingredients = common_ingredients
+        self.query_weight = query_weight
+        self.recipe_weight = recipe_weight
+        self.similarity_weight = similarity_weight
+        # Registry answers per ingredient description; descriptions repeat
+        # heavily across recipes
+        self._common_by_name: Dict[str, bool] = {}
+
+    def _is_common(self, ingredient: Dict[str, Any]) -> bool:
+        """Check whether a recipe ingredient is a pantry staple"""
+        if ingredient.get("is_common"):
+            return True
+        if self.common_ingredients is None:
+            return False
+
+        name = ingredient["name"]
+        common = self._common_by_name.get(name)
+        if common is None:
+            common = self.common_ingredients.is_common(ingredient_head(name))
+            self._common_by_name[name] = common
+        return common
+
+    def score(
+        self, candidates: Sequence[Dict[str, Any]], ingredients: List[Ingredient]
+    ) -> np.ndarray:
+        """Combined relevance score of every candidate"""
+        n_candidates = len(candidates)
+        if n_candidates == 0:
+            return np.zeros(0)
+
+        # Vocabulary of the words in the detected ingredients
+        query_tokens = [ingredient_tokens(ing.name) for ing in ingredients]
+        query_tokens = [tokens for tokens in query_tokens if tokens]
+        vocabulary = {word: i for i, word in enumerate(set().union(*query_tokens))}
+
+        # Query word incidence, one column per detected ingredient
+        query_matrix = np.zeros((len(vocabulary), len(query_tokens)), dtype=np.float32)
+        for j, tokens in enumerate(query_tokens):
+            query_matrix[[vocabulary[word] for word in tokens], j] = 1.0
+        query_sizes = query_matrix.sum(axis=0)
+
+        # Flatten the ingredients of all candidates into one token matrix
+        owners: List[int] = []
+        rows: List[int] = []
+        cols: List[int] = []
+        common: List[bool] = []
+        for c, candidate in enumerate(candidates):
+            for ingredient in candidate.get("ingredients", ()):
+                row = len(owners)
+                owners.append(c)
+                common.append(self._is_common(ingredient))
+                for word in ingredient_tokens(ingredient["name"]):
+                    col = vocabulary.get(word)
+                    if col is not None:
+                        rows.append(row)
+                        cols.append(col)
+
+        n_ingredients = len(owners)
+        owner = np.asarray(owners, dtype=np.int64)
+        token_matrix = np.zeros((n_ingredients, len(vocabulary)), dtype=np.float32)
+        token_matrix[rows, cols] = 1.0
+
+        # matches[i, j]: recipe ingredient i contains every word of query j
+        matches = (token_matrix @ query_matrix) >= query_sizes
+        if len(query_tokens) == 0:
+            matches = np.zeros((n_ingredients, 0), dtype=bool)
+
+        # Share of detected ingredients used by each candidate
+        used = np.zeros((n_candidates, len(query_tokens)), dtype=bool)
+        hit_rows, hit_queries = np.nonzero(matches)
+        used[owner[hit_rows], hit_queries] = True
+        query_coverage = used.mean(axis=1) if len(query_tokens) else np.zeros(n_candidates)
+
+        # Share of each candidate's non-common ingredients that were detected
+        needed = ~np.asarray(common, dtype=bool)
+        matched = matches.any(axis=1) & needed
+        needed_count = np.bincount(owner, weights=needed, minlength=n_candidates)
+        matched_count = np.bincount(owner, weights=matched, minlength=n_candidates)
+        recipe_coverage = np.divide(
+            matched_count, needed_count,
+            out=np.zeros(n_candidates), where=needed_count > 0,
+        )
+
+        similarity = np.fromiter(
+            (candidate.get("score") or 0.0 for candidate in candidates),
+            dtype=np.float64,
+            count=n_candidates,
+        )
+
+        return (
+            self.query_weight * query_coverage
+            + self.recipe_weight * recipe_coverage
+            + self.similarity_weight * similarity
+        )
+
+    def rerank(
+        self,
+        candidates: Sequence[Dict[str, Any]],
+        ingredients: List[Ingredient],
+        top_n: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Order candidates by relevance, best first"""
+        scores = self.score(candidates, ingredients)
+        # Stable sort keeps the ANN order between equally scored candidates
+        order = np.argsort(-scores, kind="stable")
+        if top_n is not None:
+            order = order[:top_n]
+        return [candidates[i] for i in order]
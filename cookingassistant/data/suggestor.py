@@ -3,18 +3,45 @@ from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from typing import Any, Dict, List, Optional, Tuple
 
+from cookingassistant.data.ingredient_index import IngredientIndex
 from cookingassistant.data.item import Ingredient, Recipe
-from cookingassistant.database import CommonIngredientsRegistry, RecipeDatabase
+from cookingassistant.data.rerank import IngredientOverlapReranker
+from cookingassistant.database import (SCORE_FIELD, CommonIngredientsRegistry,
+                                       RecipeDatabase)
 
 
 class RecipeSuggestor:
     """Class that processes user queries to find suitable recipes"""
+    # Fields fetched for reranking candidates in two-stage mode
+    CANDIDATE_FIELDS = ("id", "name", "ingredients", SCORE_FIELD)
+    # Retrieval strategies: embedding search, inverted ingredient index, or
+    # both fused by reciprocal rank
+    STRATEGIES = ("vector", "inverted", "hybrid")
+    # Damping constant of reciprocal rank fusion
+    RRF_K = 60
     
     def __init__(self, 
                  recipe_db: RecipeDatabase, 
-                 common_ingredients: CommonIngredientsRegistry):
+                 common_ingredients: CommonIngredientsRegistry,
+                 two_stage: bool = False,
+                 candidate_pool: int = 200,
+                 top_n: int = 3,
+                 strategy: str = "vector",
+                 ingredient_index: Optional[IngredientIndex] = None):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown retrieval strategy: {strategy}")
+        if strategy != "vector" and ingredient_index is None:
+            raise ValueError(f"The {strategy} strategy needs an ingredient index")
         self.recipe_db = recipe_db
         self.common_ingredients = common_ingredients
+        # Two-stage mode: recall `candidate_pool` recipes from the ANN index,
+        # rerank them by exact ingredient overlap and hydrate the top `top_n`
+        self.two_stage = two_stage
+        self.candidate_pool = candidate_pool
+        self.top_n = top_n
+        self.reranker = IngredientOverlapReranker(common_ingredients)
+        self.strategy = strategy
+        self.ingredient_index = ingredient_index
     
     def extract_category_from_query(self, query: str) -> Optional[str]:
         """Extract the dish category from the user's query"""
@@ -23,13 +50,104 @@ class RecipeSuggestor:
     
     def filter_common_ingredients(self, ingredients: List[Ingredient]) -> List[Ingredient]:
         """Filter out common ingredients for recipe matching"""
-        return [ing for ing in ingredients if not self.common_ingredients.is_common(ing.name)]
+        return self.common_ingredients.filter_many(ingredients)
     
-    def find_matching_recipes(self, ingredients: List[Ingredient], user_query: str) -> List[Recipe]:
-        """Find recipes that match the recognized ingredients and user query"""
+    def find_matching_recipes(self, ingredients: List[Ingredient], user_query: str,
+                              strategy: Optional[str] = None) -> List[Recipe]:
+        """
+        Find recipes that match the recognized ingredients and user query,
+        using `strategy` or the suggestor's default one
+        """
+        strategy = strategy or self.strategy
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown retrieval strategy: {strategy}")
+
         category = self.extract_category_from_query(user_query)
         filtered_ingredients = self.filter_common_ingredients(ingredients)
-        return self.recipe_db.find_recipes_by_ingredients(filtered_ingredients, category)
+        if strategy == "vector":
+            return self._find_by_vector(filtered_ingredients, category)
+
+        if self.ingredient_index is None:
+            raise ValueError(f"The {strategy} strategy needs an ingredient index")
+        names = [ing.name for ing in filtered_ingredients]
+        if strategy == "inverted":
+            # The index knows nothing about categories
+            recipe_ids = self.ingredient_index.match_most(names, limit=self.top_n)
+            return self.recipe_db.get_recipes_by_ids(recipe_ids)
+
+        index_ids = self.ingredient_index.match_most(names, limit=self.candidate_pool)
+        vector_ids = [
+            candidate["id"]
+            for candidate in self.recipe_db.find_recipes_by_ingredients(
+                filtered_ingredients, category, self.candidate_pool, fields=("id",)
+            )
+        ]
+        fused = self.fuse_rankings([vector_ids, index_ids], self.RRF_K)
+        return self.recipe_db.get_recipes_by_ids(fused[:self.top_n])
+
+    def _find_by_vector(self, filtered_ingredients: List[Ingredient],
+                        category: Optional[str]) -> List[Recipe]:
+        """Find recipes by embedding search, reranked in two-stage mode"""
+        if not self.two_stage:
+            return self.recipe_db.find_recipes_by_ingredients(filtered_ingredients, category, self.top_n)
+
+        # Wide recall with lightweight fields only
+        candidates = self.recipe_db.find_recipes_by_ingredients(
+            filtered_ingredients, category, self.candidate_pool, fields=self.CANDIDATE_FIELDS
+        )
+        best = self.reranker.rerank(candidates, filtered_ingredients, top_n=self.top_n)
+
+        # Full recipe bodies only for the final picks
+        return self.recipe_db.get_recipes_by_ids([candidate["id"] for candidate in best])
+
+    async def afind_matching_recipes(self, ingredients: List[Ingredient], user_query: str,
+                                     strategy: Optional[str] = None) -> List[Recipe]:
+        """Async find_matching_recipes, awaiting the database calls"""
+        strategy = strategy or self.strategy
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown retrieval strategy: {strategy}")
+
+        category = self.extract_category_from_query(user_query)
+        filtered_ingredients = self.filter_common_ingredients(ingredients)
+        if strategy == "vector":
+            if not self.two_stage:
+                return await self.recipe_db.afind_recipes_by_ingredients(
+                    filtered_ingredients, category, self.top_n
+                )
+            candidates = await self.recipe_db.afind_recipes_by_ingredients(
+                filtered_ingredients, category, self.candidate_pool, fields=self.CANDIDATE_FIELDS
+            )
+            best = self.reranker.rerank(candidates, filtered_ingredients, top_n=self.top_n)
+            return await self.recipe_db.aget_recipes_by_ids([candidate["id"] for candidate in best])
+
+        if self.ingredient_index is None:
+            raise ValueError(f"The {strategy} strategy needs an ingredient index")
+        names = [ing.name for ing in filtered_ingredients]
+        if strategy == "inverted":
+            recipe_ids = self.ingredient_index.match_most(names, limit=self.top_n)
+            return await self.recipe_db.aget_recipes_by_ids(recipe_ids)
+
+        index_ids = self.ingredient_index.match_most(names, limit=self.candidate_pool)
+        vector_ids = [
+            candidate["id"]
+            for candidate in await self.recipe_db.afind_recipes_by_ingredients(
+                filtered_ingredients, category, self.candidate_pool, fields=("id",)
+            )
+        ]
+        fused = self.fuse_rankings([vector_ids, index_ids], self.RRF_K)
+        return await self.recipe_db.aget_recipes_by_ids(fused[:self.top_n])
+
+    @staticmethod
+    def fuse_rankings(rankings: List[List[str]], k: int = 60) -> List[str]:
+        """
+        Reciprocal rank fusion: score every id by the sum of 1 / (k + rank)
+        over the rankings it appears in, best first
+        """
+        scores: Dict[str, float] = {}
+        for ranking in rankings:
+            for rank, recipe_id in enumerate(ranking, start=1):
+                scores[recipe_id] = scores.get(recipe_id, 0.0) + 1.0 / (k + rank)
+        return sorted(scores, key=scores.get, reverse=True)
     
     def rank_recipes(self, recipes: List[Recipe], user_query: str) -> List[Recipe]:
         """Rank recipes based on relevance to user query and available ingredients"""
@@ -1,43 +1,99 @@
+import asyncio
 import json
 import os
+import threading
+import time
 import uuid
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from itertools import islice
+from typing import (Any, Dict, FrozenSet, Iterable, Iterator, List, Optional,
+                    Sequence, Tuple)
 
+import numpy as np
 from pymilvus import (Collection, CollectionSchema, DataType, FieldSchema,
-                      MilvusClient, connections, utility)
+                      MilvusClient, MilvusException, connections, utility)
 from sentence_transformers import SentenceTransformer
 
+from cookingassistant.aio import run_in_executor
+from cookingassistant.cache import EmbeddingCache, TTLCache
+from cookingassistant.data.checkpoint import (IngestionCheckpoint,
+                                              recipe_content_hash)
+from cookingassistant.data.ingredient_index import IngredientIndex
 from cookingassistant.data.item import Ingredient, Recipe
+from cookingassistant.data.normalize import (canonical_ingredients,
+                                             normalize_ingredient_name)
+
+
+# Fields of a serialized recipe that searches can be asked to return
+RECIPE_FIELDS = ("id", "name", "ingredients", "instructions", "category")
+# Extra field searches add on request: cosine similarity to the query
+SCORE_FIELD = "score"
+
+
+def _batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Yield successive lists of at most `size` items from an iterable"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
 
 
 class CommonIngredientsRegistry:
-    """Registry for common ingredients that should be ignored in recipe matching"""
+    """
+    Registry for common ingredients that should be ignored in recipe matching.
+
+    The vocabulary is read from a text file with one ingredient per line,
+    its canonical name followed by comma separated synonyms. Every name is
+    normalized (lowercase, singular words), so membership is one hash lookup
+    whatever the vocabulary size, and plural spellings match as well.
+    """
+    DEFAULT_VOCABULARY = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "data", "common_ingredients.txt"
+    )
+    # Opt-in: also ignores butter, flour, sugar, sauces, spices, ...
+    PANTRY_VOCABULARY = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "data", "pantry_staples.txt"
+    )
 
-    def __init__(self):
+    def __init__(self, vocabulary_path: Optional[str] = None):
+        self.vocabulary_path = vocabulary_path or self.DEFAULT_VOCABULARY
+        # Normalized name or synonym -> canonical name
+        self.vocabulary: Dict[str, str] = {}
         self.common_ingredients = self._initialize_common_ingredients()
+        self._names: FrozenSet[str] = frozenset(self.vocabulary)
 
     def _initialize_common_ingredients(self) -> List[Ingredient]:
-        """Initialize the list of common ingredients"""
-        from cookingassistant.data.item import Ingredient
+        """Load the common ingredients and their synonyms"""
+        common_ingredients = []
+        with open(self.vocabulary_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
 
-        return [
-            Ingredient("salt", True),
-            Ingredient("pepper", True),
-            Ingredient("onion", True),
-            Ingredient("garlic", True),
-            Ingredient("tomato", True),
-            Ingredient("oil", True),
-            # Add more common ingredients
-        ]
+                canonical, *synonyms = [name.strip() for name in line.split(",")]
+                common_ingredients.append(Ingredient(canonical, True))
+                for name in (canonical, *synonyms):
+                    normalized = normalize_ingredient_name(name)
+                    if normalized:
+                        self.vocabulary.setdefault(normalized, canonical)
+        return common_ingredients
 
     def is_common(self, ingredient_name: str) -> bool:
         """Check if an ingredient is in the common ingredients list"""
-        return any(
-            ing.name.lower() == ingredient_name.lower()
-            for ing in self.common_ingredients
-        )
+        return normalize_ingredient_name(ingredient_name) in self._names
+
+    def filter_many(self, ingredients: Iterable[Ingredient]) -> List[Ingredient]:
+        """Keep only the ingredients that are not common"""
+        names = self._names
+        return [
+            ing for ing in ingredients
+            if normalize_ingredient_name(ing.name) not in names
+        ]
 
     def get_all_common_ingredients(self) -> List[Ingredient]:
         """Get all common ingredients"""
@@ -58,8 +114,20 @@ class RecipeDatabase(ABC):
         ingredients: List[Ingredient],
         category: Optional[str] = None,
         top_n: int = 3,
+        fields: Optional[Sequence[str]] = None,
     ) -> List["Recipe"]:
-        """Find recipes that match the given ingredients, optionally filtered by category"""
+        """
+        Find recipes that match the given ingredients, optionally filtered by
+        category. `fields` limits the returned recipe fields (see RECIPE_FIELDS)
+        and may include SCORE_FIELD to get the similarity of each hit.
+        """
+        pass
+
+    @abstractmethod
+    def get_recipes_by_ids(
+        self, recipe_ids: List[str], fields: Optional[Sequence[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Fetch serialized recipes by id, in the given order, skipping unknown ids"""
         pass
 
     @abstractmethod
@@ -67,24 +135,572 @@ class RecipeDatabase(ABC):
         """Get a specific recipe by ID"""
         pass
 
+    async def afind_recipes_by_ingredients(
+        self,
+        ingredients: List[Ingredient],
+        category: Optional[str] = None,
+        top_n: int = 3,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Recipe]:
+        """Async find_recipes_by_ingredients, run in a worker thread by default"""
+        return await run_in_executor(
+            None, self.find_recipes_by_ingredients, ingredients, category, top_n, fields
+        )
+
+    async def aget_recipes_by_ids(
+        self, recipe_ids: List[str], fields: Optional[Sequence[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Async get_recipes_by_ids, run in a worker thread by default"""
+        return await run_in_executor(None, self.get_recipes_by_ids, recipe_ids, fields)
+
 
 class SQLRecipeDatabase(RecipeDatabase):
     pass
 
 
-class VectorRecipeDatabase(RecipeDatabase):
-    """Vector database implementation using Milvus for recipe storage and retrieval"""
+class EmbeddingRecipeDatabase(RecipeDatabase):
+    """
+    Base class for recipe databases that search by text embeddings.
+
+    Holds the embedding model, the embedding and search result caches, and
+    the bulk ingestion pipeline. Subclasses provide the storage: how a row
+    is built, written and searched.
+    """
     # Vector dimensions - depends on the embedding model used
     VECTOR_DIM = 384
+    # Number of texts the embedding model encodes per forward pass
+    ENCODE_BATCH_SIZE = 64
+    # Name used in connection errors
+    DATABASE_NAME = "database"
+    # Threads of the async API: embedding is CPU bound, blocking storage
+    # calls mostly wait on I/O
+    ASYNC_EMBEDDING_WORKERS = 2
+    ASYNC_IO_WORKERS = 32
 
-    def __init__(self, embedding_model: str = "all-MiniLM-L6-v2", 
-                 RECIPE_COLLECTION = "recipes"):
-        """Initialize the vector database with an embedding model"""
+    def __init__(self, embedding_model: str = "all-MiniLM-L6-v2",
+                 embedding_cache: Optional[EmbeddingCache] = None,
+                 result_cache: Optional[TTLCache] = None,
+                 ingredient_index: Optional[IngredientIndex] = None):
+        """Initialize the database with an embedding model"""
+        if embedding_cache and embedding_cache.model_name != embedding_model:
+            raise ValueError(
+                f"Embedding cache was built for {embedding_cache.model_name}, "
+                f"not {embedding_model}"
+            )
         self.embedding_model_name = embedding_model
         self.embedding_model = None
-        self.client = None
+        self.embedding_cache = embedding_cache
+        # Search results keyed on (canonical ingredients, category, top_n,
+        # fields).
+        # Writes through this instance clear it; writes from other processes
+        # become visible once entries expire.
+        self.result_cache = result_cache
+        # Inverted ingredient index kept in sync with every recipe written
+        # through this instance
+        self.ingredient_index = ingredient_index
         self.connected = False
+        self._embedding_executor: Optional[ThreadPoolExecutor] = None
+        self._io_executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    @property
+    def embedding_executor(self) -> ThreadPoolExecutor:
+        """Bounded pool the async API embeds queries in"""
+        with self._executor_lock:
+            if self._embedding_executor is None:
+                self._embedding_executor = ThreadPoolExecutor(
+                    self.ASYNC_EMBEDDING_WORKERS, thread_name_prefix="embedding"
+                )
+            return self._embedding_executor
+
+    @property
+    def io_executor(self) -> ThreadPoolExecutor:
+        """Bounded pool the async API runs blocking storage calls in"""
+        with self._executor_lock:
+            if self._io_executor is None:
+                self._io_executor = ThreadPoolExecutor(
+                    self.ASYNC_IO_WORKERS, thread_name_prefix="recipe-db"
+                )
+            return self._io_executor
+
+    def _require_connection(self) -> None:
+        """Raise if the database is not connected"""
+        if not self.connected:
+            raise ConnectionError(f"Not connected to {self.DATABASE_NAME}")
+
+    def _generate_embedding(self, text: str) -> List[float]:
+        """Generate a vector embedding for text"""
+        if not self.embedding_model:
+            raise ValueError(
+                "Embedding model not initialized. Connect to database first."
+            )
+
+        if self.embedding_cache:
+            cached = self.embedding_cache.get(text)
+            if cached is not None:
+                return cached.tolist()
+
+        # Generate embedding
+        embedding = self.embedding_model.encode(text)
+        if self.embedding_cache:
+            self.embedding_cache.put(text, embedding)
+        return embedding.tolist()
+
+    def embed_text(self, text: str) -> List[float]:
+        """Embed a text with the database's model, e.g. to compare user queries"""
+        return self._generate_embedding(text)
+
+    def _generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Generate vector embeddings for many texts in one model call"""
+        if not self.embedding_model:
+            raise ValueError(
+                "Embedding model not initialized. Connect to database first."
+            )
+
+        if not self.embedding_cache:
+            embeddings = self.embedding_model.encode(
+                texts, batch_size=self.ENCODE_BATCH_SIZE
+            )
+            return embeddings.tolist()
+
+        # Only encode the texts that are not cached yet, once per cache key
+        embeddings = self.embedding_cache.get_many(texts)
+        missing: Dict[str, List[int]] = {}
+        for i, embedding in enumerate(embeddings):
+            if embedding is None:
+                missing.setdefault(self.embedding_cache.key(texts[i]), []).append(i)
+        if missing:
+            missing_texts = [texts[indices[0]] for indices in missing.values()]
+            encoded = self.embedding_model.encode(
+                missing_texts, batch_size=self.ENCODE_BATCH_SIZE
+            )
+            self.embedding_cache.put_many(missing_texts, encoded)
+            for indices, embedding in zip(missing.values(), encoded):
+                for i in indices:
+                    embeddings[i] = embedding
+        return [embedding.tolist() for embedding in embeddings]
+
+    @staticmethod
+    def _recipe_text(recipe: Recipe) -> str:
+        """Text that is embedded for a recipe (name and ingredients)"""
+        ingredient_names = [ing.name for ing in recipe.ingredients]
+        return f"{recipe.name} {' '.join(ingredient_names)}"
+
+    @staticmethod
+    def _recipe_data(recipe: Recipe) -> Dict[str, Any]:
+        """Serializable form of a recipe, as returned by searches"""
+        recipe_data = {
+            "id": recipe.id,
+            "name": recipe.name,
+            "ingredients": [
+                {"name": ing.name, "is_common": ing.is_common}
+                for ing in recipe.ingredients
+            ],
+            "instructions": recipe.instructions,
+        }
+        if recipe.category:
+            recipe_data["category"] = recipe.category
+        return recipe_data
+
+    @staticmethod
+    def _select_fields(
+        recipe_data: Dict[str, Any], fields: Optional[Sequence[str]]
+    ) -> Dict[str, Any]:
+        """Keep only the requested fields of a serialized recipe"""
+        if fields is None:
+            return recipe_data
+        return {field: recipe_data[field] for field in fields if field in recipe_data}
+
+    @staticmethod
+    def _copy_record(recipe_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy of a stored or cached record, so callers can't edit them through it"""
+        copied = dict(recipe_data)
+        if "ingredients" in copied:
+            copied["ingredients"] = [dict(ing) for ing in copied["ingredients"]]
+        return copied
+
+    @staticmethod
+    def _recipe_from_data(recipe_data: Dict[str, Any]) -> Recipe:
+        """Rebuild a Recipe from its serialized form"""
+        ingredients_list = [
+            Ingredient(name=ing["name"], is_common=ing["is_common"])
+            for ing in recipe_data["ingredients"]
+        ]
+
+        return Recipe(
+            id=recipe_data["id"],
+            name=recipe_data["name"],
+            ingredients=ingredients_list,
+            instructions=recipe_data["instructions"],
+            category=recipe_data.get("category"),
+        )
+
+    @abstractmethod
+    def _recipe_row(self, recipe: Recipe, recipe_vector: List[float]) -> Dict[str, Any]:
+        """Build the stored row for a recipe and its embedding"""
+        pass
+
+    @abstractmethod
+    def _insert_rows(
+        self, rows: List[Dict[str, Any]], chunk_size: int, upsert: bool = False
+    ) -> List[str]:
+        """Insert (or upsert) rows in chunks, returning the ids written"""
+        pass
+
+    @abstractmethod
+    def _search_many(
+        self,
+        query_vectors: List[List[float]],
+        category: Optional[str],
+        top_n: int,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """Search the stored vectors for every query and return serialized recipes"""
+        pass
+
+    def add_recipe(self, recipe: Recipe) -> None:
+        """
+        Add a recipe to the database
+        """
+
+        self._require_connection()
+
+        # Generate embedding for recipe (combine name and ingredients)
+        recipe_vector = self._generate_embedding(self._recipe_text(recipe))
+
+        if not self._insert_rows([self._recipe_row(recipe, recipe_vector)], chunk_size=1):
+            raise RuntimeError(f"Failed to add recipe {recipe.id}")
+        if self.ingredient_index is not None:
+            self.ingredient_index.add(recipe.id, (ing.name for ing in recipe.ingredients))
+        self._invalidate_results()
+
+    def _indexed(self, recipes: Iterable[Recipe]) -> Iterator[Recipe]:
+        """Add recipes to the ingredient index as they are read"""
+        for recipe in recipes:
+            self.ingredient_index.add(recipe.id, (ing.name for ing in recipe.ingredients))
+            yield recipe
+
+    def _invalidate_results(self) -> None:
+        """Drop cached search results after the collection changed"""
+        if self.result_cache is not None:
+            self.result_cache.clear()
+
+    def _write_batch(
+        self,
+        rows: List[Dict[str, Any]],
+        chunk_size: int,
+        checkpoint: Optional[IngestionCheckpoint],
+        upsert: bool = False,
+    ) -> List[str]:
+        """Write a batch of rows, upserting the ones the checkpoint already knows"""
+        if checkpoint is not None and checkpoint.upsert_all:
+            upsert = True
+        if checkpoint is None or upsert:
+            return self._insert_rows(rows, chunk_size, upsert=upsert)
+
+        new_rows = [row for row in rows if not checkpoint.is_known(row["id"])]
+        changed_rows = [row for row in rows if checkpoint.is_known(row["id"])]
+        return self._insert_rows(new_rows, chunk_size) + self._insert_rows(
+            changed_rows, chunk_size, upsert=True
+        )
+
+    def add_recipes(
+        self,
+        recipes: Iterable[Recipe],
+        batch_size: int = 512,
+        insert_chunk_size: int = 256,
+        checkpoint: Optional[IngestionCheckpoint] = None,
+    ) -> int:
+        """
+        Add many recipes to the database.
+
+        Recipes are embedded `batch_size` at a time and written with bulk
+        inserts of `insert_chunk_size` rows. The insert of one batch runs in
+        a background thread while the next batch is being embedded.
+
+        With a checkpoint, records before the last committed offset of an
+        unfinished run are skipped, and only recipes whose content hash
+        changed are embedded and upserted. Returns the number of recipes
+        written.
+
+        The ingredient index, if any, gets every record read, including
+        the ones skipped by the checkpoint: indexing is cheap and the index
+        is not covered by the checkpoint.
+        """
+
+        self._require_connection()
+
+        if self.ingredient_index is not None:
+            recipes = self._indexed(recipes)
+
+        offset = 0
+        if checkpoint is not None:
+            offset = checkpoint.start()
+            if offset:
+                print(f"Resuming ingestion after {offset} records")
+                recipes = islice(recipes, offset, None)
+        # The batch that was in flight when a previous run died may have been
+        # partially written without being committed, so upsert it again
+        upsert_until = offset + batch_size if offset else 0
+
+        start = time.perf_counter()
+        written = 0
+        skipped = 0
+
+        def commit(pending) -> int:
+            future, end_offset, hashes = pending
+            written_ids = future.result()
+            if checkpoint is not None:
+                written_set = set(written_ids)
+                checkpoint.commit(
+                    end_offset,
+                    [(rid, h) for rid, h in hashes if rid in written_set],
+                )
+            return len(written_ids)
+
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            pending = None
+            for batch in _batched(recipes, batch_size):
+                offset += len(batch)
+
+                hashes = []
+                if checkpoint is not None:
+                    changed = []
+                    for recipe in batch:
+                        content_hash = recipe_content_hash(recipe)
+                        if checkpoint.is_changed(recipe.id, content_hash):
+                            changed.append(recipe)
+                            hashes.append((recipe.id, content_hash))
+                    skipped += len(batch) - len(changed)
+                    batch = changed
+
+                vectors = self._generate_embeddings(
+                    [self._recipe_text(recipe) for recipe in batch]
+                ) if batch else []
+                rows = [
+                    self._recipe_row(recipe, vector)
+                    for recipe, vector in zip(batch, vectors)
+                ]
+
+                # Wait for the previous batch before queueing the next one so
+                # at most one batch of rows is held in memory by the writer,
+                # and checkpoints are committed in order
+                if pending is not None:
+                    written += commit(pending)
+                future = writer.submit(
+                    self._write_batch,
+                    rows,
+                    insert_chunk_size,
+                    checkpoint,
+                    offset <= upsert_until,
+                )
+                pending = (future, offset, hashes)
+
+            if pending is not None:
+                written += commit(pending)
+
+        if checkpoint is not None:
+            checkpoint.finish()
+        if written:
+            self._invalidate_results()
+
+        elapsed = time.perf_counter() - start
+        rate = (written + skipped) / elapsed if elapsed > 0 else 0.0
+        print(
+            f"Wrote {written} recipes ({skipped} unchanged) in {elapsed:.1f}s "
+            f"({rate:.1f} records/sec)"
+        )
+        return written
+
+    def find_recipes_by_ingredients(
+        self,
+        ingredients: List[Ingredient],
+        category: Optional[str] = None,
+        top_n: int = 3,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Recipe]:
+        """
+        Find recipes that match the given ingredients
+        """
+        return self.find_recipes_by_ingredients_batch(
+            [ingredients], category, top_n, fields
+        )[0]
+
+    def _pending_queries(
+        self,
+        ingredient_lists: List[List[Ingredient]],
+        category: Optional[str],
+        top_n: int,
+        fields: Optional[Tuple[str, ...]],
+    ) -> Tuple[List[List[Recipe]], Dict[Tuple[str, ...], List[int]]]:
+        """
+        Answer what the result cache can and group the rest by canonical
+        query. Returns the results so far and, for every query left, the
+        positions in the input that asked for it.
+        """
+        results: List[List[Recipe]] = [[] for _ in ingredient_lists]
+        pending: Dict[Tuple[str, ...], List[int]] = {}
+        for i, ingredients in enumerate(ingredient_lists):
+            # Canonical, order-insensitive form of the ingredient set
+            canonical = canonical_ingredients(ing.name for ing in ingredients)
+            if not canonical:
+                continue
+
+            if self.result_cache is not None:
+                cached = self.result_cache.get((canonical, category, top_n, fields))
+                if cached is not None:
+                    results[i] = [self._copy_record(recipe) for recipe in cached]
+                    continue
+            pending.setdefault(canonical, []).append(i)
+        return results, pending
+
+    def _store_results(
+        self,
+        results: List[List[Recipe]],
+        pending: Dict[Tuple[str, ...], List[int]],
+        search_results: List[List[Dict[str, Any]]],
+        category: Optional[str],
+        top_n: int,
+        fields: Optional[Tuple[str, ...]],
+    ) -> List[List[Recipe]]:
+        """
+        Cache fresh search results and scatter them to their positions. The
+        cache keeps its own records and every caller gets copies, so editing
+        a result doesn't change later cache hits
+        """
+        for (canonical, positions), matching_recipes in zip(pending.items(), search_results):
+            if self.result_cache is not None:
+                self.result_cache.put((canonical, category, top_n, fields), matching_recipes)
+            for i in positions:
+                results[i] = [self._copy_record(recipe) for recipe in matching_recipes]
+        return results
+
+    def find_recipes_by_ingredients_batch(
+        self,
+        ingredient_lists: List[List[Ingredient]],
+        category: Optional[str] = None,
+        top_n: int = 3,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[List[Recipe]]:
+        """
+        Find recipes for many ingredient lists at once.
+
+        All queries that are not cached are embedded in one model call and
+        sent as a single search. Returns one result list per input list.
+        """
+        fields = tuple(fields) if fields is not None else None
+
+        self._require_connection()
+
+        results, pending = self._pending_queries(ingredient_lists, category, top_n, fields)
+        if not pending:
+            return results
+
+        # Generate a combined query vector from each ingredient set
+        query_vectors = self._generate_embeddings(
+            [" ".join(canonical) for canonical in pending]
+        )
+        search_results = self._search_many(query_vectors, category, top_n, fields)
+        return self._store_results(results, pending, search_results, category, top_n, fields)
+
+    async def afind_recipes_by_ingredients(
+        self,
+        ingredients: List[Ingredient],
+        category: Optional[str] = None,
+        top_n: int = 3,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Recipe]:
+        """Async find_recipes_by_ingredients"""
+        return (await self.afind_recipes_by_ingredients_batch(
+            [ingredients], category, top_n, fields
+        ))[0]
+
+    async def afind_recipes_by_ingredients_batch(
+        self,
+        ingredient_lists: List[List[Ingredient]],
+        category: Optional[str] = None,
+        top_n: int = 3,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[List[Recipe]]:
+        """
+        Async find_recipes_by_ingredients_batch. Cache hits are answered
+        inline, embedding runs in the bounded embedding pool and the search
+        goes through _asearch_many.
+        """
+        fields = tuple(fields) if fields is not None else None
+
+        self._require_connection()
+
+        results, pending = self._pending_queries(ingredient_lists, category, top_n, fields)
+        if not pending:
+            return results
+
+        query_vectors = await run_in_executor(
+            self.embedding_executor,
+            self._generate_embeddings,
+            [" ".join(canonical) for canonical in pending],
+        )
+        search_results = await self._asearch_many(query_vectors, category, top_n, fields)
+        return self._store_results(results, pending, search_results, category, top_n, fields)
+
+    async def _asearch_many(
+        self,
+        query_vectors: List[List[float]],
+        category: Optional[str],
+        top_n: int,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """Async _search_many, run in the I/O pool unless the storage has an async client"""
+        return await run_in_executor(
+            self.io_executor, self._search_many, query_vectors, category, top_n, fields
+        )
+
+    async def aget_recipes_by_ids(
+        self, recipe_ids: List[str], fields: Optional[Sequence[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Async get_recipes_by_ids, run in the I/O pool"""
+        return await run_in_executor(self.io_executor, self.get_recipes_by_ids, recipe_ids, fields)
+
+
+class VectorRecipeDatabase(EmbeddingRecipeDatabase):
+    """
+    Vector database implementation using Milvus for recipe storage and retrieval.
+
+    New collections use the "compact" schema: typed scalar and array fields
+    (category, ingredients, instructions) that searches can return
+    selectively. Collections created with the "legacy" schema, where the
+    whole recipe is a JSON string in a `data` field, are still read and
+    written; the schema of an existing collection is detected on connect.
+    """
+    DATABASE_NAME = "Milvus database"
+    # Limits of the compact schema
+    MAX_INGREDIENTS = 256
+    MAX_INGREDIENT_LENGTH = 512
+    MAX_INSTRUCTIONS_LENGTH = 65535
+
+    def __init__(self, embedding_model: str = "all-MiniLM-L6-v2", 
+                 RECIPE_COLLECTION = "recipes",
+                 embedding_cache: Optional[EmbeddingCache] = None,
+                 result_cache: Optional[TTLCache] = None,
+                 health_check_interval: Optional[float] = None,
+                 schema: str = "compact",
+                 ingredient_index: Optional[IngredientIndex] = None):
+        """Initialize the vector database with an embedding model"""
+        if schema not in ("compact", "legacy"):
+            raise ValueError(f"Unknown collection schema: {schema}")
+        super().__init__(embedding_model, embedding_cache, result_cache, ingredient_index)
+        self.client = None
+        self.collection = None
         self.RECIPE_COLLECTION = RECIPE_COLLECTION
+        # Schema used when the collection has to be created
+        self.schema = schema
+        # Seconds between background checks that the collection is still
+        # loaded, None to only re-check after a failed call
+        self.health_check_interval = health_check_interval
+        self._closed = threading.Event()
+        self.uri = None
+        # Created on first use, inside the event loop that uses it
+        self._async_client = None
 
     def connect(self, connection_string: str) -> None:
         """Connect to the Milvus database"""
@@ -95,15 +711,21 @@ class VectorRecipeDatabase(RecipeDatabase):
             connections.connect(host=host, port=port)
 
             # Create Milvus client
-            self.client = MilvusClient(uri=f"http://{connection_string}")
+            self.uri = f"http://{connection_string}"
+            self.client = MilvusClient(uri=self.uri)
 
             # Initialize embedding model
             self.embedding_model = SentenceTransformer(self.embedding_model_name)
 
             # Create collections if they don't exist
             self._initialize_collections()
-            
+
+            # Load the collection once for the lifetime of the connection
+            self._load_collection()
+
             self.connected = True
+            if self.health_check_interval:
+                threading.Thread(target=self._health_probe, daemon=True).start()
             print(f"Successfully connected to Milvus at {connection_string}")
 
         except Exception as e:
@@ -122,8 +744,33 @@ class VectorRecipeDatabase(RecipeDatabase):
                 FieldSchema(
                     name="vector", dtype=DataType.FLOAT_VECTOR, dim=self.VECTOR_DIM
                 ),
-                FieldSchema(name="data", dtype=DataType.VARCHAR, max_length=12000),
             ]
+            if self.schema == "legacy":
+                recipe_fields.append(
+                    FieldSchema(name="data", dtype=DataType.VARCHAR, max_length=12000)
+                )
+            else:
+                recipe_fields += [
+                    FieldSchema(name="category", dtype=DataType.VARCHAR, max_length=255),
+                    FieldSchema(
+                        name="ingredients",
+                        dtype=DataType.ARRAY,
+                        element_type=DataType.VARCHAR,
+                        max_capacity=self.MAX_INGREDIENTS,
+                        max_length=self.MAX_INGREDIENT_LENGTH,
+                    ),
+                    FieldSchema(
+                        name="ingredient_is_common",
+                        dtype=DataType.ARRAY,
+                        element_type=DataType.BOOL,
+                        max_capacity=self.MAX_INGREDIENTS,
+                    ),
+                    FieldSchema(
+                        name="instructions",
+                        dtype=DataType.VARCHAR,
+                        max_length=self.MAX_INSTRUCTIONS_LENGTH,
+                    ),
+                ]
             recipe_schema = CollectionSchema(fields=recipe_fields)
             recipe_collection = Collection(
                 name=self.RECIPE_COLLECTION, schema=recipe_schema
@@ -143,143 +790,582 @@ class VectorRecipeDatabase(RecipeDatabase):
             # Load the collection
             recipe_collection.load() 
 
-    def _generate_embedding(self, text: str) -> List[float]:
-        """Generate a vector embedding for text"""
-        if not self.embedding_model:
-            raise ValueError(
-                "Embedding model not initialized. Connect to database first."
-            )
+    def _collection_is_loaded(self) -> bool:
+        """Ask Milvus whether the recipe collection is loaded"""
+        state = utility.load_state(self.RECIPE_COLLECTION)
+        # Newer pymilvus returns a LoadState enum rather than a string
+        return getattr(state, "name", state) == "Loaded"
 
-        # Generate embedding
-        embedding = self.embedding_model.encode(text)
-        return embedding.tolist()
+    def _load_collection(self) -> None:
+        """Get a handle on the recipe collection and load it if needed"""
+        self.collection = Collection(self.RECIPE_COLLECTION)
+        # Follow the schema of the collection as it exists on the server
+        field_names = {field.name for field in self.collection.schema.fields}
+        self.schema = "legacy" if "data" in field_names else "compact"
+        if not self._collection_is_loaded():
+            self.collection.load()
 
-    def add_recipe(self, recipe: Recipe) -> None:
+    def _with_reload(self, call, **kwargs):
+        """Run a client call, re-loading the collection and retrying once on failure"""
+        try:
+            return call(**kwargs)
+        except MilvusException as e:
+            print(f"Milvus call failed ({e}), re-checking the collection")
+            self._load_collection()
+            return call(**kwargs)
+
+    def _get_async_client(self):
+        """pymilvus' asyncio client, or None when this pymilvus has none"""
+        if self._async_client is None:
+            try:
+                from pymilvus import AsyncMilvusClient
+            except ImportError:
+                return None
+            self._async_client = AsyncMilvusClient(uri=self.uri)
+        return self._async_client
+
+    async def _acall(self, method: str, **kwargs):
         """
-        Add a recipe to the vector database
+        Run a client call with the async client if there is one, else in the
+        I/O pool. Re-loads the collection and retries once on failure.
         """
+        async_client = self._get_async_client()
+        for attempt in range(2):
+            try:
+                if async_client is not None:
+                    return await getattr(async_client, method)(**kwargs)
+                return await run_in_executor(
+                    self.io_executor, getattr(self.client, method), **kwargs
+                )
+            except MilvusException as e:
+                if attempt:
+                    raise
+                print(f"Milvus call failed ({e}), re-checking the collection")
+                await run_in_executor(self.io_executor, self._load_collection)
 
-        if not self.connected:
-            raise ConnectionError("Not connected to Milvus database")
+    def _health_probe(self) -> None:
+        """Periodically make sure the collection stays loaded"""
+        while not self._closed.wait(self.health_check_interval):
+            try:
+                if not self._collection_is_loaded():
+                    print(f"Collection {self.RECIPE_COLLECTION} was released, loading it")
+                    self.collection.load()
+            except MilvusException as e:
+                print(f"Milvus health probe failed: {e}")
 
-        # Generate embedding for recipe (combine name and ingredients)
-        ingredient_names = [ing.name for ing in recipe.ingredients]
-        recipe_text = f"{recipe.name} {' '.join(ingredient_names)}"
-        recipe_vector = self._generate_embedding(recipe_text)
+    def close(self) -> None:
+        """Stop the health probe and close the client"""
+        self._closed.set()
+        self.connected = False
+        if self.client:
+            self.client.close()
 
-        # Serialize recipe data
-        recipe_data = {
+    async def aclose(self) -> None:
+        """close(), also closing the async client"""
+        self.close()
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
+    def _recipe_row(self, recipe: Recipe, recipe_vector: List[float]) -> Dict[str, Any]:
+        """Build the collection row for a recipe and its embedding"""
+        if self.schema == "legacy":
+            return {
+                "id": recipe.id,
+                "name": recipe.name,
+                "vector": recipe_vector,
+                "data": json.dumps(self._recipe_data(recipe)),
+            }
+
+        return {
             "id": recipe.id,
             "name": recipe.name,
-            "ingredients": [
-                {"name": ing.name, "is_common": ing.is_common}
-                for ing in recipe.ingredients
-            ],
+            "vector": recipe_vector,
+            "category": recipe.category or "",
+            "ingredients": [ing.name for ing in recipe.ingredients],
+            "ingredient_is_common": [ing.is_common for ing in recipe.ingredients],
             "instructions": recipe.instructions,
         }
 
-        self.client.insert(
-            collection_name=self.RECIPE_COLLECTION,
-            data={
-                "id": recipe.id,
-                "name": recipe.name,
-                "vector": recipe_vector,
-                "data": json.dumps(recipe_data),
-            },
-        )
+    def _output_fields(self, fields: Optional[Sequence[str]]) -> List[str]:
+        """Collection fields to fetch for the requested recipe fields"""
+        if self.schema == "legacy":
+            # Everything but the id and name lives in the JSON blob
+            if fields is not None and set(fields) <= {"id", "name"}:
+                return ["id", "name"]
+            return ["id", "name", "data"]
+
+        output_fields = []
+        for field in fields if fields is not None else RECIPE_FIELDS:
+            if field == SCORE_FIELD:
+                continue
+            if field == "ingredients":
+                output_fields += ["ingredients", "ingredient_is_common"]
+            else:
+                output_fields.append(field)
+        return output_fields
+
+    def _entity_to_data(
+        self, entity: Dict[str, Any], fields: Optional[Sequence[str]]
+    ) -> Dict[str, Any]:
+        """Turn a fetched entity into a serialized recipe"""
+        if "data" in entity:
+            return self._select_fields(json.loads(entity["data"]), fields)
+
+        recipe_data = {}
+        for field in ("id", "name", "instructions"):
+            if field in entity:
+                recipe_data[field] = entity[field]
+        if "ingredients" in entity:
+            recipe_data["ingredients"] = [
+                {"name": name, "is_common": is_common}
+                for name, is_common in zip(
+                    entity["ingredients"], entity["ingredient_is_common"]
+                )
+            ]
+        if entity.get("category"):
+            recipe_data["category"] = entity["category"]
+        return recipe_data
+
+    def _insert_rows(
+        self, rows: List[Dict[str, Any]], chunk_size: int, upsert: bool = False
+    ) -> List[str]:
+        """
+        Insert (or upsert) rows in chunks, returning the ids written. A failed
+        chunk is retried row by row, so only the rows Milvus rejects are skipped
+        """
+        write = self.client.upsert if upsert else self.client.insert
+        written = []
+        for chunk in _batched(rows, chunk_size):
+            try:
+                write(collection_name=self.RECIPE_COLLECTION, data=chunk)
+                written.extend(row["id"] for row in chunk)
+                continue
+            except MilvusException as e:
+                if len(chunk) == 1:
+                    print(f"Failed to write recipe {chunk[0]['id']}: {e}")
+                    continue
+                print(f"Failed to write {len(chunk)} recipes, retrying one by one: {e}")
+            for row in chunk:
+                try:
+                    write(collection_name=self.RECIPE_COLLECTION, data=[row])
+                    written.append(row["id"])
+                except MilvusException as e:
+                    print(f"Failed to write recipe {row['id']}: {e}")
+        return written
 
     def get_recipe_by_id(self, recipe_id: str) -> Optional[Recipe]:
         """
         Get a specific recipe by ID
         """
-        from cookingassistant.data.item import Ingredient, Recipe
-
-        if not self.connected:
-            raise ConnectionError("Not connected to Milvus database")
-
-        collection = Collection(self.RECIPE_COLLECTION)
-        if utility.load_state(self.RECIPE_COLLECTION) != "Loaded":
-            collection.load()
+        self._require_connection()
 
         # Query Milvus
-        results = self.client.query(
+        results = self._with_reload(
+            self.client.query,
             collection_name=self.RECIPE_COLLECTION,
             filter=f'id == "{recipe_id}"',
-            output_fields=["id", "name", "data"],
+            output_fields=self._output_fields(None),
         )
 
         if not results:
             return None
 
         # Process result
-        recipe_data = json.loads(results[0]["data"])
-        ingredients_list = [
-            Ingredient(name=ing["name"], is_common=ing["is_common"])
-            for ing in recipe_data["ingredients"]
-        ]
+        return self._recipe_from_data(self._entity_to_data(results[0], None))
 
-        recipe = Recipe(
-            id=recipe_data["id"],
-            name=recipe_data["name"],
-            ingredients=ingredients_list,
-            instructions=recipe_data["instructions"],
+    def _ids_query(self, recipe_ids: List[str], fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+        """Arguments of the query fetching recipes by id"""
+        return dict(
+            collection_name=self.RECIPE_COLLECTION,
+            filter=f"id in {json.dumps(list(recipe_ids))}",
+            output_fields=self._output_fields(fields),
         )
 
-        return recipe
-
-    def find_recipes_by_ingredients(
-        self,
-        ingredients: List[Ingredient],
-        category: Optional[str] = None,
-        top_n: int = 3,
-    ) -> List[Recipe]:
-        """
-        Find recipes that match the given ingredients
-        """
+    def _ids_results(
+        self, recipe_ids: List[str], results: List[Dict[str, Any]], fields: Optional[Sequence[str]]
+    ) -> List[Dict[str, Any]]:
+        """Serialized recipes in the requested order"""
+        by_id = {entity["id"]: self._entity_to_data(entity, fields) for entity in results}
+        return [by_id[recipe_id] for recipe_id in recipe_ids if recipe_id in by_id]
 
-        if not self.connected:
-            raise ConnectionError("Not connected to Milvus database")
+    def get_recipes_by_ids(
+        self, recipe_ids: List[str], fields: Optional[Sequence[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Fetch serialized recipes by id, in the given order, skipping unknown ids"""
+        self._require_connection()
+        if not recipe_ids:
+            return []
 
-        collection = Collection(self.RECIPE_COLLECTION)
-        if utility.load_state(self.RECIPE_COLLECTION) != "Loaded":
-            collection.load()
+        results = self._with_reload(self.client.query, **self._ids_query(recipe_ids, fields))
+        return self._ids_results(recipe_ids, results, fields)
 
-        if not ingredients:
+    async def aget_recipes_by_ids(
+        self, recipe_ids: List[str], fields: Optional[Sequence[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Async get_recipes_by_ids"""
+        self._require_connection()
+        if not recipe_ids:
             return []
 
-        # Generate a combined query vector from all ingredients
-        ingredient_names = [ing.name for ing in ingredients]
-        query_text = " ".join(ingredient_names)
-        query_vector = self._generate_embedding(query_text)
+        results = await self._acall("query", **self._ids_query(recipe_ids, fields))
+        return self._ids_results(recipe_ids, results, fields)
 
-        # Search for similar recipes
+    def _search_request(
+        self,
+        query_vectors: List[List[float]],
+        category: Optional[str],
+        top_n: int,
+        fields: Optional[Sequence[str]],
+    ) -> Dict[str, Any]:
+        """Arguments of the search for all query vectors"""
         search_params = {"metric_type": "COSINE", "params": {"ef": 64}}
 
         # Build filtering expression for category if provided
         expr = None
         if category:
-            expr = f'category like "%{category}%"'
+            if self.schema == "legacy":
+                print("Legacy recipe schema has no category field, ignoring filter")
+            else:
+                expr = f'category like "%{category}%"'
 
-        # Perform search
-        recipe_search_results = self.client.search(
+        return dict(
             collection_name=self.RECIPE_COLLECTION,
-            data=[query_vector],
+            data=query_vectors,
             filter=expr,
-            limit=3,
-            output_fields=["id", "name", "data"],
+            limit=top_n,
+            output_fields=self._output_fields(fields),
             search_params=search_params,
         )
 
-        # Process results
-        matching_recipes = []
-
+    def _search_results(
+        self,
+        recipe_search_results,
+        n_queries: int,
+        fields: Optional[Sequence[str]],
+    ) -> List[List[Dict[str, Any]]]:
+        """Serialized recipes of every query's hits"""
         if not recipe_search_results:
             print("No matching recipes.")
-        else:
-            for recipe in recipe_search_results[0]:
+            return [[] for _ in range(n_queries)]
+
+        results = []
+        for hits in recipe_search_results:
+            matching_recipes = []
+            for recipe in hits:
                 entity = recipe.get("entity", {})
-                data_json = entity.get("data", "{}")
-                recipe = json.loads(data_json)
-                matching_recipes.append(recipe)
+                recipe_data = self._entity_to_data(entity, fields)
+                if fields is not None and SCORE_FIELD in fields:
+                    recipe_data[SCORE_FIELD] = recipe.get("distance")
+                matching_recipes.append(recipe_data)
+            results.append(matching_recipes)
+
+        return results
+
+    def _search_many(
+        self,
+        query_vectors: List[List[float]],
+        category: Optional[str],
+        top_n: int,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """Search for similar recipes in Milvus, one request for all queries"""
+        recipe_search_results = self._with_reload(
+            self.client.search, **self._search_request(query_vectors, category, top_n, fields)
+        )
+        return self._search_results(recipe_search_results, len(query_vectors), fields)
+
+    async def _asearch_many(
+        self,
+        query_vectors: List[List[float]],
+        category: Optional[str],
+        top_n: int,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """Async _search_many"""
+        recipe_search_results = await self._acall(
+            "search", **self._search_request(query_vectors, category, top_n, fields)
+        )
+        return self._search_results(recipe_search_results, len(query_vectors), fields)
+
+
+class LocalVectorRecipeDatabase(EmbeddingRecipeDatabase):
+    """
+    In-process vector database backed by a NumPy float32 matrix.
+
+    Needs no server: `connect` takes a directory, loads any saved index from
+    it (the vector matrix is memory-mapped) and `save` writes it back. The
+    directory holds `vectors.npy` (L2-normalized embeddings, one row per
+    recipe), `recipes.jsonl` (serialized recipes in row order) and
+    `meta.json`. Search is exact brute-force cosine similarity, or HNSW
+    through the optional `hnswlib` package with `index_type="hnsw"`, which
+    keeps lookups sub-millisecond on the full dataset.
+    """
+    DATABASE_NAME = "local recipe index"
+
+    def __init__(self, embedding_model: str = "all-MiniLM-L6-v2",
+                 index_type: str = "flat",
+                 embedding_cache: Optional[EmbeddingCache] = None,
+                 result_cache: Optional[TTLCache] = None,
+                 hnsw_params: Optional[Dict[str, int]] = None,
+                 ingredient_index: Optional[IngredientIndex] = None):
+        """Initialize the local database with an embedding model"""
+        if index_type not in ("flat", "hnsw"):
+            raise ValueError(f"Unknown index type: {index_type}")
+        super().__init__(embedding_model, embedding_cache, result_cache, ingredient_index)
+        self.index_type = index_type
+        self.hnsw_params = {"M": 16, "ef_construction": 200, "ef": 64, **(hnsw_params or {})}
+        self.path = None
+
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._records: List[Dict[str, Any]] = []
+        self._vectors = np.zeros((0, self.VECTOR_DIM), dtype=np.float32)
+        self._pending_vectors: List[np.ndarray] = []
+        self._hnsw = None
+        self._lock = threading.RLock()
+
+    def connect(self, connection_string: str) -> None:
+        """Open the index stored in the directory `connection_string`"""
+        self.path = connection_string
+        self.embedding_model = SentenceTransformer(self.embedding_model_name)
+        if os.path.exists(os.path.join(self.path, "meta.json")):
+            self.load(self.path)
+        self.connected = True
+        print(f"Opened local recipe index at {self.path} ({len(self._ids)} recipes)")
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def load(self, path: str) -> None:
+        """Load a saved index, memory-mapping the vector matrix"""
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["embedding_model"] != self.embedding_model_name:
+            raise ValueError(
+                f"Index at {path} was built with {meta['embedding_model']}, "
+                f"not {self.embedding_model_name}"
+            )
+
+        with self._lock:
+            self._vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+            self._pending_vectors = []
+            self._records = []
+            with open(os.path.join(path, "recipes.jsonl"), "r", encoding="utf-8") as f:
+                for line in f:
+                    self._records.append(json.loads(line))
+            self._ids = [record["id"] for record in self._records]
+            self._rows = {recipe_id: row for row, recipe_id in enumerate(self._ids)}
+            self._hnsw = None
+
+            hnsw_path = os.path.join(path, "index.hnsw")
+            if self.index_type == "hnsw" and os.path.exists(hnsw_path):
+                self._hnsw = self._new_hnsw_index()
+                self._hnsw.load_index(hnsw_path, max_elements=len(self._ids))
+                self._hnsw.set_ef(self.hnsw_params["ef"])
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Write the index to a directory (defaults to the connected one)"""
+        path = path or self.path
+        os.makedirs(path, exist_ok=True)
+
+        with self._lock:
+            vectors = self._matrix()
+            # Write to temporary files first so a loaded memory map of the
+            # old files is never truncated underneath a reader
+            np.save(os.path.join(path, "vectors.tmp.npy"), vectors)
+            with open(os.path.join(path, "recipes.jsonl.tmp"), "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(record) + "\n" for record in self._records)
+            if self.index_type == "hnsw":
+                self._build_hnsw().save_index(os.path.join(path, "index.hnsw"))
+
+            os.replace(os.path.join(path, "vectors.tmp.npy"), os.path.join(path, "vectors.npy"))
+            os.replace(os.path.join(path, "recipes.jsonl.tmp"), os.path.join(path, "recipes.jsonl"))
+            with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "embedding_model": self.embedding_model_name,
+                        "dim": self.VECTOR_DIM,
+                        "count": len(self._ids),
+                    },
+                    f,
+                )
+
+    def _matrix(self) -> np.ndarray:
+        """The full vector matrix with pending inserts merged in"""
+        if self._pending_vectors:
+            self._vectors = np.concatenate([self._vectors, *self._pending_vectors])
+            self._pending_vectors = []
+        return self._vectors
+
+    def _new_hnsw_index(self, max_elements: Optional[int] = None):
+        """Create an hnswlib index, empty unless it is going to be loaded"""
+        try:
+            import hnswlib
+        except ImportError as e:
+            raise ImportError("index_type='hnsw' requires the hnswlib package") from e
+
+        index = hnswlib.Index(space="ip", dim=self.VECTOR_DIM)
+        if max_elements is None:
+            return index
+        index.init_index(
+            max_elements=max(max_elements, 1),
+            M=self.hnsw_params["M"],
+            ef_construction=self.hnsw_params["ef_construction"],
+        )
+        return index
+
+    def _build_hnsw(self):
+        """Build (or return the up to date) HNSW graph over all vectors"""
+        if self._hnsw is None or self._hnsw.get_current_count() != len(self._ids):
+            vectors = self._matrix()
+            self._hnsw = self._new_hnsw_index(len(self._ids))
+            if len(self._ids):
+                self._hnsw.add_items(vectors, np.arange(len(self._ids)))
+            self._hnsw.set_ef(self.hnsw_params["ef"])
+        return self._hnsw
+
+    def _recipe_row(self, recipe: Recipe, recipe_vector: List[float]) -> Dict[str, Any]:
+        """Build the stored row for a recipe and its embedding"""
+        vector = np.asarray(recipe_vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return {
+            "id": recipe.id,
+            "vector": vector / norm if norm else vector,
+            "data": self._recipe_data(recipe),
+        }
+
+    def _insert_rows(
+        self, rows: List[Dict[str, Any]], chunk_size: int, upsert: bool = False
+    ) -> List[str]:
+        """Append rows, replacing existing recipes with the same id"""
+        # A batch repeating an id keeps its last row, like consecutive upserts
+        rows = list({row["id"]: row for row in rows}.values())
+        with self._lock:
+            new_vectors = []
+            for row in rows:
+                existing = self._rows.get(row["id"])
+                if existing is not None:
+                    vectors = self._matrix()
+                    if not vectors.flags.writeable:
+                        # Copy the memory-mapped matrix before the first edit
+                        self._vectors = vectors = np.array(vectors)
+                    vectors[existing] = row["vector"]
+                    self._records[existing] = row["data"]
+                    # Graph nodes can't be moved, rebuild on next search
+                    self._hnsw = None
+                else:
+                    self._rows[row["id"]] = len(self._ids)
+                    self._ids.append(row["id"])
+                    self._records.append(row["data"])
+                    new_vectors.append(row["vector"])
+
+            if new_vectors:
+                self._pending_vectors.append(np.stack(new_vectors))
+        return [row["id"] for row in rows]
+
+    def get_recipe_by_id(self, recipe_id: str) -> Optional[Recipe]:
+        """
+        Get a specific recipe by ID
+        """
+        self._require_connection()
+
+        row = self._rows.get(recipe_id)
+        if row is None:
+            return None
+        return self._recipe_from_data(self._records[row])
+
+    def get_recipes_by_ids(
+        self, recipe_ids: List[str], fields: Optional[Sequence[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Fetch serialized recipes by id, in the given order, skipping unknown ids"""
+        self._require_connection()
+        rows = [self._rows.get(recipe_id) for recipe_id in recipe_ids]
+        return [
+            self._copy_record(self._select_fields(self._records[row], fields))
+            for row in rows
+            if row is not None
+        ]
+
+    def _search_many(
+        self,
+        query_vectors: List[List[float]],
+        category: Optional[str],
+        top_n: int,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """Return the stored recipes with the highest cosine similarity per query"""
+        # Only hold the lock to take a consistent snapshot, so concurrent
+        # searches don't serialize on each other
+        with self._lock:
+            if not self._ids:
+                return [[] for _ in query_vectors]
+            vectors = self._matrix()
+            records = self._records
+            index = self._build_hnsw() if self.index_type == "hnsw" else None
+
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+
+        allowed = None
+        if category:
+            category = category.lower()
+            allowed = np.fromiter(
+                (category in (record.get("category") or "").lower()
+                 for record in records[:len(vectors)]),
+                dtype=bool,
+                count=len(vectors),
+            )
+
+        if index is not None:
+            rows = self._search_hnsw(index, len(vectors), queries, allowed, top_n)
+        else:
+            rows = self._search_flat(vectors, queries, allowed, top_n)
+
+        results = []
+        for query, query_rows in zip(queries, rows):
+            matching_recipes = []
+            for row in query_rows:
+                recipe_data = self._copy_record(self._select_fields(records[row], fields))
+                if fields is not None and SCORE_FIELD in fields:
+                    recipe_data[SCORE_FIELD] = float(vectors[row] @ query)
+                matching_recipes.append(recipe_data)
+            results.append(matching_recipes)
+        return results
+
+    @staticmethod
+    def _search_flat(
+        vectors: np.ndarray, queries: np.ndarray, allowed: Optional[np.ndarray], top_n: int
+    ) -> List[List[int]]:
+        """Exact top-n for every query by brute-force dot product"""
+        scores = queries @ vectors.T
+        if allowed is not None:
+            scores = np.where(allowed, scores, -np.inf)
+
+        top_n = min(top_n, scores.shape[1])
+        top = np.argpartition(-scores, top_n - 1, axis=1)[:, :top_n]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        top = np.take_along_axis(top, np.argsort(-top_scores, axis=1), axis=1)
+        return [
+            [int(row) for row in query_top if query_scores[row] != -np.inf]
+            for query_top, query_scores in zip(top, scores)
+        ]
 
-        return matching_recipes
+    @staticmethod
+    def _search_hnsw(
+        index, count: int, queries: np.ndarray, allowed: Optional[np.ndarray], top_n: int
+    ) -> List[List[int]]:
+        """Approximate top-n for every query through the HNSW graph"""
+        k = min(top_n, count)
+        if allowed is not None:
+            # Over-fetch so enough candidates survive the category filter
+            k = min(top_n * 10, count)
+        labels, _ = index.knn_query(queries, k=k)
+        results = []
+        for query_labels in labels:
+            rows = [int(row) for row in query_labels]
+            if allowed is not None:
+                rows = [row for row in rows if allowed[row]]
+            results.append(rows[:top_n])
+        return results
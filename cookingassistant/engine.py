@@ -1,9 +1,17 @@
+from typing import Optional
+
 from cookingassistant.assistant import CookingAssistant
+from cookingassistant.cache import ResponseCache
 from cookingassistant.data.suggestor import RecipeSuggestor
 from cookingassistant.database import (CommonIngredientsRegistry,
+                                       EmbeddingRecipeDatabase,
                                        SQLRecipeDatabase, VectorRecipeDatabase)
-from cookingassistant.model.detector import PyTorchImageRecognitionModel
-from cookingassistant.model.llm import InstructionGenerator, OpenAIClient
+from cookingassistant.model.batching import BatchingImageRecognitionModel
+from cookingassistant.model.detection_cache import (CachedImageRecognitionModel,
+                                                    DetectionCache)
+from cookingassistant.model.detector import (OnnxImageRecognitionModel,
+                                             PyTorchImageRecognitionModel)
+from cookingassistant.model.llm import InstructionGeneratorByLLM, OpenAIClient
 
 
 class AppConfig:
@@ -14,12 +22,31 @@ class AppConfig:
                  db_connection_string: str,
                  openai_api_key: str,
                  use_vector_db: bool = False,
-                 model_type: str = "pytorch"):
+                 model_type: str = "pytorch",
+                 detector_batch_wait_ms: Optional[float] = None,
+                 detector_max_batch_size: int = 16,
+                 detection_cache_bytes: Optional[int] = None,
+                 pipelined: bool = False,
+                 response_cache_path: Optional[str] = None,
+                 common_ingredients_path: Optional[str] = None):
         self.model_path = model_path
         self.db_connection_string = db_connection_string
         self.openai_api_key = openai_api_key
         self.use_vector_db = use_vector_db
         self.model_type = model_type
+        # When set, concurrent requests share detector batches, waiting at
+        # most this long for a batch to fill
+        self.detector_batch_wait_ms = detector_batch_wait_ms
+        self.detector_max_batch_size = detector_max_batch_size
+        # Memory budget of the per-image detection cache, None disables it
+        self.detection_cache_bytes = detection_cache_bytes
+        # Overlap detection, search and generation of multi-image requests
+        self.pipelined = pipelined
+        # File of the LLM response cache, None disables it
+        self.response_cache_path = response_cache_path
+        # Vocabulary of ingredients ignored in recipe matching, None for the
+        # default list (CommonIngredientsRegistry.PANTRY_VOCABULARY is longer)
+        self.common_ingredients_path = common_ingredients_path
 
 
 class AppFactory:
@@ -31,8 +58,18 @@ class AppFactory:
         # Create image recognition model
         if config.model_type.lower() == "pytorch":
             image_model = PyTorchImageRecognitionModel(config.model_path)
+        elif config.model_type.lower() == "onnx":
+            image_model = OnnxImageRecognitionModel(config.model_path)
         else:
             pass
+        if config.detector_batch_wait_ms is not None:
+            image_model = BatchingImageRecognitionModel(
+                image_model, config.detector_max_batch_size, config.detector_batch_wait_ms
+            )
+        if config.detection_cache_bytes is not None:
+            image_model = CachedImageRecognitionModel(
+                image_model, DetectionCache(config.detection_cache_bytes)
+            )
         
         # Create recipe database
         if config.use_vector_db:
@@ -41,15 +78,21 @@ class AppFactory:
             recipe_db = SQLRecipeDatabase(config.db_connection_string)
         
         # Create common ingredients registry
-        common_ingredients = CommonIngredientsRegistry()
+        common_ingredients = CommonIngredientsRegistry(config.common_ingredients_path)
         
         # Create recipe processor
         recipe_processor = RecipeSuggestor(recipe_db, common_ingredients)
         
         # Create LLM client and instruction generator
         llm_client = OpenAIClient(config.openai_api_key)
-        instruction_generator = InstructionGenerator(llm_client)
+        response_cache = None
+        if config.response_cache_path is not None:
+            # Similar queries are matched with the database's embedding model
+            embed = recipe_db.embed_text if isinstance(recipe_db, EmbeddingRecipeDatabase) else None
+            response_cache = ResponseCache(embed, path=config.response_cache_path)
+        instruction_generator = InstructionGeneratorByLLM(llm_client, response_cache)
         
         # Create and return the cooking assistant
-        return CookingAssistant(image_model, recipe_processor, instruction_generator)
+        return CookingAssistant(image_model, recipe_processor, instruction_generator,
+                                pipelined=config.pipelined)
 
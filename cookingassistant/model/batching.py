@@ -0,0 +1,168 @@
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Set
+
+from opentelemetry import metrics
+from PIL.Image import Image
+
+from cookingassistant.model.detector import ImageRecognitionModel
+
+meter = metrics.get_meter(__name__)
+
+
+@dataclass
+class _DetectionJob:
+    """Images of one predict call waiting for a batch"""
+    images: List[Image]
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class BatchingImageRecognitionModel(ImageRecognitionModel):
+    """
+    Detector wrapper that merges concurrent predict calls into batches.
+
+    Callers queue their images and wait on a future. A worker thread takes
+    the oldest job, keeps collecting jobs until `max_batch_size` images are
+    queued or the oldest job has waited `max_wait_ms`, runs them through
+    the wrapped model's predict_batch in one go, and scatters the ingredient
+    sets back to the futures.
+    """
+
+    def __init__(self, model: ImageRecognitionModel, max_batch_size: int = 16,
+                 max_wait_ms: float = 10.0):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[_DetectionJob]" = queue.Queue()
+        self._closed = False
+
+        self._lock = threading.Lock()
+        self._batch_sizes: Counter = Counter()
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._jobs = 0
+        self._queue_depth_metric = meter.create_up_down_counter(
+            "detector.queue_depth", unit="images", description="Images waiting for a detector batch"
+        )
+        self._batch_size_metric = meter.create_histogram(
+            "detector.batch_size", unit="images", description="Images per detector forward pass"
+        )
+        self._wait_metric = meter.create_histogram(
+            "detector.queue_wait", unit="ms", description="Time a request waited for its batch"
+        )
+
+        self._worker = threading.Thread(target=self._run, name="detector-batcher", daemon=True)
+        self._worker.start()
+
+    def load_model(self, model_path: str) -> None:
+        """Load the wrapped model"""
+        return self.model.load_model(model_path)
+
+    def submit(self, images: List[Image]) -> Future:
+        """Queue the images of one request, the future resolves to its ingredients"""
+        if self._closed:
+            raise RuntimeError("Detector batcher is closed")
+        job = _DetectionJob(list(images))
+        if not job.images:
+            job.future.set_result(set())
+            return job.future
+
+        self._queue_depth_metric.add(len(job.images))
+        self._queue.put(job)
+        return job.future
+
+    def predict(self, images: List[Image]) -> Set[str]:
+        """Predict ingredients, batched with concurrent callers"""
+        return self.submit(images).result()
+
+    def predict_batch(self, requests: List[List[Image]]) -> List[Set[str]]:
+        """Predict the ingredients of several requests, batched with concurrent callers"""
+        futures = [self.submit(images) for images in requests]
+        return [future.result() for future in futures]
+
+    def _collect(self, first: _DetectionJob) -> List[_DetectionJob]:
+        """Gather queued jobs into a batch that starts with `first`"""
+        jobs = [first]
+        n_images = len(first.images)
+        deadline = first.enqueued_at + self.max_wait
+        while n_images < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                job = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                # Put the close marker back for the main loop
+                self._queue.put(None)
+                break
+            jobs.append(job)
+            n_images += len(job.images)
+        return jobs
+
+    def _run(self) -> None:
+        """Worker loop: form batches and run them"""
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            jobs = self._collect(first)
+            started = time.perf_counter()
+            n_images = sum(len(job.images) for job in jobs)
+            self._queue_depth_metric.add(-n_images)
+            self._record(jobs, n_images, started)
+
+            try:
+                results = self.model.predict_batch([job.images for job in jobs])
+            except Exception as e:
+                for job in jobs:
+                    job.future.set_exception(e)
+                continue
+            for job, ingredients in zip(jobs, results):
+                job.future.set_result(ingredients)
+
+    def _record(self, jobs: List[_DetectionJob], n_images: int, started: float) -> None:
+        """Update the batch size and queue wait metrics"""
+        self._batch_size_metric.record(n_images)
+        with self._lock:
+            self._batch_sizes[n_images] += 1
+            for job in jobs:
+                wait = started - job.enqueued_at
+                self._wait_metric.record(wait * 1000)
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+                self._jobs += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, batch size histogram and queue wait times"""
+        with self._queue.mutex:
+            queue_depth = sum(len(job.images) for job in self._queue.queue if job is not None)
+        with self._lock:
+            return {
+                "queue_depth": queue_depth,
+                "batches": sum(self._batch_sizes.values()),
+                "batch_sizes": dict(sorted(self._batch_sizes.items())),
+                "mean_wait_ms": self._wait_total / self._jobs * 1000 if self._jobs else 0.0,
+                "max_wait_ms": self._wait_max * 1000,
+            }
+
+    def close(self) -> None:
+        """Finish the queued jobs and stop the worker thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+        # Jobs submitted while closing
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                job.future.set_exception(RuntimeError("Detector batcher is closed"))
@@ -0,0 +1,210 @@
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+
+import numpy as np
+import PIL
+from PIL.Image import Image
+
+from cookingassistant.model.detector import ImageRecognitionModel
+
+
+def image_digest(image: Image) -> str:
+    """
+    Exact hash of an image: the digest of its source bytes when the loader
+    recorded one in `image.info["source_digest"]`, else of the decoded pixels
+    """
+    digest = image.info.get("source_digest")
+    if digest:
+        return digest
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{image.mode}:{image.size}".encode("ascii"))
+    h.update(image.tobytes())
+    return h.hexdigest()
+
+
+def perceptual_hash(image: Image, hash_size: int = 16) -> Optional[str]:
+    """
+    Difference hash: sign of the horizontal gradients of a small grayscale
+    thumbnail. Survives re-encoding, resizing and small color changes.
+    None for flat images, whose hashes would all collide.
+    """
+    thumbnail = image.convert("L").resize((hash_size + 1, hash_size), PIL.Image.BILINEAR)
+    pixels = np.asarray(thumbnail, dtype=np.int16)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    if not bits.any() or bits.all():
+        return None
+    return np.packbits(bits).tobytes().hex()
+
+
+def _approx_size(value: Any) -> int:
+    """Rough number of bytes held by a detection result"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_approx_size(k) + _approx_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_approx_size(item) for item in value)
+    return size
+
+
+class ImageKey:
+    """
+    Cache key of an image: exact digest, with the perceptual hash computed
+    on demand. `image` can also be a function decoding the image, so an
+    exact hit never decodes.
+    """
+
+    def __init__(self, exact: str, image: Union[Image, Callable[[], Image], None] = None,
+                 hash_size: int = 16):
+        self.exact = exact
+        self._image = image
+        self.hash_size = hash_size
+        self._perceptual: Optional[str] = None
+
+    @classmethod
+    def from_image(cls, image: Image, hash_size: int = 16) -> "ImageKey":
+        return cls(image_digest(image), image, hash_size)
+
+    @property
+    def image(self) -> Optional[Image]:
+        if callable(self._image):
+            self._image = self._image()
+        return self._image
+
+    @property
+    def perceptual(self) -> Optional[str]:
+        if self._perceptual is None and self.image is not None:
+            self._perceptual = perceptual_hash(self.image, self.hash_size)
+        return self._perceptual
+
+
+class DetectionCache:
+    """
+    Thread-safe LRU cache of detection results per image, bounded by an
+    approximate memory budget.
+
+    Lookups try the exact digest first and fall back to the perceptual hash,
+    so a re-encoded or resized copy of a photo also hits. The perceptual
+    hash is only computed on an exact miss.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.exact_hits = 0
+        self.perceptual_hits = 0
+        self.misses = 0
+        # exact digest -> (perceptual hash, result, size)
+        self._entries: "OrderedDict[str, Tuple[Optional[str], Any, int]]" = OrderedDict()
+        # perceptual hash -> exact digest of the entry that owns it
+        self._perceptual: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: ImageKey) -> Optional[Any]:
+        """Get the cached result of an image or None"""
+        with self._lock:
+            entry = self._entries.get(key.exact)
+            if entry is not None:
+                self._entries.move_to_end(key.exact)
+                self.exact_hits += 1
+                return entry[1]
+
+        perceptual = key.perceptual
+        with self._lock:
+            exact = self._perceptual.get(perceptual) if perceptual else None
+            if exact is not None:
+                self._entries.move_to_end(exact)
+                self.perceptual_hits += 1
+                return self._entries[exact][1]
+            self.misses += 1
+            return None
+
+    def put(self, key: ImageKey, result: Any) -> None:
+        """Store the result of an image, evicting the least recently used ones"""
+        perceptual = key.perceptual
+        size = _approx_size(result) + len(key.exact) + len(perceptual or "")
+        with self._lock:
+            self._discard(key.exact)
+            self._entries[key.exact] = (perceptual, result, size)
+            if perceptual:
+                self._perceptual[perceptual] = key.exact
+            self.bytes += size
+            while self.bytes > self.max_bytes and len(self._entries) > 1:
+                self._discard(next(iter(self._entries)))
+
+    def _discard(self, exact: str) -> None:
+        """Remove an entry, lock held"""
+        entry = self._entries.pop(exact, None)
+        if entry is None:
+            return
+        perceptual, _, size = entry
+        if perceptual and self._perceptual.get(perceptual) == exact:
+            del self._perceptual[perceptual]
+        self.bytes -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._perceptual.clear()
+            self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "exact_hits": self.exact_hits,
+            "perceptual_hits": self.perceptual_hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+        }
+
+
+class CachedImageRecognitionModel(ImageRecognitionModel):
+    """
+    Detector wrapper that answers repeated images from a DetectionCache.
+
+    Ingredients are cached per image. Only the images that miss are sent
+    to the wrapped model, all in one predict_batch call, and an image that
+    appears several times in a call is detected once.
+    """
+
+    def __init__(self, model: ImageRecognitionModel, cache: Optional[DetectionCache] = None):
+        self.model = model
+        self.cache = cache if cache is not None else DetectionCache()
+
+    def load_model(self, model_path: str) -> None:
+        """Load the wrapped model"""
+        return self.model.load_model(model_path)
+
+    def _detect_images(self, images: List[Image]) -> List[Set[str]]:
+        """Ingredients of every image, from the cache or the model"""
+        keys = [ImageKey.from_image(image) for image in images]
+        detected: List[Optional[Set[str]]] = [self.cache.get(key) for key in keys]
+
+        # Misses by digest, so a repeated image is detected once
+        misses: Dict[str, List[int]] = {}
+        for i, (key, ingredients) in enumerate(zip(keys, detected)):
+            if ingredients is None:
+                misses.setdefault(key.exact, []).append(i)
+
+        if misses:
+            positions = list(misses.values())
+            results = self.model.predict_batch([[images[p[0]]] for p in positions])
+            for p, ingredients in zip(positions, results):
+                self.cache.put(keys[p[0]], frozenset(ingredients))
+                for i in p:
+                    detected[i] = ingredients
+        return detected
+
+    def predict(self, images: List[Image]) -> Set[str]:
+        """Predict ingredients, skipping inference for cached images"""
+        return set().union(*self._detect_images(list(images)))
+
+    def predict_batch(self, requests: List[List[Image]]) -> List[Set[str]]:
+        """Predict the ingredients of several requests, skipping cached images"""
+        detected = iter(self._detect_images([image for images in requests for image in images]))
+        return [set().union(*(next(detected) for _ in images)) for images in requests]
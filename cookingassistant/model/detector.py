@@ -1,11 +1,13 @@
+import ast
 import os
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from typing import Any, Dict, List, Optional, Tuple, Set
 
+import numpy as np
 import PIL
+from opentelemetry import trace
 from PIL.Image import Image
-from ultralytics import YOLO
 
 from observation.telemetry.tracespan_decorator import TraceSpan
 
@@ -22,48 +24,246 @@ class ImageRecognitionModel(ABC):
     def predict(self, images: List[Image]) -> List[str]:
         """Predict ingredients from images and return their names"""
         pass
+
+    def predict_batch(self, requests: List[List[Image]]) -> List[Set[str]]:
+        """Predict the ingredients of several requests, one set per request"""
+        return [set(self.predict(images)) for images in requests]
     
 class PyTorchImageRecognitionModel(ImageRecognitionModel):
     """Concrete implementation of a PyTorch-based recognition model"""
     
-    def __init__(self, model_path: str):
+    def __init__(self, model_path: str, max_batch_size: int = 16,
+                 conf_threshold: Optional[float] = None):
         self.model = self.load_model(model_path)
+        # Images per forward pass; bounds memory on large uploads
+        self.max_batch_size = max_batch_size
+        # Boxes below this confidence are dropped, on top of the model's own
+        # threshold
+        self.conf_threshold = conf_threshold
     
     def load_model(self, model_path: str) -> None:
         """Load the PyTorch model"""
-        # Implementation would load the model
+        # Imported here so the ONNX backend works without the torch stack
+        from ultralytics import YOLO
+
         return YOLO(model_path)
+
+    def _detect(self, images: List[Image], owners: List[int], n_groups: int) -> List[Set[str]]:
+        """
+        Run the images through the model in batches and return the detected
+        class names of every group, where `owners[i]` is the group of image i
+        """
+        import torch
+
+        classes = []
+        groups = []
+        for start in range(0, len(images), self.max_batch_size):
+            batch = images[start:start + self.max_batch_size]
+            results = self.model(batch, verbose=False)
+            for owner, result in zip(owners[start:start + self.max_batch_size], results):
+                boxes = result.boxes
+                cls = boxes.cls
+                if self.conf_threshold is not None:
+                    cls = cls[boxes.conf >= self.conf_threshold]
+                classes.append(cls)
+                groups.append(torch.full_like(cls, owner))
+
+        detected = [set() for _ in range(n_groups)]
+        if not classes:
+            return detected
+
+        # One unique over (group, class) pairs for all boxes of all images
+        n_classes = len(self.model.names)
+        keys = torch.cat(groups).long() * n_classes + torch.cat(classes).long()
+        for key in torch.unique(keys).tolist():
+            group, class_id = divmod(key, n_classes)
+            detected[group].add(self.model.names[class_id])
+        return detected
         
     @TraceSpan("PyTorchImageRecognitionModel.predict")
     def predict(self, images: List[Image]) -> Set[str]:
         
         """Predict ingredients using the PyTorch model"""
-        # Implementation would run inference on images
-        ingredients = set()
-        for i in images:
-            # i = PIL.Image.open(i)
-            results = self.model(i)
-
-            # Lấy danh sách các vật thể phát hiện được
-            detected_objects = []
-            for r in results:
-                for box in r.boxes:
-                    detected_objects.append(
-                        {
-                            "class": self.model.names[int(box.cls)],  # Tên lớp
-                            "confidence": float(box.conf),  # Độ tin cậy
-                        }
-                    )
-            for obj in detected_objects:
-                ingredients.add(obj["class"])
-        return ingredients
+        return self._detect(list(images), [0] * len(images), 1)[0]
+
+    @TraceSpan("PyTorchImageRecognitionModel.predict_batch")
+    def predict_batch(self, requests: List[List[Image]]) -> List[Set[str]]:
+        """Predict the ingredients of several requests with shared batches"""
+        images = [image for request in requests for image in request]
+        owners = [i for i, request in enumerate(requests) for _ in request]
+        trace.get_current_span().set_attribute("detector.images", len(images))
+        return self._detect(images, owners, len(requests))
+
+def letterbox(image: Image, size: Tuple[int, int], fill: int = 114
+              ) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+    """
+    Resize an image to fit `size` (height, width) keeping its aspect ratio,
+    pad the rest with gray and return it as a normalized CHW float32 array,
+    with the scale and (left, top) padding applied
+    """
+    height, width = size
+    image = image.convert("RGB")
+    ratio = min(height / image.height, width / image.width)
+    new_width, new_height = round(image.width * ratio), round(image.height * ratio)
+    if (new_width, new_height) != image.size:
+        image = image.resize((new_width, new_height), PIL.Image.BILINEAR)
+
+    pad_left = (width - new_width) // 2
+    pad_top = (height - new_height) // 2
+    canvas = np.full((height, width, 3), fill, dtype=np.uint8)
+    canvas[pad_top:pad_top + new_height, pad_left:pad_left + new_width] = np.asarray(image)
+
+    array = canvas.transpose(2, 0, 1).astype(np.float32)
+    array *= 1.0 / 255.0
+    return array, ratio, (pad_left, pad_top)
+
+
+def non_max_suppression(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """
+    Greedy NMS over xyxy boxes. Returns the indices of the kept boxes, best
+    first. Each step drops every box overlapping the current best at once.
+    """
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    order = np.argsort(-scores, kind="stable")
+
+    keep = []
+    while order.size:
+        best, rest = order[0], order[1:]
+        keep.append(best)
+        width = (np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest])).clip(0)
+        height = (np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest])).clip(0)
+        inter = width * height
+        iou = inter / (areas[best] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
 
-    #Predict with 
-    #def predict(self, images: List[Image]) -> List[str]:
-    #    """Predict ingredients using the PyTorch model"""
-    #    # Implementation would run inference on images
-    #    return []
 
 class OnnxImageRecognitionModel(ImageRecognitionModel):
-    pass
+    """
+    YOLO detector exported to ONNX, run with ONNX Runtime on CPU.
+
+    Preprocessing (letterbox, scaling to [0, 1]), output decoding and NMS
+    are done in NumPy, so neither torch nor ultralytics is imported. Export
+    the model with `YOLO("best.pt").export(format="onnx", dynamic=True)`
+    to allow batches of several images.
+    """
+    # Offset separating boxes of different classes so one NMS pass keeps
+    # classes independent
+    MAX_WH = 7680
 
+    def __init__(self, model_path: str, max_batch_size: int = 8,
+                 conf_threshold: float = 0.25, iou_threshold: float = 0.7,
+                 intra_op_threads: Optional[int] = None,
+                 inter_op_threads: Optional[int] = None):
+        # Same defaults as ultralytics' predictor, for matching detections
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        # Threads used inside one operator and across parallel operators,
+        # None lets ONNX Runtime decide
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.session = self.load_model(model_path)
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch, _, height, width = model_input.shape
+        # Dynamic axes are reported as names instead of sizes
+        self.input_size = (
+            height if isinstance(height, int) else 640,
+            width if isinstance(width, int) else 640,
+        )
+        # A model exported without dynamic axes takes exactly `batch` images
+        self.static_batch_size = batch if isinstance(batch, int) else None
+        self.max_batch_size = self.static_batch_size or max_batch_size
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names: Dict[int, str] = ast.literal_eval(metadata["names"]) if "names" in metadata else {}
+
+    def load_model(self, model_path: str):
+        """Create the ONNX Runtime session"""
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError(
+                "The ONNX backend needs onnxruntime: pip install onnxruntime"
+            ) from e
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.intra_op_threads is not None:
+            options.intra_op_num_threads = self.intra_op_threads
+        if self.inter_op_threads is not None:
+            options.inter_op_num_threads = self.inter_op_threads
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+        return ort.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+
+    def _decode(self, prediction: np.ndarray, ratio: float, pad: Tuple[float, float],
+                image_size: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Turn one image's raw output, (4 + classes, anchors) with boxes as
+        center/size, into NMS-filtered xyxy boxes in original image
+        coordinates, their scores and class ids
+        """
+        prediction = prediction.T
+        class_scores = prediction[:, 4:]
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(class_scores)), class_ids]
+
+        keep = scores >= self.conf_threshold
+        boxes, scores, class_ids = prediction[keep, :4], scores[keep], class_ids[keep]
+        if len(scores) == 0:
+            return np.zeros((0, 4), dtype=np.float32), scores, class_ids
+
+        xy, wh = boxes[:, :2], boxes[:, 2:] / 2
+        boxes = np.concatenate([xy - wh, xy + wh], axis=1)
+        kept = non_max_suppression(
+            boxes + class_ids[:, None] * self.MAX_WH, scores, self.iou_threshold
+        )
+        boxes, scores, class_ids = boxes[kept], scores[kept], class_ids[kept]
+
+        boxes -= np.asarray([pad[0], pad[1], pad[0], pad[1]], dtype=boxes.dtype)
+        boxes /= ratio
+        width, height = image_size
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+        return boxes, scores, class_ids
+
+    def detect(self, images: List[Image]) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Boxes (xyxy), scores and class ids detected in every image"""
+        detections = []
+        for start in range(0, len(images), self.max_batch_size):
+            chunk = images[start:start + self.max_batch_size]
+            batch = [letterbox(image, self.input_size) for image in chunk]
+            inputs = np.stack([array for array, _, _ in batch])
+            if self.static_batch_size is not None and len(inputs) < self.static_batch_size:
+                # Fill a static batch with blank images; their outputs are
+                # dropped by the zip below
+                padding = np.zeros((self.static_batch_size - len(inputs), *inputs.shape[1:]), dtype=inputs.dtype)
+                inputs = np.concatenate([inputs, padding])
+            outputs = self.session.run(None, {self.input_name: inputs})[0]
+            for prediction, image, (_, ratio, pad) in zip(outputs, chunk, batch):
+                detections.append(self._decode(prediction, ratio, pad, image.size))
+        return detections
+
+    @TraceSpan("OnnxImageRecognitionModel.predict")
+    def predict(self, images: List[Image]) -> Set[str]:
+        """Predict ingredients using the ONNX model"""
+        return self.predict_batch([images])[0]
+
+    @TraceSpan("OnnxImageRecognitionModel.predict_batch")
+    def predict_batch(self, requests: List[List[Image]]) -> List[Set[str]]:
+        """Predict the ingredients of several requests with shared batches"""
+        images = [image for request in requests for image in request]
+        detections = iter(self.detect(images))
+        trace.get_current_span().set_attribute("detector.images", len(images))
+
+        ingredients = []
+        for request in requests:
+            class_ids = np.concatenate(
+                [next(detections)[2] for _ in request] or [np.zeros(0, dtype=np.int64)]
+            )
+            ingredients.append({self.names.get(int(c), str(c)) for c in np.unique(class_ids)})
+        return ingredients
@@ -1,15 +1,58 @@
+import asyncio
 import json
 import os
+import random
+import threading
+import time
 from abc import ABC, abstractmethod
+from contextlib import nullcontext
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
 
+import httpx
 import requests
+from opentelemetry import trace
+from requests.adapters import HTTPAdapter
 
+from cookingassistant.aio import run_in_executor
+from cookingassistant.cache import ResponseCache
 from cookingassistant.data.item import Ingredient, Recipe
+from cookingassistant.data.normalize import normalize_ingredient_name
+from cookingassistant.model.prompt import PromptBuilder
 from observation.telemetry.tracespan_decorator import TraceSpan
 
 
+# Marks the end of a chat completion event stream
+_SSE_DONE = object()
+
+
+def _sse_delta(line: str) -> Any:
+    """Content delta of one line of a chat completion event stream, _SSE_DONE at its end"""
+    if not line.startswith("data:"):
+        # Blank separators, comments and keep-alives
+        return None
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        return _SSE_DONE
+    choices = json.loads(data).get("choices") or [{}]
+    return (choices[0].get("delta") or {}).get("content")
+
+
+def completion_content(body: Dict[str, Any]) -> str:
+    """Message text of a (non-streamed) chat completion"""
+    return body["choices"][0]["message"]["content"] or ""
+
+
+def iter_sse_deltas(lines: Iterable[str]) -> Iterator[str]:
+    """Content deltas of a chat completion event stream, given its lines"""
+    for line in lines:
+        delta = _sse_delta(line)
+        if delta is _SSE_DONE:
+            return
+        if delta:
+            yield delta
+
+
 class LLMClient(ABC):
     """Abstract class for LLM API client"""
 
@@ -18,70 +61,434 @@ class LLMClient(ABC):
         """Generate text using the LLM"""
         pass
 
-@TraceSpan("OpenAIClient.generate_text")
+    async def agenerate_text(self, prompt: str) -> str:
+        """Async generate_text, run in a worker thread by default"""
+        return await run_in_executor(None, self.generate_text, prompt)
+
+    def stream_text(self, prompt: str) -> Iterator[str]:
+        """Generate text in pieces as it is produced; one piece by default"""
+        yield self.generate_text(prompt)
+
+    async def astream_text(self, prompt: str) -> AsyncIterator[str]:
+        """Async stream_text"""
+        yield await self.agenerate_text(prompt)
+
 class OpenAIClient(LLMClient):
-    """Implementation for OpenAI's API"""
+    """
+    Implementation for OpenAI's API
 
-    def __init__(self, api_key: str, model: str = "gpt-4"):
+    Calls reuse keep-alive connections from a pool (a requests.Session for
+    generate_text, an httpx.AsyncClient for agenerate_text), have connect
+    and read timeouts, and are retried with jittered exponential backoff on
+    429/5xx responses and connection errors. `max_concurrency` caps the
+    calls in flight at once, separately for sync and async callers.
+    """
+    API_URL = "https://api.deepseek.com/chat/completions"
+    # Statuses worth retrying: rate limited or a transient server error
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(self, api_key: str, model: str = "gpt-4",
+                 api_url: Optional[str] = None,
+                 max_connections: int = 200,
+                 max_concurrency: Optional[int] = None,
+                 connect_timeout: float = 5.0,
+                 read_timeout: float = 60.0,
+                 max_retries: int = 3,
+                 backoff_base: float = 0.5,
+                 backoff_max: float = 8.0):
         self.api_key = api_key
         self.model = model
+        self.api_url = api_url or self.API_URL
+        # Keep-alive connections each pool holds to the API
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
 
-    def generate_text(self, prompt: str) -> str:
-        """Generate text using OpenAI's API"""
-        url = "https://api.deepseek.com/chat/completions"
-        headers = {
+        self._session = requests.Session()
+        self._session.mount(self.api_url, HTTPAdapter(pool_connections=1, pool_maxsize=max_connections))
+        self._limiter = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        # Created inside the event loop using them
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_limiter: Optional[asyncio.Semaphore] = None
+
+    def _headers(self) -> Dict[str, str]:
+        return {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}"
         }
-        prompt = {
+
+    def _payload(self, prompt: str, stream: bool = False) -> Dict[str, Any]:
+        return {
             "model": self.model,
             "messages": [
                 {"role": "user", "content": prompt}
             ],
-            "stream": False  # Disable streaming
+            "stream": stream
         }
-        response = requests.post(url, headers=headers, json=prompt)
-        return response.text
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Seconds to wait before retry `attempt`, honouring a Retry-After header"""
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        # Full jitter, so clients throttled together do not retry together
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _post(self, prompt: str, stream: bool = False) -> requests.Response:
+        """POST a completion request, retrying throttled and failed attempts"""
+        span = trace.get_current_span()
+        for attempt in range(self.max_retries + 1):
+            span.set_attribute("llm.attempts", attempt + 1)
+            last_attempt = attempt == self.max_retries
+            try:
+                response = self._session.post(
+                    self.api_url, headers=self._headers(), json=self._payload(prompt, stream),
+                    timeout=(self.connect_timeout, self.read_timeout), stream=stream,
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if last_attempt:
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+            if response.status_code not in self.RETRY_STATUSES or last_attempt:
+                return response
+            response.close()
+            time.sleep(self._backoff(attempt, response.headers.get("Retry-After")))
+
+    @TraceSpan("OpenAIClient.generate_text")
+    def generate_text(self, prompt: str) -> str:
+        """Generate text using OpenAI's API; returns the completion's message content"""
+        with self._limiter or nullcontext():
+            response = self._post(prompt)
+        # Errors left after the retries are raised, never returned as text
+        response.raise_for_status()
+        return completion_content(response.json())
+
+    def stream_text(self, prompt: str) -> Iterator[str]:
+        """Generate text using OpenAI's API, yielding content deltas as they arrive"""
+        # A span made current here would leak into the consumer between
+        # yields, so it is only current while the request is sent
+        span = trace.get_tracer(__name__).start_span("OpenAIClient.stream_text")
+        start = time.perf_counter()
+        try:
+            with self._limiter or nullcontext():
+                with trace.use_span(span, end_on_exit=False):
+                    response = self._post(prompt, stream=True)
+                with response:
+                    response.raise_for_status()
+                    chunks = 0
+                    for delta in iter_sse_deltas(response.iter_lines(decode_unicode=True)):
+                        if not chunks:
+                            span.set_attribute("llm.ttft_ms", (time.perf_counter() - start) * 1000)
+                        chunks += 1
+                        yield delta
+                    span.set_attribute("llm.chunks", chunks)
+        finally:
+            span.end()
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """Shared async HTTP client, created inside the event loop using it"""
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+            if self.max_concurrency:
+                self._async_limiter = asyncio.Semaphore(self.max_concurrency)
+        return self._async_client
+
+    async def _apost(self, prompt: str, stream: bool = False) -> httpx.Response:
+        """Async _post; a streamed response has to be closed by the caller"""
+        client = self._get_async_client()
+        span = trace.get_current_span()
+        for attempt in range(self.max_retries + 1):
+            span.set_attribute("llm.attempts", attempt + 1)
+            last_attempt = attempt == self.max_retries
+            request = client.build_request(
+                "POST", self.api_url, headers=self._headers(), json=self._payload(prompt, stream)
+            )
+            try:
+                response = await client.send(request, stream=stream)
+            except httpx.TransportError:
+                if last_attempt:
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+            if response.status_code not in self.RETRY_STATUSES or last_attempt:
+                return response
+            await response.aclose()
+            await asyncio.sleep(self._backoff(attempt, response.headers.get("Retry-After")))
+
+    @TraceSpan("OpenAIClient.agenerate_text")
+    async def agenerate_text(self, prompt: str) -> str:
+        """Generate text using OpenAI's API without blocking the event loop"""
+        self._get_async_client()
+        async with self._async_limiter or nullcontext():
+            response = await self._apost(prompt)
+        response.raise_for_status()
+        return completion_content(response.json())
+
+    async def astream_text(self, prompt: str) -> AsyncIterator[str]:
+        """Async stream_text"""
+        self._get_async_client()
+        span = trace.get_tracer(__name__).start_span("OpenAIClient.astream_text")
+        start = time.perf_counter()
+        try:
+            async with self._async_limiter or nullcontext():
+                with trace.use_span(span, end_on_exit=False):
+                    response = await self._apost(prompt, stream=True)
+                try:
+                    response.raise_for_status()
+                    chunks = 0
+                    async for line in response.aiter_lines():
+                        delta = _sse_delta(line)
+                        if delta is _SSE_DONE:
+                            break
+                        if delta:
+                            if not chunks:
+                                span.set_attribute("llm.ttft_ms", (time.perf_counter() - start) * 1000)
+                            chunks += 1
+                            yield delta
+                    span.set_attribute("llm.chunks", chunks)
+                finally:
+                    await response.aclose()
+        finally:
+            span.end()
+
+    def close(self) -> None:
+        """Close the pooled connections of the sync session"""
+        self._session.close()
+
+    async def aclose(self) -> None:
+        """Close the async HTTP client"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+            self._async_limiter = None
 
 class BaseInstructionGenerator():
     @abstractmethod
     def generate_instructions(self, recipe: Recipe, available_ingredients: List[Ingredient], user_query: str) -> str:
         pass
 
+    async def agenerate_instructions(self, recipe: Recipe, available_ingredients: List[Ingredient], user_query: str) -> str:
+        """Async generate_instructions, run in a worker thread by default"""
+        return await run_in_executor(None, self.generate_instructions, recipe, available_ingredients, user_query)
+
+    def generate_instructions_stream(self, recipe: Recipe, available_ingredients: List[Ingredient], user_query: str) -> Iterator[str]:
+        """Generate instructions in pieces as they are produced; one piece by default"""
+        yield self.generate_instructions(recipe, available_ingredients, user_query)
+
+    async def agenerate_instructions_stream(self, recipe: Recipe, available_ingredients: List[Ingredient], user_query: str) -> AsyncIterator[str]:
+        """Async generate_instructions_stream"""
+        yield await self.agenerate_instructions(recipe, available_ingredients, user_query)
+
 class InstructionGeneratorByLLM(BaseInstructionGenerator):
-    """Class that generates cooking instructions using LLM"""
+    """
+    Class that generates cooking instructions using LLM
+
+    With a response cache, instructions are reused for requests with the
+    same recipe and available ingredients and the same or a similar query.
+    """
 
-    def __init__(self, llm_client: LLMClient):
+    def __init__(self, llm_client: LLMClient, response_cache: Optional[ResponseCache] = None,
+                 prompt_builder: Optional[PromptBuilder] = None):
         self.llm_client = llm_client
+        self.response_cache = response_cache
+        self.prompt_builder = prompt_builder or PromptBuilder()
 
+    @TraceSpan("InstructionGeneratorByLLM.create_prompt")
     def create_prompt(self, recipe: Recipe, available_ingredients: List[Ingredient], user_query: str) -> str:
-        """Create a prompt for the LLM based on recipe and user query"""
-        ingredient_list = ", ".join([ing.name for ing in available_ingredients])
-        prompt = (
-            f"You are a professional chef assistant. The user wants to cook '{recipe.name}'.\n"
-            f"The recipe includes these ingredients: {', '.join([ing.name for ing in recipe.ingredients])}.\n"
-            f"The user currently has these ingredients: {ingredient_list}.\n"
-            f"The user asks: {user_query}.\n"
-            f"Provide step-by-step cooking instructions considering the available ingredients."
+        """Create a prompt for the LLM based on recipe and user query, within the token budget"""
+        prompt = self.prompt_builder.build(recipe, available_ingredients, user_query)
+        span = trace.get_current_span()
+        span.set_attribute("llm.prompt_tokens", prompt.tokens)
+        span.set_attribute("llm.prompt_dropped_items", prompt.dropped_items)
+        return prompt.text
+
+    @staticmethod
+    def top_recipe(recipes: Recipe | Dict[str, Any] | List[Recipe | Dict[str, Any]]) -> Optional[Recipe]:
+        """
+        The recipe to write instructions for: a Recipe, or the first of the
+        ranked (serialized) recipes the assistant passes. None if there is none
+        """
+        if isinstance(recipes, list):
+            if not recipes:
+                return None
+            recipes = recipes[0]
+        if isinstance(recipes, Recipe):
+            return recipes
+        return Recipe(
+            id=recipes["id"],
+            name=recipes["name"],
+            ingredients=[Ingredient(ing["name"], ing.get("is_common", False)) for ing in recipes["ingredients"]],
+            instructions=recipes.get("instructions") or "",
+            category=recipes.get("category"),
         )
-        return prompt
+
+    @staticmethod
+    def response_scope(recipe: Recipe, available_ingredients: List[Ingredient]) -> str:
+        """Response cache scope: the recipe id and the canonical set of available ingredients"""
+        ingredients = sorted({normalize_ingredient_name(ing.name) for ing in available_ingredients})
+        return f"{recipe.id}|{','.join(ingredients)}"
 
     def generate_instructions(self, recipe: Recipe, available_ingredients: List[Ingredient], user_query: str) -> str:
         """Generate detailed cooking instructions using LLM"""
         if self.llm_client.api_key == '':
             raise Exception("No API Key provided")
+        recipe = self.top_recipe(recipe)
+        if recipe is None:
+            return ""
+        if self.response_cache is not None:
+            scope = self.response_scope(recipe, available_ingredients)
+            cached = self.response_cache.get(scope, user_query)
+            if cached is not None:
+                return cached
+
+        prompt = self.create_prompt(recipe, available_ingredients, user_query)
+        start = time.perf_counter()
+        instructions = self.llm_client.generate_text(prompt)
+        if self.response_cache is not None and instructions:
+            self.response_cache.put(scope, user_query, instructions, time.perf_counter() - start)
+        return instructions
+
+    async def agenerate_instructions(self, recipe: Recipe, available_ingredients: List[Ingredient], user_query: str) -> str:
+        """Generate detailed cooking instructions using LLM, awaiting the API call"""
+        if self.llm_client.api_key == '':
+            raise Exception("No API Key provided")
+        recipe = self.top_recipe(recipe)
+        if recipe is None:
+            return ""
+        if self.response_cache is not None:
+            # Lookups may embed the query
+            scope = self.response_scope(recipe, available_ingredients)
+            cached = await run_in_executor(None, self.response_cache.get, scope, user_query)
+            if cached is not None:
+                return cached
+
+        prompt = self.create_prompt(recipe, available_ingredients, user_query)
+        start = time.perf_counter()
+        instructions = await self.llm_client.agenerate_text(prompt)
+        if self.response_cache is not None and instructions:
+            await run_in_executor(None, self.response_cache.put, scope, user_query,
+                                  instructions, time.perf_counter() - start)
+        return instructions
+
+    def generate_instructions_stream(self, recipe: Recipe, available_ingredients: List[Ingredient], user_query: str) -> Iterator[str]:
+        """Generate detailed cooking instructions using LLM, yielding them as they are generated"""
+        if self.llm_client.api_key == '':
+            raise Exception("No API Key provided")
+        recipe = self.top_recipe(recipe)
+        if recipe is None:
+            return
+        if self.response_cache is not None:
+            scope = self.response_scope(recipe, available_ingredients)
+            cached = self.response_cache.get(scope, user_query)
+            if cached is not None:
+                yield cached
+                return
+
         prompt = self.create_prompt(recipe, available_ingredients, user_query)
-        return self.llm_client.generate_text(prompt)
+        start = time.perf_counter()
+        deltas = []
+        for delta in self.llm_client.stream_text(prompt):
+            deltas.append(delta)
+            yield delta
+        # Only complete streams are cached
+        if self.response_cache is not None and deltas:
+            self.response_cache.put(scope, user_query, "".join(deltas), time.perf_counter() - start)
+
+    async def agenerate_instructions_stream(self, recipe: Recipe, available_ingredients: List[Ingredient], user_query: str) -> AsyncIterator[str]:
+        """Async generate_instructions_stream"""
+        if self.llm_client.api_key == '':
+            raise Exception("No API Key provided")
+        recipe = self.top_recipe(recipe)
+        if recipe is None:
+            return
+        if self.response_cache is not None:
+            scope = self.response_scope(recipe, available_ingredients)
+            cached = await run_in_executor(None, self.response_cache.get, scope, user_query)
+            if cached is not None:
+                yield cached
+                return
+
+        prompt = self.create_prompt(recipe, available_ingredients, user_query)
+        start = time.perf_counter()
+        deltas = []
+        async for delta in self.llm_client.astream_text(prompt):
+            deltas.append(delta)
+            yield delta
+        if self.response_cache is not None and deltas:
+            await run_in_executor(None, self.response_cache.put, scope, user_query,
+                                  "".join(deltas), time.perf_counter() - start)
 
 class InstructionGeneratorByTemplate(BaseInstructionGenerator):
+    """
+    Formats the suggested recipes as plain text instructions.
+
+    Each recipe's block (name, ingredients and bulleted instructions) is
+    rendered once and cached by recipe id; a response numbers the cached
+    blocks and joins them in one go. Blocks expire after `ttl` seconds, so
+    recipes updated by a writer in another process (create_db.py) are shown
+    like the search results cached alongside them; `invalidate` drops a
+    block right away.
+    """
+
+    def __init__(self, max_cached_blocks: int = 10000, ttl: float = 300.0):
+        self.max_cached_blocks = max_cached_blocks
+        self.ttl = ttl
+        # Reads are lock-free dict lookups of (expiry, block); past the limit
+        # the oldest blocks are dropped
+        self._blocks: Dict[str, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def render_block(recipe: Dict[str, Any]) -> str:
+        """Text of one recipe, without its number"""
+        ingredients = ', '.join([ing["name"] for ing in recipe["ingredients"]])
+        instruction = "\n    -".join(recipe["instructions"].split("\n"))
+        return f"Name: {recipe['name']}\nIngredients: {ingredients}\nInstructions:\n    -{instruction}\n\n"
+
+    def _render(self, recipe: Dict[str, Any], now: float) -> str:
+        """Render a recipe's block and cache it if the recipe has an id"""
+        block = self.render_block(recipe)
+        recipe_id = recipe.get("id")
+        if recipe_id is not None:
+            with self._lock:
+                # Re-inserted at the end, so eviction drops the oldest renders
+                self._blocks.pop(recipe_id, None)
+                self._blocks[recipe_id] = (now + self.ttl, block)
+                while len(self._blocks) > self.max_cached_blocks:
+                    self._blocks.pop(next(iter(self._blocks)))
+        return block
+
+    def prerender(self, recipes: Iterable[Dict[str, Any]]) -> None:
+        """Render and cache the blocks of recipes ahead of the requests that return them"""
+        now = time.monotonic()
+        for recipe in recipes:
+            self._render(recipe, now)
+
+    def invalidate(self, recipe_id: str) -> None:
+        """Drop the cached block of a recipe that has changed"""
+        with self._lock:
+            self._blocks.pop(recipe_id, None)
+
     def generate_instructions(self, recipe: Recipe, available_ingredients: List[Ingredient], user_query: str) -> str:
-        final_result = ""
+        now = time.monotonic()
+        parts = []
         for i, r in enumerate(recipe):
-            final_result += f"{i+1}.\n"
-            final_result += f"""Name: {r["name"]}\n"""
-            final_result += f"""Ingredients: {', '.join([ing["name"] for ing in r["ingredients"]])}\n"""
-            instruction = "\n    -".join(r["instructions"].split("\n"))
-            final_result += f"""Instructions:\n    -{instruction}\n\n"""
-
-        return str(final_result)
-    
\ No newline at end of file
+            entry = self._blocks.get(r.get("id"))
+            parts.append(f"{i+1}.\n")
+            parts.append(entry[1] if entry is not None and entry[0] > now else self._render(r, now))
+        return "".join(parts)
+
+    async def agenerate_instructions(self, recipe: Recipe, available_ingredients: List[Ingredient], user_query: str) -> str:
+        """Formatting is cheap, no worker thread needed"""
+        return self.generate_instructions(recipe, available_ingredients, user_query)
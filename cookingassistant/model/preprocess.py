@@ -0,0 +1,78 @@
+import asyncio
+import hashlib
+import io
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Union
+
+import PIL
+from PIL import ImageOps
+from PIL.Image import Image
+
+from cookingassistant.aio import run_in_executor
+
+ImageSource = Union[str, bytes, Image]
+
+
+class ImageLoader:
+    """
+    Decodes photos straight to detector input size.
+
+    Detectors resize to `target_size` anyway, so full resolution is never
+    needed: JPEGs are decoded in draft mode, which lets libjpeg scale by
+    1/2, 1/4 or 1/8 while decoding, then EXIF orientation is applied and the
+    image is resized so its longest side is `target_size`. Decoding releases
+    the GIL, so the images of a request are loaded in parallel threads.
+
+    The digest of the source bytes is kept in `image.info["source_digest"]`
+    for the detection cache.
+    """
+
+    def __init__(self, target_size: int = 640, max_workers: int = 4):
+        self.target_size = target_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-loader")
+
+    def _fit(self, image: Image) -> Image:
+        """Orient and shrink a copy of an image to the target size, in RGB"""
+        image = ImageOps.exif_transpose(image)
+        if max(image.size) > self.target_size:
+            # reducing_gap lets Pillow shrink by an integer factor first,
+            # much faster than one large bilinear resize
+            image.thumbnail((self.target_size, self.target_size), PIL.Image.BILINEAR, reducing_gap=2.0)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        return image
+
+    def load(self, source: ImageSource) -> Image:
+        """Decode a path, encoded bytes or a PIL image to detector input"""
+        if isinstance(source, Image):
+            digest = source.info.get("source_digest")
+            # exif_transpose returns a copy, the caller's image is left alone
+            image = self._fit(source)
+        else:
+            if isinstance(source, str):
+                with open(source, "rb") as f:
+                    source = f.read()
+            digest = hashlib.blake2b(source, digest_size=16).hexdigest()
+            image = PIL.Image.open(io.BytesIO(source))
+            if image.format == "JPEG":
+                image.draft("RGB", (self.target_size, self.target_size))
+            image = self._fit(image)
+
+        if digest:
+            image.info["source_digest"] = digest
+        return image
+
+    def load_many(self, sources: Sequence[ImageSource]) -> List[Image]:
+        """Decode the images of a request in parallel, keeping their order"""
+        if len(sources) <= 1:
+            return [self.load(source) for source in sources]
+        return list(self._executor.map(self.load, sources))
+
+    async def aload_many(self, sources: Sequence[ImageSource]) -> List[Image]:
+        """Decode the images of a request in the loader's threads, without blocking the event loop"""
+        return list(await asyncio.gather(
+            *(run_in_executor(self._executor, self.load, source) for source in sources)
+        ))
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
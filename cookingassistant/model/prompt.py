@@ -0,0 +1,163 @@
+import math
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from cookingassistant.data.item import Ingredient, Recipe
+from cookingassistant.data.normalize import (ingredient_head, ingredient_tokens,
+                                             normalize_ingredient_name)
+
+_PIECE = re.compile(r"\w+|[^\w\s]")
+# Numbering and bullets at the start of an instruction step
+_STEP_PREFIX = re.compile(r"^\s*(?:step\s*\d+\s*[:.)-]?|\d+\s*[.):-]|[-*•])\s*", re.IGNORECASE)
+
+
+def approx_token_count(text: str) -> int:
+    """
+    Approximate the number of BPE tokens of a text without a tokenizer:
+    a word costs one token per 4 characters, punctuation one token each.
+    This slightly overestimates typical English, which is the safe side
+    for a budget.
+    """
+    return sum(math.ceil(len(piece) / 4) for piece in _PIECE.findall(text))
+
+
+def compress_instructions(instructions: str) -> List[str]:
+    """Instruction steps without numbering, blank lines, repeated whitespace or duplicates"""
+    steps = []
+    seen = set()
+    for line in instructions.split("\n"):
+        step = " ".join(_STEP_PREFIX.sub("", line).split()).rstrip(" .;")
+        if step and step.lower() not in seen:
+            seen.add(step.lower())
+            steps.append(step)
+    return steps
+
+
+def _sentence(text: str) -> str:
+    """Text ending with a full stop unless it already ends a sentence"""
+    return text if text.endswith((".", "?", "!")) else f"{text}."
+
+
+@dataclass
+class Prompt:
+    """A built prompt and what fitting it in the budget took"""
+    text: str
+    tokens: int
+    # Ingredients and steps left out to stay within the budget
+    dropped_items: int = 0
+
+
+class PromptBuilder:
+    """
+    Builds the instruction prompt within a token budget.
+
+    The role, dish and task lines are always included and the user query
+    is capped at `max_query_tokens`. The rest of the budget is filled in
+    order of usefulness: the recipe ingredients the user is missing, the
+    ones they have, the recipe's compressed steps (each capped at
+    `max_step_tokens`) and finally their other ingredients. Recipe
+    ingredients are deduplicated by their main food ("onions, raw" ->
+    "onion") and, as in the reranker, count as available when all words of
+    a detected ingredient appear in their description. Tokens are counted
+    with `count_tokens`, a local approximation unless a real tokenizer is
+    given.
+    """
+    # Optional sections in reading order: key, label and item separator.
+    # Dataset ingredient descriptions contain commas ("butter, salted")
+    SECTIONS = (
+        ("missing", "The user is missing these recipe ingredients:", "; "),
+        ("have", "The user has these recipe ingredients:", "; "),
+        ("others", "The user also has:", "; "),
+        ("steps", "Recipe steps:", "; "),
+    )
+    # Order in which the optional sections get the budget
+    PRIORITY = ("missing", "have", "steps", "others")
+
+    def __init__(self, max_tokens: int = 768,
+                 max_query_tokens: int = 64,
+                 max_step_tokens: int = 48,
+                 count_tokens: Callable[[str], int] = approx_token_count):
+        self.max_tokens = max_tokens
+        self.max_query_tokens = max_query_tokens
+        self.max_step_tokens = max_step_tokens
+        self.count_tokens = count_tokens
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut a text to whole words within `max_tokens`"""
+        if self.count_tokens(text) <= max_tokens:
+            return text
+        words = []
+        used = self.count_tokens("...")
+        for word in text.split():
+            used += self.count_tokens(word)
+            if used > max_tokens:
+                break
+            words.append(word)
+        return " ".join(words) + "..."
+
+    @staticmethod
+    def dedupe(names: Sequence[str], key: Callable[[str], str] = normalize_ingredient_name) -> Dict[str, str]:
+        """key(name) -> first spelling, in order"""
+        unique: Dict[str, str] = {}
+        for name in names:
+            unique.setdefault(key(name), name.strip())
+        return unique
+
+    def _fill(self, items: List[str], budget: int) -> Tuple[List[str], int]:
+        """Leading items that fit in the budget, counting a separator each, and the tokens used"""
+        kept = []
+        used = 0
+        for item in items:
+            cost = self.count_tokens(item) + 1
+            if used + cost > budget:
+                break
+            kept.append(item)
+            used += cost
+        return kept, used
+
+    def build(self, recipe: Recipe, available_ingredients: List[Ingredient], user_query: str) -> Prompt:
+        """Build the prompt asking for instructions to cook `recipe`"""
+        recipe_names = list(self.dedupe([ing.name for ing in recipe.ingredients], ingredient_head).values())
+        available_names = list(self.dedupe([ing.name for ing in available_ingredients]).values())
+        available_tokens = [ingredient_tokens(name) for name in available_names]
+        used = set()
+        missing, have = [], []
+        for name in recipe_names:
+            tokens = ingredient_tokens(name)
+            matches = {i for i, query in enumerate(available_tokens) if query and query <= tokens}
+            (have if matches else missing).append(name)
+            used |= matches
+        others = [name for i, name in enumerate(available_names) if available_tokens[i] and i not in used]
+        steps = [self.truncate(step, self.max_step_tokens) for step in compress_instructions(recipe.instructions)]
+
+        header = f"You are a professional chef assistant. The user wants to cook '{recipe.name}'."
+        task = "Provide step-by-step cooking instructions considering the available ingredients."
+        budget = self.max_tokens - self.count_tokens(header) - self.count_tokens(task)
+        # The query gets what is left after its label and full stop, up to its cap
+        query_label = "The user asks:"
+        query_tokens = min(self.max_query_tokens, budget - self.count_tokens(query_label) - 1)
+        query = _sentence(f"{query_label} {self.truncate(' '.join(user_query.split()), query_tokens)}")
+        budget -= self.count_tokens(query)
+
+        candidates = {"missing": missing, "have": have, "others": others, "steps": steps}
+        labels = {key: label for key, label, _ in self.SECTIONS}
+        sections: Dict[str, List[str]] = {}
+        dropped = 0
+        for key in self.PRIORITY:
+            items = candidates[key]
+            # The label and the closing full stop
+            overhead = self.count_tokens(labels[key]) + 1
+            kept, used = self._fill(items, budget - overhead)
+            if kept:
+                sections[key] = kept
+                budget -= used + overhead
+            dropped += len(items) - len(kept)
+
+        lines = [header]
+        for key, label, separator in self.SECTIONS:
+            if key in sections:
+                lines.append(f"{label} {separator.join(sections[key])}.")
+        lines.extend([query, task])
+        text = "\n".join(lines)
+        return Prompt(text, self.count_tokens(text), dropped)
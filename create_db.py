@@ -1,33 +1,51 @@
-import pandas as pd
+import argparse
+
 from tqdm import tqdm
 
-from cookingassistant.data.item import Ingredient, Recipe
-from cookingassistant.database import VectorRecipeDatabase
-from pymilvus import MilvusException
+from cookingassistant.cache import EmbeddingCache
+from cookingassistant.data.checkpoint import IngestionCheckpoint
+from cookingassistant.data.ingredient_index import IngredientIndex
+from cookingassistant.data.reader import iter_recipes
+from cookingassistant.database import (LocalVectorRecipeDatabase,
+                                       VectorRecipeDatabase)
+
+parser = argparse.ArgumentParser(description="Load the recipe dataset into a recipe database")
+parser.add_argument("--backend", choices=["milvus", "local"], default="milvus",
+                    help="milvus server or in-process local index")
+parser.add_argument("--local-path", default="./data/local_index",
+                    help="directory of the local index")
+parser.add_argument("--index-type", choices=["flat", "hnsw"], default="flat",
+                    help="search index of the local backend")
+parser.add_argument("--ingredient-index", default="./data/ingredient_index.npz",
+                    help="where to write the inverted ingredient index")
+args = parser.parse_args()
 
 # Connect to the database
-vectordb = VectorRecipeDatabase()
-vectordb.connect("localhost:19530")
-
-# Load the dataset
-df = pd.read_json("./data/recipes_with_nutritional_info.json")
-df["ingredients"] = df["ingredients"].apply(lambda x: [i["text"] for i in x])
-df["instructions"] = df["instructions"].apply(lambda x: "\n".join([i["text"] for i in x]))
-
-# Add all ingredients to the database
-ingredients_name = set()
-for ingredient in df["ingredients"].values:
-    for i in ingredient:
-        ingredients_name.add(i)
-
-ingredients = {}
-for i in ingredients_name:
-    ingredients[i] = Ingredient(i, is_common=False)
-
-# Add all recipes to the database
-for i, d in tqdm(df.iterrows(), total=len(df)):
-    try:
-        recipe = Recipe(id=d["id"], name=d["title"], instructions=d["instructions"], ingredients=[ingredients[i] for i in d["ingredients"]])
-        vectordb.add_recipe(recipe)
-    except MilvusException as e:
-        print("Error", e)
\ No newline at end of file
+embedding_cache = EmbeddingCache("all-MiniLM-L6-v2", VectorRecipeDatabase.VECTOR_DIM, cache_dir="./data/embedding_cache")
+# Rebuilt from every record read, so it is complete even on a resumed run
+ingredient_index = IngredientIndex()
+if args.backend == "local":
+    vectordb = LocalVectorRecipeDatabase(index_type=args.index_type, embedding_cache=embedding_cache, ingredient_index=ingredient_index)
+    vectordb.connect(args.local_path)
+    # The local index is only written by save() at the end, so a checkpoint
+    # could not describe it. A rebuild is cheap thanks to the embedding cache.
+    checkpoint = None
+else:
+    vectordb = VectorRecipeDatabase(embedding_cache=embedding_cache, ingredient_index=ingredient_index)
+    vectordb.connect("localhost:19530")
+    # The checkpoint lets an interrupted load resume, and a rerun on an
+    # updated dataset only upserts changed recipes.
+    checkpoint = IngestionCheckpoint("./data/ingestion_checkpoint.json", embedding_model=vectordb.embedding_model_name)
+
+# Stream recipes from the dataset straight into the insert path
+recipes = iter_recipes("./data/recipes_with_nutritional_info.json")
+
+# Add all recipes to the database in bulk
+vectordb.add_recipes(tqdm(recipes), batch_size=512, checkpoint=checkpoint)
+print("Embedding cache:", embedding_cache.stats())
+
+if args.backend == "local":
+    vectordb.save()
+
+ingredient_index.save(args.ingredient_index)
+print(f"Indexed ingredients of {len(ingredient_index)} recipes")
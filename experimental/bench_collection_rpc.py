@@ -0,0 +1,81 @@
+"""
+Micro-benchmark: Milvus calls made per recipe lookup.
+
+Before, every lookup built a `Collection` handle (describe RPC), asked for
+its load state and, because the state was compared against a string, also
+called `load()` before running the actual search. Now the collection is
+loaded once in `connect` and each lookup is a single search/query RPC.
+
+Needs a running Milvus with the recipes collection:
+    python experimental/bench_collection_rpc.py --requests 200
+"""
+import argparse
+import time
+from collections import Counter
+
+from pymilvus import Collection, MilvusClient, utility
+
+from cookingassistant.data.item import Ingredient
+from cookingassistant.database import VectorRecipeDatabase
+
+calls = Counter()
+
+
+def count_calls(owner, name):
+    original = getattr(owner, name)
+
+    def wrapper(*args, **kwargs):
+        calls[name] += 1
+        return original(*args, **kwargs)
+
+    setattr(owner, name, wrapper)
+
+
+def legacy_lookup(vectordb, query_vector):
+    """The per-request sequence used before the collection handle was cached"""
+    collection = Collection(vectordb.RECIPE_COLLECTION)
+    if utility.load_state(vectordb.RECIPE_COLLECTION) != "Loaded":
+        collection.load()
+    return vectordb.client.search(
+        collection_name=vectordb.RECIPE_COLLECTION,
+        data=[query_vector],
+        limit=3,
+        output_fields=vectordb._output_fields(None),
+        search_params={"metric_type": "COSINE", "params": {"ef": 64}},
+    )
+
+
+def run(label, lookup, n):
+    calls.clear()
+    start = time.perf_counter()
+    for _ in range(n):
+        lookup()
+    elapsed = time.perf_counter() - start
+    per_request = {name: count / n for name, count in sorted(calls.items())}
+    print(
+        f"{label:>7}: {sum(calls.values()) / n:.1f} Milvus calls/request {per_request}, "
+        f"{elapsed / n * 1000:.2f} ms/request"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", default="localhost:19530")
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    vectordb = VectorRecipeDatabase()
+    vectordb.connect(args.uri)
+    ingredients = [Ingredient("egg"), Ingredient("tomato")]
+    query_vector = vectordb._generate_embedding("egg tomato")
+
+    # Count only after connect, which pays the one-off load check
+    count_calls(Collection, "__init__")
+    count_calls(Collection, "load")
+    count_calls(utility, "load_state")
+    count_calls(MilvusClient, "search")
+    count_calls(MilvusClient, "query")
+
+    run("before", lambda: legacy_lookup(vectordb, query_vector), args.requests)
+    run("after", lambda: vectordb._search_many([query_vector], None, 3), args.requests)
+    run("by id", lambda: vectordb.get_recipe_by_id("test_id"), args.requests)
@@ -0,0 +1,116 @@
+"""
+Parity and latency check: OnnxImageRecognitionModel vs PyTorchImageRecognitionModel.
+
+Exports the PyTorch weights to ONNX if needed, runs both detectors on the
+same images and reports:
+- ingredient sets that differ between the backends
+- boxes of the same class matched by IoU, and the mean IoU of the matches
+- cold import time, single-image latency and batched throughput of each backend
+
+Needs ultralytics and onnxruntime:
+    python experimental/bench_onnx_detector.py --weights ./models/best.pt --images ./data/samples
+"""
+import argparse
+import glob
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from cookingassistant.model.detector import (OnnxImageRecognitionModel,
+                                             PyTorchImageRecognitionModel)
+
+
+def box_iou(a, b):
+    """Pairwise IoU of two sets of xyxy boxes"""
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = (bottom_right - top_left).clip(0).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def timed(call, repeats):
+    """Median seconds of `repeats` calls, after one warmup call"""
+    call()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--weights", default="./models/best.pt")
+    parser.add_argument("--onnx", default=None, help="exported model, default: next to the weights")
+    parser.add_argument("--images", required=True, help="directory of test images")
+    parser.add_argument("--threads", type=int, default=None, help="ONNX Runtime intra-op threads")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    onnx_path = args.onnx or os.path.splitext(args.weights)[0] + ".onnx"
+    paths = sorted(
+        p for p in glob.glob(os.path.join(args.images, "*"))
+        if p.lower().endswith((".jpg", ".jpeg", ".png", ".webp"))
+    )
+    images = [Image.open(p).convert("RGB") for p in paths]
+    print(f"{len(images)} images")
+
+    if not os.path.exists(onnx_path):
+        from ultralytics import YOLO
+        YOLO(args.weights).export(format="onnx", dynamic=True)
+
+    # Cold import cost of each stack, in fresh interpreters
+    import_times = {}
+    for label, module in [("torch", "ultralytics"), ("onnx", "onnxruntime")]:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {module}"], check=True)
+        import_times[label] = time.perf_counter() - start
+
+    onnx_model = OnnxImageRecognitionModel(
+        onnx_path, max_batch_size=args.batch_size, intra_op_threads=args.threads
+    )
+    torch_model = PyTorchImageRecognitionModel(args.weights, max_batch_size=args.batch_size)
+
+    # Parity, image by image
+    mismatches = 0
+    ious = []
+    unmatched = 0
+    for path, image, (boxes, _, class_ids) in zip(paths, images, onnx_model.detect(images)):
+        result = torch_model.model(image, verbose=False)[0]
+        torch_boxes = result.boxes.xyxy.cpu().numpy()
+        torch_classes = result.boxes.cls.cpu().numpy().astype(int)
+
+        onnx_names = {onnx_model.names[int(c)] for c in class_ids}
+        torch_names = {torch_model.model.names[int(c)] for c in torch_classes}
+        if onnx_names != torch_names:
+            mismatches += 1
+            print(f"  {os.path.basename(path)}: onnx {sorted(onnx_names)} torch {sorted(torch_names)}")
+
+        for class_id in set(torch_classes.tolist()) | set(class_ids.tolist()):
+            a = torch_boxes[torch_classes == class_id]
+            b = boxes[class_ids == class_id]
+            if len(a) and len(b):
+                best = box_iou(a, b).max(axis=1)
+                ious.extend(best.tolist())
+            unmatched += abs(len(a) - len(b))
+
+    print(f"ingredient sets differ on {mismatches}/{len(images)} images")
+    if ious:
+        print(f"matched boxes: {len(ious)}, mean IoU {np.mean(ious):.4f}, min IoU {np.min(ious):.4f}")
+    print(f"box count difference: {unmatched}")
+
+    # Latency and throughput
+    print(f"{'backend':>8} {'import s':>9} {'1 image ms':>11} {'batch img/s':>12}")
+    for label, model in [("torch", torch_model), ("onnx", onnx_model)]:
+        single = timed(lambda: model.predict(images[:1]), args.repeats)
+        batch = timed(lambda: model.predict(images), max(1, args.repeats // 2))
+        print(f"{label:>8} {import_times[label]:>9.2f} {single * 1000:>11.1f} {len(images) / batch:>12.1f}")
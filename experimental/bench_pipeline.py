@@ -0,0 +1,106 @@
+"""
+Compare end-to-end latency of CookingAssistant.aprocess_request with and
+without pipelining, on simulated stage latencies.
+
+Detection time per image, search time and LLM time are drawn from
+lognormal distributions; each image finds a few ingredients from a small
+pool, so later images often add nothing new.
+
+    python experimental/bench_pipeline.py --requests 200 --images 4
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import List
+
+import numpy as np
+from PIL import Image
+
+from cookingassistant.assistant import CookingAssistant
+from cookingassistant.model.detector import ImageRecognitionModel
+from cookingassistant.model.llm import BaseInstructionGenerator
+
+
+def lognormal_ms(median_ms: float) -> float:
+    return random.lognormvariate(0, 0.5) * median_ms / 1000
+
+
+class SimulatedDetector(ImageRecognitionModel):
+    def __init__(self, median_ms: float, pool: int):
+        self.median_ms = median_ms
+        self.pool = pool
+
+    def load_model(self, model_path: str) -> None:
+        pass
+
+    def predict(self, images: List[Image.Image]) -> List[str]:
+        names = set()
+        for image in images:
+            time.sleep(lognormal_ms(self.median_ms))
+            rng = random.Random(image.getpixel((0, 0))[0])
+            names.update(f"ingredient{rng.randrange(self.pool)}" for _ in range(3))
+        return list(names)
+
+
+class SimulatedSuggestor:
+    def __init__(self, median_ms: float):
+        self.median_ms = median_ms
+
+    async def afind_matching_recipes(self, ingredients, user_query):
+        await asyncio.sleep(lognormal_ms(self.median_ms))
+        return [{"id": ing.name} for ing in ingredients]
+
+    def rank_recipes(self, recipes, user_query):
+        return recipes
+
+
+class SimulatedGenerator(BaseInstructionGenerator):
+    def __init__(self, median_ms: float):
+        self.median_ms = median_ms
+
+    def generate_instructions(self, recipe, available_ingredients, user_query) -> str:
+        return ""
+
+    async def agenerate_instructions(self, recipe, available_ingredients, user_query) -> str:
+        await asyncio.sleep(lognormal_ms(self.median_ms))
+        return ""
+
+
+async def measure(assistant: CookingAssistant, requests: int, images: int) -> np.ndarray:
+    latencies = []
+    for i in range(requests):
+        # Photos of the same fridge: a request's images share most ingredients
+        request_images = [Image.new("RGB", (32, 32), (random.randrange(4), 0, 0)) for _ in range(images)]
+        start = time.perf_counter()
+        await assistant.aprocess_request(request_images, "dinner")
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--images", type=int, default=4)
+    parser.add_argument("--detect-ms", type=float, default=40)
+    parser.add_argument("--search-ms", type=float, default=20)
+    parser.add_argument("--llm-ms", type=float, default=150)
+    parser.add_argument("--ingredient-pool", type=int, default=6)
+    args = parser.parse_args()
+
+    for pipelined in (False, True):
+        random.seed(0)
+        assistant = CookingAssistant(
+            SimulatedDetector(args.detect_ms, args.ingredient_pool),
+            SimulatedSuggestor(args.search_ms),
+            SimulatedGenerator(args.llm_ms),
+            detection_workers=args.images,
+            pipelined=pipelined,
+        )
+        latencies = asyncio.run(measure(assistant, args.requests, args.images))
+        print(f"pipelined={pipelined}: p50 {np.percentile(latencies, 50):.0f} ms, "
+              f"p99 {np.percentile(latencies, 99):.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
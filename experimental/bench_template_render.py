@@ -0,0 +1,79 @@
+"""
+Micro-benchmark: InstructionGeneratorByTemplate response rendering.
+
+Before, every response was built with repeated `+=` and every recipe's
+instructions were split and re-joined on each request. Now each recipe's
+block is rendered once, cached by recipe id until it expires, and a
+response is a single join of numbered blocks. The outputs are checked to
+be identical.
+
+Samples requests from the first recipes of the dataset:
+    python experimental/bench_template_render.py --recipes 5000 --requests 20000
+"""
+import argparse
+import random
+import time
+from itertools import islice
+
+from cookingassistant.data.reader import iter_recipes
+from cookingassistant.database import EmbeddingRecipeDatabase
+from cookingassistant.model.llm import InstructionGeneratorByTemplate
+
+
+def render_concat(recipe):
+    """The previous implementation"""
+    final_result = ""
+    for i, r in enumerate(recipe):
+        final_result += f"{i+1}.\n"
+        final_result += f"""Name: {r["name"]}\n"""
+        final_result += f"""Ingredients: {', '.join([ing["name"] for ing in r["ingredients"]])}\n"""
+        instruction = "\n    -".join(r["instructions"].split("\n"))
+        final_result += f"""Instructions:\n    -{instruction}\n\n"""
+    return str(final_result)
+
+
+def measure(render, requests) -> float:
+    """Mean microseconds per request"""
+    start = time.perf_counter()
+    for recipes in requests:
+        render(recipes)
+    return (time.perf_counter() - start) / len(requests) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", default="./data/recipes_with_nutritional_info.json")
+    parser.add_argument("--recipes", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--per-request", type=int, default=5)
+    args = parser.parse_args()
+
+    # Searches return serialized recipes, fresh dicts for every request
+    recipes = [EmbeddingRecipeDatabase._recipe_data(recipe)
+               for recipe in islice(iter_recipes(args.dataset), args.recipes)]
+    random.seed(0)
+    requests = [[dict(recipe) for recipe in random.sample(recipes, args.per_request)]
+                for _ in range(args.requests)]
+    print(f"{len(recipes)} recipes, {len(requests)} requests of {args.per_request}")
+
+    def cached(generator):
+        return lambda recipes: generator.generate_instructions(recipes, [], "")
+
+    check = cached(InstructionGeneratorByTemplate())
+    for request in requests[:1000]:
+        assert check(request) == render_concat(request)
+
+    render_cached = cached(InstructionGeneratorByTemplate())
+    print(f"concatenation:        {measure(render_concat, requests):8.1f} us/request")
+    print(f"cached, first use:    {measure(render_cached, requests):8.1f} us/request")
+    print(f"cached, warm:         {measure(render_cached, requests):8.1f} us/request")
+
+    generator = InstructionGeneratorByTemplate()
+    start = time.perf_counter()
+    generator.prerender(recipes)
+    print(f"prerender:            {(time.perf_counter() - start) * 1000:8.1f} ms for all recipes")
+    print(f"cached, prerendered:  {measure(cached(generator), requests):8.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
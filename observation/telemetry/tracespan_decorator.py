@@ -1,3 +1,4 @@
+import inspect
 import requests
 from functools import wraps
 from opentelemetry import trace
@@ -7,9 +8,18 @@ class TraceSpan:
         self.span_name = span_name
 
     def __call__(self, func):
+        if inspect.iscoroutinefunction(func):
+            # The span has to stay open until the coroutine finishes
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                tracer = trace.get_tracer(func.__module__)
+                with tracer.start_as_current_span(self.span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
             tracer = trace.get_tracer(func.__module__)
             with tracer.start_as_current_span(self.span_name):
                 return func(*args, **kwargs)
-        return wrapper
\ No newline at end of file
+        return wrapper
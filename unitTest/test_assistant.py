@@ -0,0 +1,151 @@
+import asyncio
+import threading
+import time
+import unittest
+from typing import List
+
+from PIL import Image
+
+from cookingassistant.assistant import CookingAssistant
+from cookingassistant.model.detector import ImageRecognitionModel
+from cookingassistant.model.llm import (BaseInstructionGenerator,
+                                        InstructionGeneratorByLLM, LLMClient)
+
+
+class ColorDetector(ImageRecognitionModel):
+    """Detects the image's red channel value as an ingredient, slower for bigger values"""
+
+    def load_model(self, model_path: str) -> None:
+        pass
+
+    def predict(self, images: List[Image.Image]) -> List[str]:
+        names = []
+        for image in images:
+            red = image.getpixel((0, 0))[0]
+            time.sleep(red / 1000)
+            names.append(f"ingredient{red}")
+        return names
+
+
+class FakeSuggestor:
+    def __init__(self):
+        self.searches = []
+
+    def find_matching_recipes(self, ingredients, user_query):
+        self.searches.append(sorted(ing.name for ing in ingredients))
+        return [{"id": ing.name, "name": ing.name} for ing in ingredients]
+
+    async def afind_matching_recipes(self, ingredients, user_query):
+        await asyncio.sleep(0.01)
+        return self.find_matching_recipes(ingredients, user_query)
+
+    def rank_recipes(self, recipes, user_query):
+        return sorted(recipes, key=lambda r: r["id"])
+
+
+class CountingGenerator(BaseInstructionGenerator):
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def generate_instructions(self, recipe, available_ingredients, user_query) -> str:
+        with self.lock:
+            self.calls += 1
+        return ",".join(r["id"] for r in recipe)
+
+
+class RecipeSuggestor(FakeSuggestor):
+    """Suggests serialized recipes, the way the database returns them"""
+
+    def find_matching_recipes(self, ingredients, user_query):
+        self.searches.append(sorted(ing.name for ing in ingredients))
+        return [{"id": ing.name, "name": f"{ing.name} soup", "instructions": "Boil",
+                 "ingredients": [{"name": ing.name, "is_common": False}]} for ing in ingredients]
+
+
+class EchoLLMClient(LLMClient):
+    """Answers with the dish line of the prompt, streamed word by word"""
+    api_key = "key"
+
+    def generate_text(self, prompt: str) -> str:
+        return prompt.split("\n")[0].split("cook ")[1]
+
+    def stream_text(self, prompt: str):
+        first, *rest = self.generate_text(prompt).split(" ")
+        yield first
+        for word in rest:
+            yield " " + word
+
+
+def image(red: int) -> Image.Image:
+    return Image.new("RGB", (32, 32), (red, 0, 0))
+
+
+class TestPipelinedAssistant(unittest.TestCase):
+    def make_assistant(self, pipelined: bool) -> CookingAssistant:
+        return CookingAssistant(ColorDetector(), FakeSuggestor(), CountingGenerator(),
+                                detection_workers=4, pipelined=pipelined)
+
+    def test_same_result_as_sequential(self):
+        images = [image(5), image(60), image(30)]
+        sequential = asyncio.run(self.make_assistant(False).aprocess_request(images, "dinner"))
+        pipelined = asyncio.run(self.make_assistant(True).aprocess_request(images, "dinner"))
+        self.assertEqual(pipelined, sequential)
+
+    def test_speculation_reused_when_set_is_unchanged(self):
+        assistant = self.make_assistant(True)
+        # Later images only repeat what the first one found
+        result = asyncio.run(assistant.aprocess_request([image(5), image(5), image(5)], "dinner"))
+        self.assertEqual(result["detailed_instructions"], "ingredient5")
+        self.assertEqual(assistant.recipe_processor.searches, [["ingredient5"]])
+        self.assertEqual(assistant.instruction_generator.calls, 1)
+
+    def test_pipelined_images_use_traced_decode(self):
+        decoded = []
+
+        class TracedAssistant(CookingAssistant):
+            async def aload_images(self, images):
+                decoded.extend(images)
+                return await super().aload_images(images)
+
+        images = [image(5), image(30)]
+        assistant = TracedAssistant(ColorDetector(), FakeSuggestor(), CountingGenerator(), pipelined=True)
+        asyncio.run(assistant.aprocess_request(images, "dinner"))
+        self.assertEqual(len(decoded), len(images))
+
+    def test_changed_set_is_searched_again(self):
+        assistant = self.make_assistant(True)
+        result = asyncio.run(assistant.aprocess_request([image(1), image(80)], "dinner"))
+        self.assertEqual(result["detailed_instructions"], "ingredient1,ingredient80")
+        self.assertEqual(assistant.recipe_processor.searches[-1], ["ingredient1", "ingredient80"])
+
+
+    def test_stream_matches_instructions(self):
+        images = [image(5), image(30)]
+        assistant = self.make_assistant(False)
+        result = asyncio.run(assistant.aprocess_request(images, "dinner"))
+
+        async def collect():
+            return [delta async for delta in assistant.aprocess_request_stream(images, "dinner")]
+
+        self.assertEqual("".join(asyncio.run(collect())), result["detailed_instructions"])
+        self.assertEqual("".join(assistant.process_request_stream(images, "dinner")),
+                         result["detailed_instructions"])
+
+    def test_stream_with_llm_generator(self):
+        assistant = CookingAssistant(ColorDetector(), RecipeSuggestor(),
+                                     InstructionGeneratorByLLM(EchoLLMClient()))
+        images = [image(30), image(5)]
+
+        async def collect():
+            return [delta async for delta in assistant.aprocess_request_stream(images, "dinner")]
+
+        # The top ranked recipe is the one cooked
+        self.assertEqual("".join(asyncio.run(collect())), "'ingredient30 soup'.")
+        self.assertEqual(list(assistant.process_request_stream(images, "dinner")), ["'ingredient30", " soup'."])
+        result = asyncio.run(assistant.aprocess_request(images, "dinner"))
+        self.assertEqual(result["detailed_instructions"], "'ingredient30 soup'.")
+
+
+if __name__ == "__main__":
+    unittest.main()
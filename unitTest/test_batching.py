@@ -0,0 +1,68 @@
+import threading
+import time
+import unittest
+
+from cookingassistant.model.batching import BatchingImageRecognitionModel
+from cookingassistant.model.detector import ImageRecognitionModel
+
+
+class FakeDetector(ImageRecognitionModel):
+    """Detector that "detects" the image values and records batch sizes"""
+
+    def __init__(self):
+        self.batches = []
+
+    def load_model(self, model_path):
+        pass
+
+    def predict(self, images):
+        return set(images)
+
+    def predict_batch(self, requests):
+        self.batches.append(sum(len(images) for images in requests))
+        time.sleep(0.01)
+        if any("broken" in images for images in requests):
+            raise ValueError("broken image")
+        return [self.predict(images) for images in requests]
+
+
+class TestBatchingDetector(unittest.TestCase):
+    def setUp(self):
+        self.detector = FakeDetector()
+        self.batcher = BatchingImageRecognitionModel(self.detector, max_batch_size=8, max_wait_ms=20)
+
+    def tearDown(self):
+        self.batcher.close()
+
+    def test_concurrent_requests_share_batches(self):
+        results = {}
+
+        def request(i):
+            results[i] = self.batcher.predict([f"egg{i}", f"tomato{i}"])
+
+        threads = [threading.Thread(target=request, args=(i,)) for i in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, {i: {f"egg{i}", f"tomato{i}"} for i in range(16)})
+        self.assertLess(len(self.detector.batches), 16)
+        self.assertTrue(all(size <= 8 for size in self.detector.batches))
+
+        stats = self.batcher.stats()
+        self.assertEqual(stats["queue_depth"], 0)
+        self.assertEqual(sum(size * n for size, n in stats["batch_sizes"].items()), 32)
+
+    def test_errors_reach_the_caller(self):
+        with self.assertRaises(ValueError):
+            self.batcher.predict(["broken"])
+        self.assertEqual(self.batcher.predict(["egg"]), {"egg"})
+
+    def test_empty_request(self):
+        self.assertEqual(self.batcher.predict([]), set())
+        self.assertEqual(self.detector.batches, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
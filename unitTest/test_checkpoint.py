@@ -0,0 +1,110 @@
+import os
+import tempfile
+import unittest
+from dataclasses import replace
+
+import numpy as np
+
+from cookingassistant.data.checkpoint import IngestionCheckpoint
+from cookingassistant.data.item import Ingredient, Recipe
+from cookingassistant.database import LocalVectorRecipeDatabase
+
+RECIPES = [
+    Recipe(id=f"r{i}", name=f"Recipe {i}", instructions="Cook",
+           ingredients=[Ingredient("egg"), Ingredient(f"ingredient{i}")])
+    for i in range(10)
+]
+
+
+class FakeDatabase(LocalVectorRecipeDatabase):
+    """Records the rows it is asked to write; the writer dies on `fail_on`"""
+
+    def __init__(self, fail_on=None):
+        super().__init__()
+        self.connected = True
+        self.fail_on = fail_on
+        self.embedded = 0
+        self.writes = []
+
+    def _generate_embeddings(self, texts):
+        self.embedded += len(texts)
+        return [np.zeros(self.VECTOR_DIM, dtype=np.float32) for _ in texts]
+
+    def _insert_rows(self, rows, chunk_size, upsert=False):
+        ids = [row["id"] for row in rows]
+        if self.fail_on in ids:
+            raise RuntimeError("writer died")
+        if ids:
+            self.writes.append((ids, upsert))
+        return ids
+
+
+class TestIngestionCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "ingest", "checkpoint.json")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def checkpoint(self, model: str = "model") -> IngestionCheckpoint:
+        return IngestionCheckpoint(self.path, embedding_model=model)
+
+    def ingest(self, database: FakeDatabase, recipes=RECIPES, model: str = "model") -> int:
+        return database.add_recipes(recipes, batch_size=2, checkpoint=self.checkpoint(model))
+
+    def test_resume_after_interrupted_run(self):
+        with self.assertRaises(RuntimeError):
+            self.ingest(FakeDatabase(fail_on="r5"))
+        checkpoint = self.checkpoint()
+        self.assertEqual(checkpoint.offset, 4)
+        self.assertFalse(checkpoint.completed)
+
+        database = FakeDatabase()
+        self.assertEqual(self.ingest(database), 6)
+        # The batch in flight when the run died is upserted again
+        self.assertEqual(database.writes, [(["r4", "r5"], True), (["r6", "r7"], False), (["r8", "r9"], False)])
+        checkpoint = self.checkpoint()
+        self.assertTrue(checkpoint.completed)
+        self.assertEqual(len(checkpoint.hashes), 10)
+
+    def test_rerun_upserts_only_changed_recipes(self):
+        self.assertEqual(self.ingest(FakeDatabase()), 10)
+
+        recipes = list(RECIPES)
+        recipes[3] = replace(recipes[3], instructions="Cook slowly")
+        database = FakeDatabase()
+        self.assertEqual(self.ingest(database, recipes), 1)
+        self.assertEqual(database.embedded, 1)
+        self.assertEqual(database.writes, [(["r3"], True)])
+
+        database = FakeDatabase()
+        self.assertEqual(self.ingest(database, recipes), 0)
+        self.assertEqual(database.writes, [])
+
+    def test_model_change_resets_checkpoint(self):
+        self.ingest(FakeDatabase())
+
+        checkpoint = self.checkpoint("other-model")
+        self.assertEqual((checkpoint.offset, checkpoint.completed, checkpoint.hashes), (0, False, {}))
+
+        # The collection still holds every id, so all of them are upserted,
+        # also when the first run with the new model is interrupted
+        database = FakeDatabase(fail_on="r5")
+        with self.assertRaises(RuntimeError):
+            self.ingest(database, model="other-model")
+        self.assertEqual(database.writes, [(["r0", "r1"], True), (["r2", "r3"], True)])
+        self.assertTrue(self.checkpoint("other-model").upsert_all)
+        database = FakeDatabase()
+        self.assertEqual(self.ingest(database, model="other-model"), 6)
+        self.assertEqual(database.writes, [(["r4", "r5"], True), (["r6", "r7"], True), (["r8", "r9"], True)])
+
+        # Once a run completed, new recipes are inserted again
+        new = Recipe(id="new", name="New", instructions="Cook", ingredients=[])
+        database = FakeDatabase()
+        self.assertEqual(self.ingest(database, RECIPES + [new], model="other-model"), 1)
+        self.assertEqual(database.writes, [(["new"], False)])
+
+
+if __name__ == "__main__":
+    unittest.main()
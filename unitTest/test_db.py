@@ -1,5 +1,5 @@
 import unittest
-from pymilvus import connections, Collection, CollectionSchema, FieldSchema, DataType, utility
+from pymilvus import connections, Collection, CollectionSchema, FieldSchema, DataType, MilvusException, utility
 from cookingassistant.database import VectorRecipeDatabase
 from cookingassistant.data.item import Ingredient, Recipe
 
@@ -155,5 +155,30 @@ class TestMilvus(unittest.TestCase):
         self.assertIsNone(recipe_test, "Failed to delete")
 
 
+class RejectingClient:
+    """Milvus client stub failing every write that contains a rejected id"""
+
+    def __init__(self, rejected):
+        self.rejected = set(rejected)
+        self.writes = []
+
+    def insert(self, collection_name, data):
+        self.writes.append([row["id"] for row in data])
+        if any(row["id"] in self.rejected for row in data):
+            raise MilvusException(message="rejected")
+
+
+class TestInsertRows(unittest.TestCase):
+    def test_failed_chunk_is_retried_row_by_row(self):
+        vectorDB = VectorRecipeDatabase()
+        vectorDB.client = RejectingClient({"r2"})
+        rows = [{"id": f"r{i}"} for i in range(6)]
+
+        written = vectorDB._insert_rows(rows, chunk_size=3)
+
+        self.assertEqual(written, ["r0", "r1", "r3", "r4", "r5"])
+        self.assertEqual(vectorDB.client.writes, [["r0", "r1", "r2"], ["r0"], ["r1"], ["r2"], ["r3", "r4", "r5"]])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,71 @@
+import io
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from cookingassistant.model.detection_cache import (CachedImageRecognitionModel,
+                                                    DetectionCache, ImageKey)
+from cookingassistant.model.detector import ImageRecognitionModel
+
+
+def photo(seed: int, size=(320, 240)) -> Image.Image:
+    """Smooth random test image"""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, (6, 8, 3), dtype=np.uint8)
+    return Image.fromarray(small).resize(size, Image.BICUBIC)
+
+
+class CountingDetector(ImageRecognitionModel):
+    def __init__(self):
+        self.images = 0
+
+    def load_model(self, model_path):
+        pass
+
+    def predict(self, images):
+        self.images += len(images)
+        return {f"food{image.size[0]}" for image in images}
+
+
+class TestDetectionCache(unittest.TestCase):
+    def test_reencoded_image_hits_perceptual_hash(self):
+        cache = DetectionCache()
+        original = photo(1)
+        cache.put(ImageKey.from_image(original), {"egg"})
+
+        buffer = io.BytesIO()
+        original.save(buffer, format="JPEG", quality=80)
+        reencoded = Image.open(io.BytesIO(buffer.getvalue())).resize((160, 120))
+
+        self.assertEqual(cache.get(ImageKey.from_image(original)), {"egg"})
+        self.assertEqual(cache.get(ImageKey.from_image(reencoded)), {"egg"})
+        self.assertIsNone(cache.get(ImageKey.from_image(photo(2))))
+        self.assertEqual(cache.stats()["exact_hits"], 1)
+        self.assertEqual(cache.stats()["perceptual_hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_memory_budget_evicts_least_recent(self):
+        cache = DetectionCache(max_bytes=3000)
+        keys = [ImageKey(f"digest{i}") for i in range(20)]
+        for key in keys:
+            cache.put(key, {"ingredient with a long name"})
+
+        self.assertLessEqual(cache.bytes, 3000)
+        self.assertLess(len(cache), 20)
+        self.assertIsNone(cache.get(keys[0]))
+        self.assertIsNotNone(cache.get(keys[-1]))
+
+    def test_cached_model_skips_inference(self):
+        detector = CountingDetector()
+        model = CachedImageRecognitionModel(detector)
+        first, second = photo(3), photo(4, size=(200, 100))
+
+        self.assertEqual(model.predict([first, second, first]), {"food320", "food200"})
+        self.assertEqual(detector.images, 2)
+        self.assertEqual(model.predict_batch([[first], [second]]), [{"food320"}, {"food200"}])
+        self.assertEqual(detector.images, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+from PIL import Image
+
+from cookingassistant.model.detector import (OnnxImageRecognitionModel,
+                                             PyTorchImageRecognitionModel,
+                                             letterbox, non_max_suppression)
+
+# Boxes the stub model finds in each "image": (class ids, confidences)
+BOXES = {
+    "eggs": ([0, 0], [0.9, 0.8]),
+    "omelette": ([0, 1, 2], [0.95, 0.6, 0.3]),
+    "empty plate": ([], []),
+    "tomato": ([1], [0.4]),
+}
+
+
+class StubYOLO:
+    """Stands in for ultralytics.YOLO, returning one result per image"""
+    names = {0: "egg", 1: "tomato", 2: "cheese"}
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, images, verbose=False):
+        self.batches.append(list(images))
+        results = []
+        for image in images:
+            cls, conf = BOXES[image]
+            boxes = SimpleNamespace(cls=torch.tensor(cls, dtype=torch.float32),
+                                    conf=torch.tensor(conf, dtype=torch.float32))
+            results.append(SimpleNamespace(boxes=boxes))
+        return results
+
+
+class StubbedModel(PyTorchImageRecognitionModel):
+    def load_model(self, model_path: str):
+        return StubYOLO()
+
+
+class TestOnnxPreprocessing(unittest.TestCase):
+    def test_letterbox(self):
+        image = Image.new("RGB", (320, 160), (255, 0, 0))
+        array, ratio, pad = letterbox(image, (640, 640))
+
+        self.assertEqual(array.shape, (3, 640, 640))
+        self.assertEqual(array.dtype, np.float32)
+        self.assertEqual(ratio, 2.0)
+        self.assertEqual(pad, (0, 160))
+        # Image in the middle, gray padding above and below
+        self.assertAlmostEqual(float(array[0, 320, 320]), 1.0)
+        self.assertAlmostEqual(float(array[0, 10, 320]), 114 / 255, places=5)
+
+    def test_non_max_suppression(self):
+        boxes = np.array([[0, 0, 10, 10], [1, 0, 11, 10], [20, 20, 30, 30], [0, 0, 10, 9]], dtype=np.float32)
+        scores = np.array([0.8, 0.9, 0.5, 0.3], dtype=np.float32)
+
+        self.assertEqual(non_max_suppression(boxes, scores, 0.5).tolist(), [1, 2])
+        self.assertEqual(non_max_suppression(boxes, scores, 0.95).tolist(), [1, 0, 2, 3])
+
+
+class TestPyTorchDetection(unittest.TestCase):
+    def test_images_of_a_request_are_merged(self):
+        model = StubbedModel("best.pt", max_batch_size=2)
+        self.assertEqual(model.predict(["eggs", "omelette", "empty plate"]), {"egg", "tomato", "cheese"})
+        self.assertEqual(model.model.batches, [["eggs", "omelette"], ["empty plate"]])
+
+    def test_no_boxes(self):
+        model = StubbedModel("best.pt")
+        self.assertEqual(model.predict(["empty plate"]), set())
+        self.assertEqual(model.predict([]), set())
+
+    def test_requests_share_batches(self):
+        model = StubbedModel("best.pt", max_batch_size=3)
+        requests = [["eggs", "tomato"], ["empty plate"], ["omelette"], ["tomato", "eggs"]]
+        self.assertEqual(model.predict_batch(requests),
+                         [{"egg", "tomato"}, set(), {"egg", "tomato", "cheese"}, {"egg", "tomato"}])
+        self.assertEqual([len(batch) for batch in model.model.batches], [3, 3])
+
+    def test_conf_threshold(self):
+        model = StubbedModel("best.pt", conf_threshold=0.5)
+        self.assertEqual(model.predict_batch([["omelette"], ["tomato"], ["eggs", "tomato"]]),
+                         [{"egg", "tomato"}, set(), {"egg"}])
+
+
+class StaticBatchSession:
+    """ONNX Runtime session stub of a model exported with a static batch of 2"""
+    BATCH = 2
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="images", shape=[self.BATCH, 3, 64, 64])]
+
+    def get_modelmeta(self):
+        return SimpleNamespace(custom_metadata_map={"names": "{0: 'egg', 1: 'tomato'}"})
+
+    def run(self, output_names, feed):
+        inputs = feed["images"]
+        if inputs.shape[0] != self.BATCH:
+            raise ValueError(f"Got invalid dimensions for input: images, got {inputs.shape[0]}")
+        self.batch_sizes.append(inputs.shape[0])
+        # One box in the middle of each image: an egg if the image is red,
+        # a tomato otherwise (blank padding included)
+        outputs = np.zeros((len(inputs), 6, 1), dtype=np.float32)
+        outputs[:, :4, 0] = [32, 32, 10, 10]
+        red = inputs[:, 0, 32, 32] > 0.5
+        outputs[red, 4, 0] = 0.9
+        outputs[~red, 5, 0] = 0.9
+        return [outputs]
+
+
+class StaticBatchModel(OnnxImageRecognitionModel):
+    def load_model(self, model_path: str):
+        return StaticBatchSession()
+
+
+class TestOnnxStaticBatch(unittest.TestCase):
+    def test_last_chunk_is_padded(self):
+        model = StaticBatchModel("best.onnx", max_batch_size=8)
+        self.assertEqual(model.max_batch_size, 2)
+        red = Image.new("RGB", (64, 64), (255, 0, 0))
+        blue = Image.new("RGB", (64, 64), (0, 0, 255))
+
+        self.assertEqual(model.predict([red, red, red]), {"egg"})
+        self.assertEqual(model.predict_batch([[red], [blue, red]]), [{"egg"}, {"egg", "tomato"}])
+        self.assertEqual(model.session.batch_sizes, [2, 2, 2, 2])
+        self.assertEqual(len(model.detect([blue])), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
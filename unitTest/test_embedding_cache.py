@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from cookingassistant.cache import EmbeddingCache
+
+
+def vector(value: float) -> np.ndarray:
+    return np.full(4, value, dtype=np.float32)
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = self.tmpdir.name
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def make_cache(self, **kwargs) -> EmbeddingCache:
+        return EmbeddingCache("model", 4, cache_dir=self.path, **kwargs)
+
+    def test_memory_tier_is_bounded(self):
+        cache = EmbeddingCache("model", 4, max_memory_items=2)
+        cache.put_many(["a", "b", "c"], [vector(1), vector(2), vector(3)])
+        self.assertIsNone(cache.get("a"))
+        np.testing.assert_array_equal(cache.get(" C "), vector(3))
+
+    def test_reload_from_disk(self):
+        self.make_cache().put_many(["a", "b"], [vector(1), vector(2)])
+        cache = self.make_cache()
+        np.testing.assert_array_equal(cache.get("b"), vector(2))
+        self.assertEqual(cache.stats()["disk_hits"], 1)
+
+    def test_stray_vector_row_is_dropped(self):
+        self.make_cache().put("a", vector(1))
+        # A writer that crashed between appending its vector and its key
+        with open(os.path.join(self.path, "vectors.f32"), "ab") as f:
+            f.write(vector(9).tobytes())
+        with open(os.path.join(self.path, "keys.txt"), "a") as f:
+            f.write("half-written")
+
+        cache = self.make_cache()
+        cache.put("b", vector(2))
+        reloaded = self.make_cache()
+        np.testing.assert_array_equal(reloaded.get("a"), vector(1))
+        np.testing.assert_array_equal(reloaded.get("b"), vector(2))
+        self.assertEqual(os.path.getsize(os.path.join(self.path, "vectors.f32")), 2 * 4 * 4)
+
+    def test_shared_directory(self):
+        first = self.make_cache(max_memory_items=0)
+        second = self.make_cache(max_memory_items=0)
+        first.put("x", vector(1))
+        second.put("y", vector(2))
+        first.put("z", vector(3))
+
+        np.testing.assert_array_equal(second.get("x"), vector(1))
+        np.testing.assert_array_equal(second.get("y"), vector(2))
+        np.testing.assert_array_equal(second.get("z"), vector(3))
+        np.testing.assert_array_equal(first.get("y"), vector(2))
+        self.assertEqual(self.make_cache().stats()["disk_items"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
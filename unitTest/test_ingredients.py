@@ -0,0 +1,143 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from cookingassistant.data.ingredient_index import IngredientIndex
+from cookingassistant.data.item import Ingredient
+from cookingassistant.data.normalize import (canonical_ingredients,
+                                             ingredient_tokens, singularize)
+from cookingassistant.data.rerank import IngredientOverlapReranker
+from cookingassistant.data.suggestor import RecipeSuggestor
+from cookingassistant.database import CommonIngredientsRegistry
+
+
+class TestNormalize(unittest.TestCase):
+    def test_singularize(self):
+        for plural, singular in [("tomatoes", "tomato"), ("berries", "berry"), ("eggs", "egg"),
+                                 ("leaves", "leaf"), ("peaches", "peach"), ("asparagus", "asparagus"),
+                                 ("glass", "glass")]:
+            self.assertEqual(singularize(plural), singular)
+
+    def test_canonical_ingredients_is_order_insensitive(self):
+        self.assertEqual(canonical_ingredients(["egg", "tomato"]),
+                         canonical_ingredients(["Tomatoes", "eggs", "egg"]))
+
+    def test_ingredient_tokens(self):
+        self.assertEqual(ingredient_tokens("2 cups Onions, raw, chopped"), {"onion"})
+
+
+class TestCommonIngredientsRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = CommonIngredientsRegistry()
+
+    def test_is_common_matches_synonyms_and_plurals(self):
+        for name in ["Salt", "tomatoes", "Onions", "Extra Virgin Olive Oil", "garlic cloves", "ground black pepper"]:
+            self.assertTrue(self.registry.is_common(name), name)
+        for name in ["egg", "bell pepper", "chicken breast", "butter", "flour", "sugar"]:
+            self.assertFalse(self.registry.is_common(name), name)
+
+    def test_default_is_the_six_staples(self):
+        self.assertEqual([ing.name for ing in self.registry.get_all_common_ingredients()],
+                         ["salt", "pepper", "onion", "garlic", "tomato", "oil"])
+
+    def test_pantry_vocabulary(self):
+        registry = CommonIngredientsRegistry(CommonIngredientsRegistry.PANTRY_VOCABULARY)
+        for name in ["salt", "butter", "flour", "bay leaves", "soy sauce"]:
+            self.assertTrue(registry.is_common(name), name)
+        self.assertFalse(registry.is_common("egg"))
+
+    def test_filter_many(self):
+        ingredients = [Ingredient("egg"), Ingredient("Salt"), Ingredient("tomatoes"), Ingredient("chicken")]
+        self.assertEqual([ing.name for ing in self.registry.filter_many(ingredients)], ["egg", "chicken"])
+
+    def test_load_vocabulary_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "common.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("# staples\nsalt, sea salt\n\nscallion, green onion, spring onion\n")
+            registry = CommonIngredientsRegistry(path)
+
+        self.assertEqual([ing.name for ing in registry.get_all_common_ingredients()], ["salt", "scallion"])
+        self.assertTrue(registry.is_common("Green Onions"))
+        self.assertFalse(registry.is_common("pepper"))
+
+
+class TestReranker(unittest.TestCase):
+    def test_rerank_by_ingredient_overlap(self):
+        candidates = [
+            {"id": "cake", "score": 0.9, "ingredients": [{"name": "flour, white", "is_common": False},
+                                                         {"name": "sugar", "is_common": False}]},
+            {"id": "omelette", "score": 0.5, "ingredients": [{"name": "Eggs, whole", "is_common": False},
+                                                             {"name": "tomatoes, red", "is_common": False},
+                                                             {"name": "salt, table", "is_common": False}]},
+            {"id": "empty", "score": 0.1, "ingredients": []},
+        ]
+        reranker = IngredientOverlapReranker(CommonIngredientsRegistry())
+        ranked = reranker.rerank(candidates, [Ingredient("egg"), Ingredient("tomato")])
+
+        self.assertEqual([c["id"] for c in ranked], ["omelette", "cake", "empty"])
+        self.assertEqual(reranker.rerank(candidates, [], top_n=1)[0]["id"], "cake")
+
+
+class TestIngredientIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = IngredientIndex()
+        self.index.add("omelette", ["Eggs, whole", "tomatoes, red", "salt"])
+        self.index.add("salad", ["tomatoes", "basil, fresh", "red bell peppers", "olive oil"])
+        self.index.add("cake", ["flour", "sugar", "eggs"])
+
+    def test_match_all(self):
+        self.assertEqual(self.index.match_all(["egg", "tomato"]), ["omelette"])
+        self.assertEqual(self.index.match_all(["bell pepper"]), ["salad"])
+        self.assertEqual(self.index.match_all(["egg", "truffle"]), [])
+
+    def test_match_most(self):
+        self.assertEqual(self.index.match_most(["egg", "tomato", "basil"]),
+                         ["omelette", "salad", "cake"])
+        self.assertEqual(self.index.match_most(["egg", "tomato"], min_matches=2), ["omelette"])
+        # Spellings of one ingredient count once
+        self.assertEqual(self.index.match_most(["egg", "Eggs", "basil"], min_matches=2), [])
+        self.assertEqual(self.index.match_all(["eggs", "egg"]), ["omelette", "cake"])
+
+    def test_queries_during_adds(self):
+        errors = []
+
+        def add():
+            try:
+                for i in range(3000):
+                    self.index.add(f"recipe{i}", ["eggs", f"spice{i}"])
+            except Exception as e:
+                errors.append(e)
+
+        writer = threading.Thread(target=add)
+        writer.start()
+        while writer.is_alive():
+            self.index.match_most(["egg", "tomato"], limit=5)
+            self.index.match_all(["egg"])
+        writer.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.index.match_all(["egg"])), 3002)
+
+    def test_readd_replaces_recipe(self):
+        self.index.add("cake", ["flour", "sugar", "butter"])
+        self.assertEqual(self.index.match_all(["egg"]), ["omelette"])
+        self.assertEqual(len(self.index), 3)
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index.npz")
+            self.index.save(path)
+            loaded = IngredientIndex.load(path)
+        self.assertEqual(loaded.match_most(["egg", "basil"]), self.index.match_most(["egg", "basil"]))
+        loaded.add("frittata", ["eggs", "basil"])
+        self.assertEqual(loaded.match_all(["egg", "basil"]), ["frittata"])
+        # Sizes of loaded and added recipes both break ties
+        self.assertEqual(loaded.match_most(["egg", "basil"]), ["frittata", "omelette", "cake", "salad"])
+
+    def test_fuse_rankings(self):
+        self.assertEqual(RecipeSuggestor.fuse_rankings([["a", "b"], ["b", "c"]]), ["b", "a", "c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from cookingassistant.cache import ResponseCache
+from cookingassistant.data.item import Ingredient, Recipe
+from cookingassistant.model.llm import (InstructionGeneratorByLLM,
+                                        InstructionGeneratorByTemplate,
+                                        OpenAIClient, iter_sse_deltas)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Chat completions stub; one handler instance serves one connection"""
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if payload["stream"]:
+            return self.stream_events()
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+            status = self.server.statuses.pop(0) if self.server.statuses else 200
+        time.sleep(self.server.delay)
+        with self.server.lock:
+            self.server.in_flight -= 1
+        if status == 200:
+            body = json.dumps({"choices": [{"message": {"role": "assistant", "content": "".join(self.server.deltas)}}]})
+        else:
+            body = json.dumps({"error": {"message": f"status {status}"}})
+        body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def stream_events(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self.write_chunk(b": keep-alive\n\n")
+        events = [{"role": "assistant"}] + [{"content": delta} for delta in self.server.deltas]
+        for i, delta in enumerate(events):
+            self.write_chunk(f"data: {json.dumps({'choices': [{'delta': delta}]})}\n\n".encode())
+            if i == 1:
+                # The rest of the completion takes a while
+                time.sleep(self.server.delay)
+        self.write_chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that timed out have hung up
+        pass
+
+
+class TestOpenAIClient(unittest.TestCase):
+    def setUp(self):
+        self.server = StubServer(("127.0.0.1", 0), StubHandler)
+        self.server.lock = threading.Lock()
+        self.server.connections = self.server.requests = 0
+        self.server.in_flight = self.server.max_in_flight = 0
+        self.server.statuses = []
+        self.server.delay = 0.0
+        self.server.deltas = ["Chop", " the", " onions"]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/chat/completions"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def make_client(self, **kwargs) -> OpenAIClient:
+        return OpenAIClient("key", api_url=self.url, backoff_base=0.01, **kwargs)
+
+    def test_connections_are_reused(self):
+        client = self.make_client()
+        for _ in range(20):
+            self.assertEqual(client.generate_text("hi"), "Chop the onions")
+        client.close()
+        self.assertEqual(self.server.requests, 20)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_retries_rate_limits_and_server_errors(self):
+        self.server.statuses = [429, 503]
+        client = self.make_client(max_retries=3)
+        self.assertEqual(client.generate_text("hi"), "Chop the onions")
+        self.assertEqual(self.server.requests, 3)
+
+    def test_gives_up_after_max_retries(self):
+        self.server.statuses = [500, 500, 500]
+        client = self.make_client(max_retries=1)
+        with self.assertRaises(requests.HTTPError):
+            client.generate_text("hi")
+        self.assertEqual(self.server.requests, 2)
+
+    def test_read_timeout(self):
+        self.server.delay = 0.5
+        client = self.make_client(read_timeout=0.05, max_retries=0)
+        with self.assertRaises(requests.Timeout):
+            client.generate_text("hi")
+
+    def test_async_pool_and_concurrency_limit(self):
+        self.server.delay = 0.02
+        client = self.make_client(max_concurrency=4)
+
+        async def generate():
+            # Two waves, so the second reuses the first one's connections
+            for _ in range(2):
+                await asyncio.gather(*(client.agenerate_text("hi") for _ in range(16)))
+            await client.aclose()
+
+        asyncio.run(generate())
+        self.assertEqual(self.server.requests, 32)
+        self.assertLessEqual(self.server.max_in_flight, 4)
+        self.assertLessEqual(self.server.connections, 4)
+
+
+    def test_parse_event_stream(self):
+        lines = [": ping", "", 'data: {"choices": [{"delta": {"role": "assistant"}}]}',
+                 'data: {"choices": [{"delta": {"content": "Boil"}}]}', "",
+                 'data: {"choices": [{"delta": {"content": " water"}}]}',
+                 "data: [DONE]", 'data: {"choices": [{"delta": {"content": "late"}}]}']
+        self.assertEqual(list(iter_sse_deltas(lines)), ["Boil", " water"])
+
+    def test_stream_yields_first_token_early(self):
+        self.server.delay = 0.3
+        client = self.make_client()
+        start = time.perf_counter()
+        stream = client.stream_text("hi")
+        self.assertEqual(next(stream), "Chop")
+        self.assertLess(time.perf_counter() - start, self.server.delay)
+        self.assertEqual(list(stream), [" the", " onions"])
+
+    def test_async_stream(self):
+        client = self.make_client()
+
+        async def collect():
+            deltas = [delta async for delta in client.astream_text("hi")]
+            await client.aclose()
+            return deltas
+
+        self.assertEqual(asyncio.run(collect()), ["Chop", " the", " onions"])
+
+    def test_instructions_stream(self):
+        generator = InstructionGeneratorByLLM(self.make_client())
+        recipe = Recipe(id="soup", name="Onion soup", instructions="", ingredients=[Ingredient("onion")])
+        stream = generator.generate_instructions_stream(recipe, [Ingredient("onion")], "dinner")
+        self.assertEqual("".join(stream), "Chop the onions")
+
+    def test_cached_instructions_are_plain_content(self):
+        cache = ResponseCache()
+        generator = InstructionGeneratorByLLM(self.make_client(max_retries=0), cache)
+        recipe = Recipe(id="soup", name="Onion soup", instructions="", ingredients=[Ingredient("onion")])
+
+        self.server.statuses = [503]
+        with self.assertRaises(requests.HTTPError):
+            generator.generate_instructions(recipe, [Ingredient("onion")], "dinner")
+        self.assertEqual(len(cache), 0)
+
+        self.assertEqual(generator.generate_instructions(recipe, [Ingredient("onion")], "dinner"), "Chop the onions")
+        # A streaming caller gets the same text back from the cache
+        streamed = list(generator.generate_instructions_stream(recipe, [Ingredient("onion")], "dinner"))
+        self.assertEqual(streamed, ["Chop the onions"])
+        self.assertEqual(cache.stats()["exact_hits"], 1)
+
+
+class TestTemplateInstructions(unittest.TestCase):
+    def test_cached_blocks(self):
+        soup = {"id": "soup", "name": "Onion soup", "ingredients": [{"name": "onion"}, {"name": "stock"}],
+                "instructions": "Slice onions\nSimmer in stock"}
+        toast = {"name": "Toast", "ingredients": [{"name": "bread"}], "instructions": "Toast"}
+        generator = InstructionGeneratorByTemplate(max_cached_blocks=1)
+        expected = (
+            "1.\nName: Onion soup\nIngredients: onion, stock\n"
+            "Instructions:\n    -Slice onions\n    -Simmer in stock\n\n"
+            "2.\nName: Toast\nIngredients: bread\nInstructions:\n    -Toast\n\n"
+        )
+        self.assertEqual(generator.generate_instructions([soup, toast], [], ""), expected)
+        self.assertEqual(generator.generate_instructions([soup, toast], [], ""), expected)
+
+        generator.invalidate("soup")
+        renamed = dict(soup, name="French onion soup")
+        self.assertIn("Name: French onion soup", generator.generate_instructions([renamed], [], ""))
+
+    def test_blocks_expire(self):
+        soup = {"id": "soup", "name": "Onion soup", "ingredients": [{"name": "onion"}], "instructions": "Simmer"}
+        generator = InstructionGeneratorByTemplate(ttl=0.05)
+        generator.prerender([soup])
+        # An update written by another process, e.g. create_db.py
+        renamed = dict(soup, name="French onion soup")
+        self.assertIn("Name: Onion soup", generator.generate_instructions([renamed], [], ""))
+        time.sleep(0.06)
+        self.assertIn("Name: French onion soup", generator.generate_instructions([renamed], [], ""))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import asyncio
+import tempfile
+import unittest
+
+from cookingassistant.cache import TTLCache
+from cookingassistant.data.ingredient_index import IngredientIndex
+from cookingassistant.data.item import Ingredient, Recipe
+from cookingassistant.database import LocalVectorRecipeDatabase
+
+
+class TestLocalVectorDB(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.vectorDB = LocalVectorRecipeDatabase(result_cache=TTLCache())
+        cls.vectorDB.connect(cls.tmpdir.name)
+        recipes = [
+            Recipe(id="omelette", name="Tomato omelette", instructions="Beat eggs\nFry",
+                   ingredients=[Ingredient("egg"), Ingredient("tomato")]),
+            Recipe(id="stew", name="Beef stew", instructions="Brown beef\nSimmer",
+                   ingredients=[Ingredient("beef"), Ingredient("potato"), Ingredient("carrot")]),
+            Recipe(id="salad", name="Fruit salad", instructions="Chop\nMix",
+                   ingredients=[Ingredient("apple"), Ingredient("banana")]),
+        ]
+        cls.vectorDB.add_recipes(recipes)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+
+    def test_get_recipe_by_id(self):
+        recipe = self.vectorDB.get_recipe_by_id("stew")
+        self.assertEqual(recipe.name, "Beef stew")
+        self.assertIsNone(self.vectorDB.get_recipe_by_id("missing"))
+
+    def test_search_recipe_by_ingredients(self):
+        matched_recipes = self.vectorDB.find_recipes_by_ingredients(
+            [Ingredient("beef"), Ingredient("potatoes")], top_n=1
+        )
+        self.assertEqual(matched_recipes[0]["id"], "stew", "Failed to find suitable dishes")
+
+    def test_search_batch(self):
+        queries = [[Ingredient("beef"), Ingredient("potato")], [], [Ingredient("egg")]]
+        batch_results = self.vectorDB.find_recipes_by_ingredients_batch(queries, top_n=2)
+
+        self.assertEqual(len(batch_results), len(queries))
+        self.assertEqual(batch_results[1], [])
+        for query, results in zip(queries, batch_results):
+            single = self.vectorDB.find_recipes_by_ingredients(query, top_n=2)
+            self.assertEqual([r["id"] for r in results], [r["id"] for r in single])
+
+    def test_async_search_matches_sync(self):
+        queries = [[Ingredient("beef"), Ingredient("potato")], [Ingredient("egg")]]
+
+        async def search():
+            return await asyncio.gather(
+                *(self.vectorDB.afind_recipes_by_ingredients(query, top_n=2) for query in queries),
+                self.vectorDB.aget_recipes_by_ids(["stew", "missing"]),
+            )
+
+        *async_results, by_ids = asyncio.run(search())
+        for query, results in zip(queries, async_results):
+            single = self.vectorDB.find_recipes_by_ingredients(query, top_n=2)
+            self.assertEqual([r["id"] for r in results], [r["id"] for r in single])
+        self.assertEqual([r["id"] for r in by_ids], ["stew"])
+
+    def test_save_and_load(self):
+        self.vectorDB.save()
+        reloaded = LocalVectorRecipeDatabase()
+        reloaded.connect(self.tmpdir.name)
+
+        self.assertEqual(len(reloaded), len(self.vectorDB))
+        matched_recipes = reloaded.find_recipes_by_ingredients([Ingredient("egg"), Ingredient("tomato")], top_n=1)
+        self.assertEqual(matched_recipes[0]["id"], "omelette")
+
+    def test_upsert_recipe(self):
+        recipe = Recipe(id="salad", name="Green salad", instructions="Toss",
+                        ingredients=[Ingredient("lettuce"), Ingredient("cucumber")])
+        self.vectorDB.add_recipe(recipe)
+
+        self.assertEqual(self.vectorDB.get_recipe_by_id("salad").name, "Green salad")
+        self.assertEqual(len(self.vectorDB), 3)
+
+    def test_results_are_copies(self):
+        by_id = self.vectorDB.get_recipes_by_ids(["stew"])[0]
+        by_id["name"] = "Changed"
+        by_id["ingredients"][0]["name"] = "changed"
+        found = self.vectorDB.find_recipes_by_ingredients([Ingredient("beef")], top_n=3)
+        names = [recipe["name"] for recipe in found]
+        for recipe in found:
+            recipe["name"] = "Changed"
+            recipe["ingredients"].clear()
+        # Served from the result cache, which mustn't share records with callers
+        hits = self.vectorDB.result_cache.hits
+        again = self.vectorDB.find_recipes_by_ingredients([Ingredient("beef")], top_n=3)
+        self.assertEqual(self.vectorDB.result_cache.hits, hits + 1)
+        self.assertEqual([recipe["name"] for recipe in again], names)
+        self.assertTrue(all(recipe["ingredients"] for recipe in again))
+
+        stew = self.vectorDB.get_recipe_by_id("stew")
+        self.assertEqual(stew.name, "Beef stew")
+        self.assertEqual(stew.ingredients[0].name, "beef")
+        self.assertEqual(self.vectorDB.get_recipes_by_ids(["stew"])[0]["name"], "Beef stew")
+
+    def test_repeated_id_in_batch(self):
+        with tempfile.TemporaryDirectory() as path:
+            database = LocalVectorRecipeDatabase()
+            database.connect(path)
+            written = database.add_recipes([
+                Recipe(id="a", name="First", instructions="Cook", ingredients=[Ingredient("egg")]),
+                Recipe(id="a", name="Second", instructions="Cook", ingredients=[Ingredient("egg")]),
+            ])
+        self.assertEqual(written, 1)
+        self.assertEqual(len(database), 1)
+        self.assertEqual(database.get_recipe_by_id("a").name, "Second")
+        self.assertEqual(database.find_recipes_by_ingredients([Ingredient("egg")])[0]["name"], "Second")
+
+
+class FailingWritesDatabase(LocalVectorRecipeDatabase):
+    def _insert_rows(self, rows, chunk_size, upsert=False):
+        return []
+
+
+class TestFailedWrite(unittest.TestCase):
+    def test_add_recipe_raises(self):
+        result_cache = TTLCache()
+        result_cache.put("key", ["cached"])
+        database = FailingWritesDatabase(result_cache=result_cache, ingredient_index=IngredientIndex())
+        with tempfile.TemporaryDirectory() as path:
+            database.connect(path)
+            with self.assertRaises(RuntimeError):
+                database.add_recipe(Recipe(id="toast", name="Toast", instructions="Toast",
+                                           ingredients=[Ingredient("bread")]))
+
+        self.assertEqual(len(database.ingredient_index), 0)
+        self.assertEqual(result_cache.get("key"), ["cached"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import asyncio
+import io
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from cookingassistant.model.preprocess import ImageLoader
+
+
+def jpeg_bytes(size, orientation=None) -> bytes:
+    rng = np.random.default_rng(0)
+    image = Image.fromarray(rng.integers(0, 255, (12, 16, 3), dtype=np.uint8)).resize(size)
+    exif = image.getexif()
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", exif=exif)
+    return buffer.getvalue()
+
+
+class TestImageLoader(unittest.TestCase):
+    def setUp(self):
+        self.loader = ImageLoader(target_size=640, max_workers=2)
+
+    def tearDown(self):
+        self.loader.close()
+
+    def test_downscale_and_orientation(self):
+        # Orientation 6: stored landscape, displayed rotated to portrait
+        image = self.loader.load(jpeg_bytes((3200, 2400), orientation=6))
+        self.assertEqual(image.size, (480, 640))
+        self.assertEqual(image.mode, "RGB")
+        self.assertIn("source_digest", image.info)
+
+    def test_same_bytes_same_digest(self):
+        data = jpeg_bytes((800, 600))
+        first, second = self.loader.load_many([data, data])
+        self.assertEqual(first.info["source_digest"], second.info["source_digest"])
+
+    def test_async_load_keeps_order(self):
+        sources = [jpeg_bytes((800, 600)), Image.new("RGB", (100, 50))]
+        images = asyncio.run(self.loader.aload_many(sources))
+        self.assertEqual([image.size for image in images], [(640, 480), (100, 50)])
+
+    def test_small_images_keep_their_size(self):
+        image = Image.new("L", (320, 200))
+        loaded = self.loader.load(image)
+        self.assertEqual(loaded.size, (320, 200))
+        self.assertEqual(loaded.mode, "RGB")
+        self.assertEqual(image.mode, "L")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+from cookingassistant.data.item import Ingredient, Recipe
+from cookingassistant.model.prompt import (PromptBuilder, approx_token_count,
+                                           compress_instructions)
+
+SOUP = Recipe(
+    id="soup", name="Onion soup",
+    ingredients=[Ingredient(name) for name in
+                 ["Onions", "onion", "butter", "beef stock", "thyme", "bread", "gruyere cheese"]],
+    instructions="1. Slice the onions thinly.\n\n2.  Melt butter and cook   for 40 minutes.\n"
+                 "Step 3: Add stock; simmer.\n- Add stock; simmer.\n4) Top with bread and cheese",
+)
+
+
+class TestPromptBuilder(unittest.TestCase):
+    def test_token_count(self):
+        self.assertEqual(approx_token_count("Chop the onions, finely."), 8)
+        self.assertEqual(approx_token_count(""), 0)
+
+    def test_compress_instructions(self):
+        self.assertEqual(compress_instructions(SOUP.instructions), [
+            "Slice the onions thinly",
+            "Melt butter and cook for 40 minutes",
+            "Add stock; simmer",
+            "Top with bread and cheese",
+        ])
+
+    def test_sections(self):
+        prompt = PromptBuilder().build(SOUP, [Ingredient("onion"), Ingredient("Bread"), Ingredient("carrots")],
+                                       "  quick   dinner? ")
+        lines = prompt.text.split("\n")
+        self.assertEqual(lines[1], "The user is missing these recipe ingredients: butter; beef stock; thyme; gruyere cheese.")
+        self.assertEqual(lines[2], "The user has these recipe ingredients: Onions; bread.")
+        self.assertEqual(lines[3], "The user also has: carrots.")
+        self.assertIn("The user asks: quick dinner?", lines)
+        self.assertEqual(prompt.tokens, approx_token_count(prompt.text))
+        self.assertEqual(prompt.dropped_items, 0)
+
+    def test_budget_keeps_missing_ingredients_first(self):
+        for max_tokens in range(60, 200, 10):
+            prompt = PromptBuilder(max_tokens=max_tokens).build(SOUP, [Ingredient("onion")], "quick " * 100)
+            self.assertLessEqual(prompt.tokens, max_tokens)
+        prompt = PromptBuilder(max_tokens=90).build(SOUP, [Ingredient("onion")], "quick")
+        self.assertIn("missing these recipe ingredients: butter; beef stock; thyme; bread; gruyere cheese.", prompt.text)
+        self.assertNotIn("Recipe steps", prompt.text)
+        self.assertEqual(prompt.dropped_items, 5)
+
+    def test_dataset_ingredient_names(self):
+        recipe = Recipe(id="soup", name="Onion soup", instructions="Cook",
+                        ingredients=[Ingredient(name) for name in
+                                     ["onions, raw", "onions, sweet, raw", "butter, salted",
+                                      "bread, whole-wheat, commercially prepared", "cheese, gruyere"]])
+        prompt = PromptBuilder().build(recipe, [Ingredient("onion"), Ingredient("Bread"), Ingredient("carrot")], "dinner")
+        lines = prompt.text.split("\n")
+        self.assertEqual(lines[1], "The user is missing these recipe ingredients: butter, salted; cheese, gruyere.")
+        self.assertEqual(lines[2], "The user has these recipe ingredients: onions, raw; "
+                                   "bread, whole-wheat, commercially prepared.")
+        self.assertEqual(lines[3], "The user also has: carrot.")
+
+    def test_long_query_is_truncated(self):
+        prompt = PromptBuilder(max_query_tokens=10).build(SOUP, [], "please " * 50)
+        self.assertIn("The user asks: please please please...", prompt.text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import json
+import os
+import tempfile
+import unittest
+
+from cookingassistant.data.reader import (IngredientPool, iter_json_array,
+                                          iter_recipes)
+
+RECORDS = [
+    {"id": "r1", "title": "Toast", "ingredients": [{"text": "bread"}, {"text": "butter"}],
+     "instructions": [{"text": "Toast the bread"}, {"text": "Spread butter"}]},
+    {"id": "r2", "title": "Butter rice", "ingredients": [{"text": "rice"}, {"text": "butter"}],
+     "instructions": [{"text": "Cook rice"}]},
+]
+
+
+class TestReader(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "data.json")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, text: str):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def parse(self, text: str, chunk_size: int) -> list:
+        self.write(text)
+        return list(iter_json_array(self.path, chunk_size=chunk_size))
+
+    def test_elements_across_chunk_boundaries(self):
+        values = [12345, -6.5e-3, 7, "a, b]", {"x": [1, 2]}, True, None, 1.25, 0]
+        text = json.dumps(values)
+        for chunk_size in range(1, len(text) + 2):
+            self.assertEqual(self.parse(text, chunk_size), values, f"chunk_size={chunk_size}")
+
+    def test_number_at_buffer_end(self):
+        self.assertEqual(self.parse("[12345, 6]", chunk_size=2), [12345, 6])
+        self.assertEqual(self.parse("[1.5e3]", chunk_size=3), [1500.0])
+
+    def test_leading_whitespace_chunks(self):
+        self.assertEqual(self.parse("\n\n      \n  [1, 2]  \n", chunk_size=4), [1, 2])
+        self.assertEqual(self.parse("   []", chunk_size=1), [])
+
+    def test_invalid_files(self):
+        with self.assertRaises(ValueError):
+            self.parse('{"a": 1}', chunk_size=4)
+        with self.assertRaises(ValueError):
+            self.parse("     ", chunk_size=2)
+        with self.assertRaises(ValueError):
+            self.parse("[1, 2", chunk_size=2)
+
+    def test_recipes_share_ingredients(self):
+        self.write(json.dumps(RECORDS, indent=2))
+        pool = IngredientPool()
+        toast, rice = iter_recipes(self.path, pool, chunk_size=16)
+
+        self.assertEqual(toast.name, "Toast")
+        self.assertEqual(toast.instructions, "Toast the bread\nSpread butter")
+        self.assertEqual([ing.name for ing in rice.ingredients], ["rice", "butter"])
+        self.assertIs(toast.ingredients[1], rice.ingredients[1])
+        self.assertEqual(len(pool), 3)
+        self.assertIs(pool.get("bread"), toast.ingredients[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
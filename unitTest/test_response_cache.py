@@ -0,0 +1,90 @@
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from cookingassistant.cache import ResponseCache
+from cookingassistant.data.item import Ingredient, Recipe
+from cookingassistant.model.llm import InstructionGeneratorByLLM, LLMClient
+
+VOCABULARY = ["quick", "fast", "easy", "dinner", "spicy", "vegan", "for", "a"]
+SYNONYMS = {"fast": "quick"}
+
+
+def embed(text: str) -> np.ndarray:
+    """Bag of words over a small vocabulary, treating synonyms as one word"""
+    words = [SYNONYMS.get(word, word) for word in text.lower().split()]
+    return np.array([words.count(word) for word in VOCABULARY], dtype=np.float32)
+
+
+class CountingClient(LLMClient):
+    api_key = "key"
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate_text(self, prompt: str) -> str:
+        self.calls += 1
+        return f"instructions {self.calls}"
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_exact_hit_after_normalization(self):
+        cache = ResponseCache()
+        cache.put("soup|onion", "Quick dinner", "Chop", latency=2.0)
+        self.assertEqual(cache.get("soup|onion", "  quick   DINNER "), "Chop")
+        self.assertIsNone(cache.get("stew|onion", "quick dinner"))
+        self.assertEqual(cache.stats()["saved_seconds"], 2.0)
+
+    def test_similar_queries_share_a_response(self):
+        cache = ResponseCache(embed, similarity_threshold=0.9)
+        cache.put("soup|onion", "a quick dinner", "Chop")
+        self.assertEqual(cache.get("soup|onion", "a fast dinner"), "Chop")
+        self.assertIsNone(cache.get("soup|onion", "spicy vegan"))
+        self.assertIsNone(cache.get("soup|garlic", "a fast dinner"))
+        stats = cache.stats()
+        self.assertEqual((stats["similar_hits"], stats["misses"]), (1, 2))
+        self.assertAlmostEqual(stats["hit_rate"], 1 / 3)
+
+    def test_ttl_and_eviction(self):
+        cache = ResponseCache(maxsize=2, ttl=0.05)
+        for query in ("one", "two", "three"):
+            cache.put("scope", query, query)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("scope", "one"))
+        time.sleep(0.06)
+        self.assertIsNone(cache.get("scope", "three"))
+
+    def test_persistence(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "responses.jsonl")
+            cache = ResponseCache(embed, path=path)
+            cache.put("soup|onion", "a quick dinner", "Chop")
+            cache.put("soup|onion", "a quick dinner", "Chop finely")
+
+            reloaded = ResponseCache(embed, path=path)
+            self.assertEqual(len(reloaded), 1)
+            self.assertEqual(reloaded.get("soup|onion", "a fast dinner"), "Chop finely")
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(len(f.readlines()), 1)
+
+
+class TestCachedInstructions(unittest.TestCase):
+    def test_generator_reuses_responses(self):
+        client = CountingClient()
+        generator = InstructionGeneratorByLLM(client, ResponseCache(embed))
+        recipe = Recipe(id="soup", name="Onion soup", instructions="", ingredients=[Ingredient("onion")])
+
+        first = generator.generate_instructions(recipe, [Ingredient("Onions"), Ingredient("salt")], "a quick dinner")
+        again = generator.generate_instructions(recipe, [Ingredient("salt"), Ingredient("onion")], "a fast dinner")
+        streamed = "".join(generator.generate_instructions_stream(recipe, [Ingredient("onion")], "a quick dinner"))
+
+        self.assertEqual(again, first)
+        self.assertEqual(streamed, "instructions 2")
+        self.assertEqual(client.calls, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()